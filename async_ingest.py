@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from tqdm import tqdm
+
+from ingest_logging import count, init_worker_logging, log_file
+from ingest_pipeline import PARSE_WORKERS, parse_match
+from run_metrics import WRITE_COMMIT, payload_bytes, statement_stage
+from season_stats import reduce_season_stats
+
+# ------------------------ Configuration ------------------------
+
+CONCURRENCY = 64   # matches parsed or written at once
+POOL_SIZE = 16     # Bolt connections; transactions beyond this wait for a free one
+
+# ------------------------ Writer ------------------------
+
+async def _run_statements(tx, statements, timings):
+    # Transaction function: the driver may call it again after a transient error, so it only
+    # records the timings of the attempt that commits.
+    timings.clear()
+    for query, parameters in statements:
+        start = time.perf_counter()
+        result = await tx.run(query, parameters)
+        await result.consume()
+        stage = statement_stage(query)
+        seconds, calls, nbytes = timings.get(stage, (0.0, 0, 0))
+        timings[stage] = (seconds + time.perf_counter() - start, calls + 1, nbytes + payload_bytes(parameters))
+
+
+async def write_match_batch_async(driver, batch, dimension_cache=None, database=None):
+    """Async counterpart of batch_writer.write_match_batch: one managed write transaction.
+
+    execute_write retries the whole transaction on transient errors (deadlocks, leader
+    switches); the statements are all MERGE/DETACH DELETE, so a replay converges on the same
+    graph. Returns {stage: (seconds, calls, bytes)} for the committed attempt.
+    """
+    dimension_keys = batch.dimension_keys() if dimension_cache is not None else set()
+    skip = dimension_cache.cached(dimension_keys) if dimension_cache is not None else frozenset()
+    statements = list(batch.statements(skip))
+    timings = {}
+    start = time.perf_counter()
+    async with driver.session(database=database) as session:
+        await session.execute_write(_run_statements, statements, timings)
+    statement_seconds = sum(seconds for seconds, _, _ in timings.values())
+    timings[WRITE_COMMIT] = (time.perf_counter() - start - statement_seconds, 1, 0)
+    if dimension_cache is not None:
+        dimension_cache.mark(dimension_keys - skip)
+    count("wrote", "matches")
+    return timings
+
+# ------------------------ Engine ------------------------
+
+async def run_async_ingest(json_files, tournament_name, driver, concurrency=CONCURRENCY,
+                           parse_workers=PARSE_WORKERS, replacements=None, on_written=None, on_failed=None,
+                           dimension_cache=None, metrics=None, database=None):
+    """Parse on a process pool and write with up to `concurrency` matches in flight on one thread.
+
+    Same contract as ingest_pipeline.run_pipeline: returns ({season: SeasonStats}, failed_files)
+    and calls on_written(file, batch, season_stats) after each commit and on_failed(file, exc)
+    for each failed file. The driver's
+    max_connection_pool_size bounds how many transactions are open at once.
+    """
+    replacements = replacements or {}
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    partials = {}
+    failures = []
+    progress = tqdm(total=len(json_files), desc="Processing files")
+
+    async def ingest(executor, file):
+        async with limit:
+            try:
+                _, batch, partial, timings = await loop.run_in_executor(
+                    executor, parse_match, file, tournament_name, replacements.get(file))
+                if metrics is not None:
+                    metrics.add_timings(timings, file=file, season=partial.season if partial else None)
+                if batch is not None:
+                    write_timings = await write_match_batch_async(driver, batch, dimension_cache, database)
+                    if metrics is not None:
+                        metrics.add_timings(write_timings, file=file, season=partial.season)
+                    if on_written is not None:
+                        on_written(file, batch, partial)
+                partials[file] = partial
+            except Exception as exc:
+                logging.error(f"File {file} generated an exception: {exc}")
+                failures.append(file)
+                if on_failed is not None:
+                    on_failed(file, exc)
+            finally:
+                progress.update(1)
+
+    with ProcessPoolExecutor(max_workers=parse_workers, initializer=init_worker_logging,
+                             initargs=(log_file(),)) as executor:
+        await asyncio.gather(*(ingest(executor, file) for file in json_files))
+    progress.close()
+
+    season_stats = reduce_season_stats(partials[file] for file in sorted(partials))
+    return season_stats, failures
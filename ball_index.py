@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+import numpy as np
+
+# ------------------------ Configuration ------------------------
+
+PHASES = ("Powerplay", "Middle Overs", "Death Overs")
+
+# Last (over, ball) of every phase but the final one, compared the way get_phase always has:
+# as the decimal number "over.ball" with the 1-based over the importers pass in
+PHASE_BOUNDARIES = ((5, 6), (15, 6))
+
+BALL_SLOTS = 16   # ball positions reserved per over in the index; legal balls run 1..6 (7 for a miscounted over)
+MAX_OVERS = 64    # overs covered by the precomputed tables; larger inputs are classified directly
+
+# ------------------------ Encoding ------------------------
+
+def ball_index(over, ball):
+    """Compact integer for (0-based over, 1-based legal ball): 3.4 -> 3 * BALL_SLOTS + 4.
+
+    Ordered like the deliveries themselves, so overs a..b of an innings are the range
+    [a * BALL_SLOTS, (b + 1) * BALL_SLOTS).
+    """
+    return over * BALL_SLOTS + ball
+
+
+def _decimal_phase(over, ball, boundaries):
+    over_ball = Decimal(f"{over}.{ball}")
+    for phase, (last_over, last_ball) in enumerate(boundaries):
+        if over_ball <= Decimal(f"{last_over}.{last_ball}"):
+            return phase
+    return len(boundaries)
+
+# ------------------------ Lookup Table ------------------------
+
+class PhaseTable:
+    """Phase and ball label of every (over, ball), precomputed once into flat arrays by ball index.
+
+    phase(), phase_id() and label() are a bounds check and a list lookup; classify() does whole
+    innings at once with NumPy fancy indexing. Values outside the table fall back to the
+    decimal rule, so results never depend on the table size.
+    """
+
+    def __init__(self, boundaries=PHASE_BOUNDARIES, phases=PHASES, max_overs=MAX_OVERS):
+        if len(phases) != len(boundaries) + 1:
+            raise ValueError(f"{len(boundaries)} boundaries need {len(boundaries) + 1} phases, got {len(phases)}")
+        self.boundaries = tuple(tuple(b) for b in boundaries)
+        self.phases = tuple(phases)
+        self.max_overs = max_overs
+        size = max_overs * BALL_SLOTS
+        self.phase_ids = np.array([_decimal_phase(*divmod(index, BALL_SLOTS), self.boundaries)
+                                   for index in range(size)], dtype=np.int8)
+        self._phase_ids = self.phase_ids.tolist()
+        # Ball labels use the 0-based over, phases the 1-based over: label "3.4" is phase(4, 4)
+        self._labels = [f"{over}.{ball}" for over, ball in (divmod(index, BALL_SLOTS) for index in range(size))]
+
+    def phase_id(self, over, ball):
+        if 0 <= over < self.max_overs and 0 <= ball < BALL_SLOTS:
+            return self._phase_ids[over * BALL_SLOTS + ball]
+        return _decimal_phase(over, ball, self.boundaries)
+
+    def phase(self, over, ball):
+        return self.phases[self.phase_id(over, ball)]
+
+    def label(self, over, ball):
+        """Ball label such as "3.4" for the 0-based over and 1-based legal ball."""
+        if 0 <= over < self.max_overs and 0 <= ball < BALL_SLOTS:
+            return self._labels[over * BALL_SLOTS + ball]
+        return f"{over}.{ball}"
+
+    def classify(self, overs, balls):
+        """Phase ids for arrays of (over, ball) pairs, e.g. a whole innings."""
+        overs = np.asarray(overs, dtype=np.int64)
+        balls = np.asarray(balls, dtype=np.int64)
+        inside = (overs >= 0) & (overs < self.max_overs) & (balls >= 0) & (balls < BALL_SLOTS)
+        ids = np.empty(len(overs), dtype=np.int8)
+        ids[inside] = self.phase_ids[overs[inside] * BALL_SLOTS + balls[inside]]
+        for k in np.flatnonzero(~inside):
+            ids[k] = _decimal_phase(int(overs[k]), int(balls[k]), self.boundaries)
+        return ids
+
+
+PHASE_TABLE = PhaseTable()
@@ -0,0 +1,229 @@
+import logging
+import random
+import time
+from collections import namedtuple
+
+from py2neo.errors import ConnectionBroken, ConnectionUnavailable, ServiceUnavailable
+
+from ingest_logging import count
+
+# ------------------------ Match Batch ------------------------
+
+NodeRef = namedtuple("NodeRef", ["label", "keys", "values"])
+
+# Shared by every match; the rest of a batch belongs to exactly one match
+DIMENSION_LABELS = frozenset(["Tournament", "Season", "Team", "Player", "Venue", "Official"])
+DIMENSION_RELATIONSHIPS = frozenset(["HAS_SEASON", "PARTICIPATES_IN", "PLAYS_FOR", "HAS_PLAYER"])
+
+
+def _as_tuple(value):
+    return tuple(value) if isinstance(value, (tuple, list)) else (value,)
+
+
+class MatchBatch:
+    """In-memory subgraph for one match, grouped by label and relationship type."""
+
+    def __init__(self, match_id=None):
+        self.match_id = match_id
+        # Set when this batch replaces an already imported match (possibly under an older match_id)
+        self.replaces_match_id = None
+        # Matches replaced by the batches folded in with absorb()
+        self.replaced_match_ids = []
+        self.revision = None
+        # Per-player contributions to the career aggregates (see player_aggregates)
+        self.player_stats = {}
+        # (label, keys) -> {values: properties}
+        self.nodes = {}
+        # (start_label, start_keys, rel_type, end_label, end_keys) -> {(start_values, end_values): properties}
+        self.relationships = {}
+
+    def merge_node(self, label, key, properties):
+        keys = _as_tuple(key)
+        values = tuple(properties[k] for k in keys)
+        # Node() drops None-valued properties, so SET += never clears an existing value
+        props = {k: v for k, v in properties.items() if v is not None}
+        existing = self.nodes.setdefault((label, keys), {}).setdefault(values, {})
+        existing.update(props)
+        return NodeRef(label, keys, values)
+
+    def ref(self, label, key, value):
+        return NodeRef(label, _as_tuple(key), _as_tuple(value))
+
+    def merge_relationship(self, start, rel_type, end, properties=None):
+        group = (start.label, start.keys, rel_type, end.label, end.keys)
+        existing = self.relationships.setdefault(group, {}).setdefault((start.values, end.values), {})
+        if properties:
+            existing.update({k: v for k, v in properties.items() if v is not None})
+
+    def absorb(self, other):
+        """Fold another batch in, so several matches can share one transaction and one UNWIND per group."""
+        for group, rows in other.nodes.items():
+            mine = self.nodes.setdefault(group, {})
+            for values, props in rows.items():
+                mine.setdefault(values, {}).update(props)
+        for group, rows in other.relationships.items():
+            mine = self.relationships.setdefault(group, {})
+            for ends, props in rows.items():
+                mine.setdefault(ends, {}).update(props)
+        self.replaced_match_ids.extend(other.replaced_ids())
+        return self
+
+    def replaced_ids(self):
+        own = [self.replaces_match_id] if self.replaces_match_id is not None else []
+        return own + self.replaced_match_ids
+
+    def group_count(self):
+        """Upper bound on the statements this batch sends."""
+        return len(self.nodes) + len(self.relationships) + len(DELETE_MATCH_QUERIES) * len(self.replaced_ids())
+
+    def node_count(self):
+        return sum(len(rows) for rows in self.nodes.values())
+
+    def relationship_count(self):
+        return sum(len(rows) for rows in self.relationships.values())
+
+    def dimension_keys(self):
+        """Cache keys of the dimension nodes and relationships in this batch."""
+        keys = set()
+        for (label, _), rows in self.nodes.items():
+            if label in DIMENSION_LABELS:
+                keys.update((label, values) for values in rows)
+        for (_, _, rel_type, _, _), rows in self.relationships.items():
+            if rel_type in DIMENSION_RELATIONSHIPS:
+                keys.update((rel_type, start, end) for start, end in rows)
+        return keys
+
+    def statements(self, skip=frozenset()):
+        """Yield (cypher, parameters) pairs: every node group first, then every relationship group.
+
+        Rows whose dimension key is in skip (see dimension_keys) are left out.
+        """
+        for match_id in self.replaced_ids():
+            for query in DELETE_MATCH_QUERIES:
+                yield query, {"match_id": match_id}
+        for (label, keys), rows in self.nodes.items():
+            data = [props for values, props in rows.items() if (label, values) not in skip]
+            if data:
+                yield node_merge_query(label, keys), {"rows": data}
+        for (start_label, start_keys, rel_type, end_label, end_keys), rows in self.relationships.items():
+            data = [{"start": list(s), "end": list(e), "props": props} for (s, e), props in rows.items()
+                    if (rel_type, s, e) not in skip]
+            if data:
+                yield relationship_merge_query(start_label, start_keys, rel_type, end_label, end_keys), {"rows": data}
+
+# ------------------------ Cypher Generation ------------------------
+
+def _key_map(keys, expr):
+    return ", ".join(f"{k}: {expr}.{k}" for k in keys)
+
+
+def _indexed_key_map(keys, expr):
+    return ", ".join(f"{k}: {expr}[{i}]" for i, k in enumerate(keys))
+
+
+def node_merge_query(label, keys):
+    return (f"UNWIND $rows AS r "
+            f"MERGE (n:{label} {{{_key_map(keys, 'r')}}}) "
+            f"SET n += r")
+
+
+def relationship_merge_query(start_label, start_keys, rel_type, end_label, end_keys):
+    return (f"UNWIND $rows AS r "
+            f"MATCH (a:{start_label} {{{_indexed_key_map(start_keys, 'r.start')}}}) "
+            f"MATCH (b:{end_label} {{{_indexed_key_map(end_keys, 'r.end')}}}) "
+            f"MERGE (a)-[rel:{rel_type}]->(b) "
+            f"SET rel += r.props")
+
+# Match-owned nodes, children first. Phase has no match_id so it is reached through its Innings.
+DELETE_MATCH_QUERIES = [
+    "MATCH (:Innings {match_id: $match_id})-[:HAS_PHASE]->(p:Phase) DETACH DELETE p",
+    "MATCH (n:Dismissal {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:Partnership {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:Delivery {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:Over {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:Innings {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:PlayerMatchPerformance {match_id: $match_id}) DETACH DELETE n",
+    "MATCH (n:Match {match_id: $match_id}) DETACH DELETE n",
+]
+
+# ------------------------ Writer ------------------------
+
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.1   # seconds, doubled per attempt
+RETRY_MAX_DELAY = 5.0
+
+def is_transient(exc):
+    """Errors worth retrying the whole transaction for: deadlocks, leader switches, dropped connections."""
+    should_retry = getattr(exc, "should_retry", None)
+    if callable(should_retry) and should_retry():
+        return True
+    return isinstance(exc, (ConnectionBroken, ConnectionUnavailable, ServiceUnavailable))
+
+
+def call_with_retries(fn, *args, retries=MAX_RETRIES, description="transaction"):
+    """Call fn(*args), retrying transient errors with jittered exponential backoff.
+
+    fn must be safe to replay: every write the importers send is a MERGE (or a DETACH DELETE
+    of the match being replaced), so a retried match converges on the same graph.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as exc:
+            if attempt == retries or not is_transient(exc):
+                raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+            logging.warning(f"Transient error in {description} (attempt {attempt + 1}/{retries + 1}), "
+                            f"retrying in {delay:.2f}s: {exc}")
+            count("retried", "transactions")
+            time.sleep(delay)
+
+
+def _write_transaction(graph, batch, skip):
+    tx = graph.begin()
+    try:
+        statements = 0
+        for query, parameters in batch.statements(skip):
+            tx.run(query, parameters)
+            statements += 1
+        graph.commit(tx)
+    except Exception:
+        try:
+            graph.rollback(tx)
+        except Exception as exc:
+            logging.debug(f"Rollback of match {batch.match_id} failed: {exc}")
+        raise
+    return statements
+
+
+def write_match_batch(graph, batch, dimension_cache=None, retries=MAX_RETRIES):
+    """Send a MatchBatch as UNWIND statements inside a single transaction.
+
+    The match is committed atomically or not at all, and the transaction is retried on
+    transient errors. With a DimensionCache, dimension rows already merged this session are
+    skipped, and the ones written here are only marked as merged once the transaction has
+    committed.
+    """
+    dimension_keys = batch.dimension_keys() if dimension_cache is not None else set()
+    skip = dimension_cache.cached(dimension_keys) if dimension_cache is not None else frozenset()
+    statements = call_with_retries(_write_transaction, graph, batch, skip, retries=retries,
+                                   description=f"match {batch.match_id}")
+    if dimension_cache is not None:
+        dimension_cache.mark(dimension_keys - skip)
+    for key in dimension_keys - skip:
+        count("merged", f"{key[0].lower()}s" if key[0] in DIMENSION_LABELS else f"{key[0]} links")
+    count("wrote", "matches")
+    logging.debug(f"Wrote match {batch.match_id}: {batch.node_count()} nodes, "
+                  f"{batch.relationship_count()} relationships in {statements} statements")
+    return statements
+
+
+def combine_batches(batches):
+    """One MatchBatch holding several matches' subgraphs (see MatchBatch.absorb)."""
+    batches = list(batches)
+    if len(batches) == 1:
+        return batches[0]
+    combined = MatchBatch(",".join(str(b.match_id) for b in batches))
+    for batch in batches:
+        combined.absorb(batch)
+    return combined
@@ -0,0 +1,71 @@
+import argparse
+import glob
+import os
+import time
+
+import verify
+import empty_database
+from memory_graph import MemoryGraph
+
+# ------------------------ Benchmark ------------------------
+
+def graph_shape(graph):
+    nodes = {r["label"]: r["count"] for r in graph.run(
+        "MATCH (n) RETURN labels(n)[0] AS label, count(*) AS count")}
+    rels = {r["type"]: r["count"] for r in graph.run(
+        "MATCH ()-[r]->() RETURN type(r) AS type, count(*) AS count")}
+    return nodes, rels
+
+
+def run_mode(json_dir, batched, reset=True, latency=None, engine=verify.ENGINE):
+    """Import json_dir once; latency=None uses the live database, otherwise a fresh MemoryGraph."""
+    if latency is not None:
+        verify.use_graph(MemoryGraph(latency=latency))
+    elif reset:
+        empty_database.main([])
+        verify.dimension_cache.clear()
+    matches = len(glob.glob(os.path.join(json_dir, "*.json")))
+    start = time.perf_counter()
+    verify.import_json_to_neo4j(json_dir, verify.TOURNAMENT_NAME, batched=batched, incremental=False,
+                                engine=engine)
+    elapsed = time.perf_counter() - start
+    graph = verify.get_graph()
+    round_trips = getattr(graph, "round_trips", None)
+    return matches, elapsed, graph_shape(graph), round_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-entity, UNWIND-batched (writer threads) "
+                                                 "and async-driver import throughput.")
+    parser.add_argument("json_dir", help="Season directory to import, e.g. data/ipl_matches/S17-2024")
+    parser.add_argument("--no-reset", action="store_true", help="Do not empty the database before each run")
+    parser.add_argument("--memory", action="store_true", help="Benchmark against the in-memory Graph stand-in")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Simulated seconds per round trip with --memory (e.g. 0.0005)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, batched, engine in (("per-entity", False, "threads"), ("batched", True, "threads"),
+                                  ("async", True, "async")):
+        matches, elapsed, shape, round_trips = run_mode(args.json_dir, batched, reset=not args.no_reset,
+                                                        latency=args.latency if args.memory else None,
+                                                        engine=engine)
+        results[name] = (matches, elapsed, shape)
+        line = f"{name:>10}: {matches} matches in {elapsed:.1f}s -> {matches / elapsed:.2f} matches/sec"
+        if round_trips is not None:
+            line += f", {round_trips} round trips ({round_trips / matches:.0f}/match)"
+        print(line)
+
+    legacy, batched, async_ = results["per-entity"], results["batched"], results["async"]
+    print(f"Speedup: batched {legacy[1] / batched[1]:.1f}x, async {legacy[1] / async_[1]:.1f}x over per-entity; "
+          f"async {batched[1] / async_[1]:.2f}x over writer threads")
+    if not legacy[2] == batched[2] == async_[2]:
+        print("WARNING: graph shape differs between paths")
+        for name, (_, _, shape) in results.items():
+            print(f"  {name + ':':<12}{shape}")
+    else:
+        print("Graph shape identical (node counts per label, relationship counts per type).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import glob
+import os
+import time
+from collections import defaultdict
+
+import match_transform
+from innings_stats import NO_ID, PHASES, MatchStats, reduce_match
+from match_cache import load_match
+
+# ------------------------ Reference Loops ------------------------
+
+def loop_match_stats(columns):
+    """The per-delivery dictionary updates build_match_batch used to do, replayed over the same rows."""
+    rows = columns.rows
+    players = columns.players
+    player_stats = defaultdict(lambda: {
+        "runs": 0, "balls_faced": 0, "runs_conceded": 0, "balls_bowled": 0, "wickets": 0,
+        "fours": 0, "sixes": 0, "catches": 0, "run_outs": 0, "stumpings": 0,
+    })
+    phases = {i: {name: {"runs": 0, "balls": 0, "wickets": 0} for name in PHASES} for i in columns.innings}
+    innings = {i: {"runs": 0, "wickets": 0, "fours": 0, "sixes": 0} for i in columns.innings}
+    fielders = defaultdict(list)
+    for row, player in columns.fielders:
+        fielders[row].append(player)
+
+    for r in range(len(rows["innings"])):
+        i = rows["innings"][r]
+        runs_batter, runs_total = rows["runs_batter"][r], rows["runs_total"][r]
+        is_legal, has_wicket, wickets = rows["is_legal"][r], rows["has_wicket"][r], rows["wickets"][r]
+
+        # The second walk over overs_list for the season totals
+        innings[i]["wickets"] += wickets
+        if runs_batter == 4:
+            innings[i]["fours"] += 1
+        elif runs_batter == 6:
+            innings[i]["sixes"] += 1
+        if not rows["kept"][r]:
+            continue
+
+        if rows["phase"][r] != NO_ID:
+            phase = phases[i][PHASES[rows["phase"][r]]]
+            phase["runs"] += runs_total
+            if is_legal:
+                phase["balls"] += 1
+            if has_wicket:
+                phase["wickets"] += 1
+        if not rows["counted"][r]:
+            continue
+
+        innings[i]["runs"] += runs_total
+        batter = player_stats[players[rows["batter"][r]]]
+        batter["balls_faced"] += 1
+        batter["runs"] += runs_batter
+        if runs_batter == 4:
+            batter["fours"] += 1
+        elif runs_batter == 6:
+            batter["sixes"] += 1
+        bowler = player_stats[players[rows["bowler"][r]]]
+        if is_legal:
+            bowler["balls_bowled"] += 1
+        else:
+            bowler["no_balls"] = bowler.get("no_balls", 0) + 1
+        bowler["runs_conceded"] += runs_total - rows["byes"][r]
+        if has_wicket:
+            bowler["wickets"] += wickets
+            for player in fielders[r]:
+                player_stats[players[player]]["catches"] += 1
+
+    return MatchStats(dict(player_stats), phases, innings)
+
+# ------------------------ Benchmark ------------------------
+
+def collect_columns(files, tournament_name="Indian Premier League"):
+    """DeliveryColumns of every match, as build_match_batch fills them."""
+    collected = []
+    original = match_transform.reduce_match
+
+    def recording(columns):
+        collected.append(columns)
+        return original(columns)
+
+    match_transform.reduce_match = recording
+    try:
+        for file in files:
+            match_transform.build_match_batch(load_match(file), file, tournament_name)
+    finally:
+        match_transform.reduce_match = original
+    return collected
+
+
+def time_reducer(reducer, matches, repeat):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [reducer(columns) for columns in matches]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the bincount reductions of innings_stats with "
+                                                 "the per-delivery dictionary loops over the corpus.")
+    parser.add_argument("--data-root", default="data/ipl_matches")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many timed runs")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.data_root, "S*-*", "*.json")))
+    matches = collect_columns(files)
+    deliveries = sum(len(columns.rows["innings"]) for columns in matches)
+
+    loop_seconds, expected = time_reducer(loop_match_stats, matches, args.repeat)
+    numpy_seconds, actual = time_reducer(reduce_match, matches, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(expected, actual)
+                     if (a.players, a.phases, a.innings) != (b.players, b.phases, b.innings))
+    for name, seconds in (("loops", loop_seconds), ("bincount", numpy_seconds)):
+        print(f"{name:>9}: {len(matches)} matches, {deliveries} deliveries in {seconds:.3f}s "
+              f"-> {deliveries / seconds:,.0f} deliveries/sec")
+    print(f"Speedup {loop_seconds / numpy_seconds:.2f}x; {mismatches} matches with different totals")
+
+
+if __name__ == "__main__":
+    main()
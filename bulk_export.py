@@ -0,0 +1,200 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+
+from batch_writer import MatchBatch
+from import_ledger import LEDGER_PATH, ImportLedger
+from leaderboards import ALL_TIME
+from match_cache import load_match
+from match_transform import build_match_batch, tournament_properties
+
+# ------------------------ Configuration ------------------------
+
+DATA_ROOT = "data/ipl_matches"
+TOURNAMENT_NAME = "Indian Premier League"
+ARRAY_DELIMITER = ";"
+
+# ------------------------ Helper Functions ------------------------
+
+def season_directories(data_root):
+    return sorted(d for d in glob.glob(os.path.join(data_root, "S*-*")) if os.path.isdir(d))
+
+
+def node_id(values):
+    return "|".join(str(v) for v in values)
+
+
+def column_type(values):
+    types = {type(v) for v in values if v is not None}
+    if not types:
+        return "string"
+    if types == {bool}:
+        return "boolean"
+    if types == {int}:
+        return "long"
+    if types <= {int, float}:
+        return "double"
+    if types == {list}:
+        inner = {type(x) for v in values if v is not None for x in v}
+        if inner == {int}:
+            return "long[]"
+        return "double[]" if inner and inner <= {int, float} else "string[]"
+    return "string"
+
+
+def format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ARRAY_DELIMITER.join(str(v) for v in value)
+    return value
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+# ------------------------ Corpus Collection ------------------------
+
+def collect_corpus(data_root, tournament_name, ledger):
+    """Merge every match batch of the corpus into one deduplicated MatchBatch.
+
+    Every match is also recorded in ledger, whose player aggregates and leaderboards become the
+    PlayerCareer, PlayerSeason and Leaderboard nodes.
+    """
+    corpus = MatchBatch()
+    first_info = None
+    matches = 0
+
+    for season_dir in season_directories(data_root):
+        for file in sorted(glob.glob(os.path.join(season_dir, "*.json"))):
+            try:
+                data = load_match(file)
+            except json.JSONDecodeError as e:
+                logging.error(f"JSON decode error in file {file}: {e}")
+                continue
+
+            batch, season_stats = build_match_batch(data, file, tournament_name)
+            if batch is None:
+                continue
+            ledger.record(file, batch.match_id, batch.revision, season_stats, batch.player_stats)
+            if first_info is None:
+                first_info = data.get('info', {})
+            matches += 1
+
+            for group, rows in batch.nodes.items():
+                target = corpus.nodes.setdefault(group, {})
+                for values, props in rows.items():
+                    target.setdefault(values, {}).update(props)
+            for group, rows in batch.relationships.items():
+                target = corpus.relationships.setdefault(group, {})
+                for ends, props in rows.items():
+                    target.setdefault(ends, {}).update(props)
+
+    if matches:
+        tournament = corpus.merge_node("Tournament", "name", tournament_properties(first_info, tournament_name))
+        names = ledger.players.names
+        for season, stats in ledger.season_stats().items():
+            season_ref = corpus.merge_node("Season", "year", {"year": season, **stats.summary(),
+                                                              **ledger.leaderboards.leaders(season, names)})
+            add_leaderboards(corpus, ledger, season, season_ref)
+            ledger.finalized(season)
+        add_leaderboards(corpus, ledger, ALL_TIME, tournament)
+        add_player_aggregates(corpus, ledger)
+
+    return corpus, matches
+
+
+def add_leaderboards(corpus, ledger, scope, owner):
+    for record in ledger.leaderboards.records(scope, ledger.players.names):
+        board = corpus.merge_node("Leaderboard", "leaderboard_key", record)
+        corpus.merge_relationship(owner, "HAS_LEADERBOARD", board)
+
+
+def add_player_aggregates(corpus, ledger):
+    """PlayerCareer and PlayerSeason nodes as write_player_aggregates would write them."""
+    player_ids = set(ledger.unsynced_players)
+    careers, seasons = ledger.players.records(player_ids)
+    for record in careers:
+        career = corpus.merge_node("PlayerCareer", "player_id", record)
+        corpus.merge_relationship(corpus.ref("Player", "registry_id", record["player_id"]), "HAS_CAREER", career)
+    for record in seasons:
+        player_season = corpus.merge_node("PlayerSeason", ("player_id", "season"), record)
+        corpus.merge_relationship(corpus.ref("Player", "registry_id", record["player_id"]),
+                                  "HAS_SEASON_STATS", player_season)
+        corpus.merge_relationship(player_season, "IN_SEASON", corpus.ref("Season", "year", record["season"]))
+    ledger.players_synced(player_ids)
+
+# ------------------------ CSV Export ------------------------
+
+def export_bulk_csv(data_root, out_dir, tournament_name=TOURNAMENT_NAME, ledger_path=LEDGER_PATH):
+    """Write neo4j-admin import CSVs for the whole corpus and return the import command.
+
+    The import ledger describing the exported corpus is written next to the CSVs, and import.sh
+    installs it at ledger_path once neo4j-admin succeeds, so the next incremental import only
+    sees files changed since the export.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    snapshot = os.path.join(out_dir, "import_ledger.json")
+    for path in (snapshot, f"{snapshot}.journal"):
+        if os.path.exists(path):
+            os.remove(path)
+    ledger = ImportLedger(snapshot, fsync=False)
+    corpus, matches = collect_corpus(data_root, tournament_name, ledger)
+    ledger.save()
+
+    node_args = []
+    for (label, keys), rows in sorted(corpus.nodes.items()):
+        columns = sorted({k for props in rows.values() for k in props})
+        header = [f":ID({label})"]
+        for column in columns:
+            header.append(f"{column}:{column_type([props.get(column) for props in rows.values()])}")
+        header.append(":LABEL")
+        data = [[node_id(values)] + [format_value(props.get(c)) for c in columns] + [label]
+                for values, props in sorted(rows.items(), key=lambda item: node_id(item[0]))]
+        filename = f"nodes_{label}.csv"
+        write_csv(os.path.join(out_dir, filename), header, data)
+        node_args.append(f"--nodes={label}={filename}")
+        logging.info(f"Wrote {len(data)} {label} nodes to {filename}")
+
+    rel_args = []
+    for (start_label, _, rel_type, end_label, _), rows in sorted(corpus.relationships.items()):
+        columns = sorted({k for props in rows.values() for k in props})
+        header = [f":START_ID({start_label})", f":END_ID({end_label})"]
+        for column in columns:
+            header.append(f"{column}:{column_type([props.get(column) for props in rows.values()])}")
+        header.append(":TYPE")
+        data = [[node_id(start), node_id(end)] + [format_value(props.get(c)) for c in columns] + [rel_type]
+                for (start, end), props in sorted(rows.items(), key=lambda item: (node_id(item[0][0]), node_id(item[0][1])))]
+        filename = f"rels_{start_label}_{rel_type}_{end_label}.csv"
+        write_csv(os.path.join(out_dir, filename), header, data)
+        rel_args.append(f"--relationships={rel_type}={filename}")
+        logging.info(f"Wrote {len(data)} {rel_type} relationships to {filename}")
+
+    command = " \\\n    ".join(["neo4j-admin database import full", f"--array-delimiter='{ARRAY_DELIMITER}'"]
+                                + node_args + rel_args + ["neo4j"])
+    with open(os.path.join(out_dir, "import.sh"), 'w') as f:
+        f.write(f"#!/bin/sh\nset -e\ncd \"$(dirname \"$0\")\"\n{command}\n"
+                f"cp import_ledger.json '{os.path.abspath(ledger_path)}'\n")
+    logging.info(f"Exported {matches} matches to {out_dir}")
+    return matches, command
+
+# ------------------------ Main Execution ------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate neo4j-admin bulk import CSVs from the Cricsheet corpus.")
+    parser.add_argument("out_dir", help="Directory to write the CSV files and import.sh into")
+    parser.add_argument("--data-root", default=DATA_ROOT, help="Directory containing the S*-* season folders")
+    parser.add_argument("--tournament", default=TOURNAMENT_NAME)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
+    matches, command = export_bulk_csv(args.data_root, args.out_dir, args.tournament)
+    print(f"Exported {matches} matches. Stop the database, then run:\n{command}")
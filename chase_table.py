@@ -0,0 +1,247 @@
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+from delivery_store import STORE_DIR, build_store, load_store
+
+# ------------------------ Configuration ------------------------
+
+CHASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chase_table")
+CHASE_VERSION = 2   # 2: probability is monotone in runs, balls and wickets
+
+BALLS = 120         # legal balls in a full T20 innings
+WICKETS = 10
+MAX_RUNS = 300      # runs required above this share the last row
+
+# A cell's win rate is shrunk towards the rate of the smallest (runs, balls, wickets) neighbourhood
+# around it that holds at least MIN_PRIOR_STATES observed states
+PRIOR_WINDOWS = ((2, 3, 0), (4, 6, 0), (8, 12, 1), (16, 24, 2), (32, 36, WICKETS))
+MIN_PRIOR_STATES = 30
+PRIOR_STRENGTH = 5.0
+
+# ------------------------ Chase Replay ------------------------
+
+def _exclusive_cumsum(values, starts):
+    """Running total before each row, restarting at every row where starts is set."""
+    totals = np.cumsum(values) - values
+    return totals - totals[starts][np.cumsum(starts) - 1]
+
+
+def chase_states(store):
+    """State before every delivery of every completed, unrevised chase in a DeliveryStore.
+
+    A chase is the second innings (super overs aside) of a scheduled 20-over match that ended
+    in a win or a tie without a revised target. Returns (runs_required, balls_remaining,
+    wickets_in_hand, outcome) arrays; outcome is 1 for a won chase, 0.5 for a tie, 0 otherwise.
+    """
+    c = store.columns
+    matches = store.matches
+    match = np.asarray(c["match"], dtype=np.int64)
+    innings = np.asarray(c["innings"])
+    regular = ~np.asarray(c["super_over"])
+    runs_total = np.asarray(c["runs_total"], dtype=np.int64)
+
+    eligible = np.array([m.get("overs") == BALLS // 6 and m.get("method") is None
+                         and (m.get("winner") is not None or m.get("result") == "tie") for m in matches], dtype=bool)
+    first = regular & (innings == 1)
+    targets = np.bincount(match[first], weights=runs_total[first], minlength=len(matches)).astype(np.int64) + 1
+
+    rows = np.flatnonzero(regular & (innings == 2) & eligible[match])
+    chase = match[rows]
+    starts = np.ones(len(rows), dtype=bool)
+    starts[1:] = chase[1:] != chase[:-1]
+
+    runs_required = targets[chase] - _exclusive_cumsum(runs_total[rows], starts)
+    balls_remaining = BALLS - _exclusive_cumsum(np.asarray(c["is_legal"], dtype=np.int64)[rows], starts)
+    wickets_in_hand = WICKETS - _exclusive_cumsum(np.asarray(c["wickets"], dtype=np.int64)[rows], starts)
+
+    team = np.asarray(c["batting_team"])[rows]
+    won = np.array([store.team_id(m.get("winner")) if m.get("winner") else -2 for m in matches])[chase] == team
+    tied = np.array([m.get("result") == "tie" for m in matches], dtype=bool)[chase]
+    outcome = np.where(won, 1.0, np.where(tied, 0.5, 0.0))
+    return runs_required, balls_remaining, wickets_in_hand, outcome
+
+# ------------------------ Table ------------------------
+
+def _cells(runs_required, balls_remaining, wickets_in_hand):
+    return (np.clip(runs_required, 0, MAX_RUNS),
+            np.clip(balls_remaining, 0, BALLS),
+            np.clip(wickets_in_hand, 0, WICKETS))
+
+
+def _box_sums(table, window):
+    """Sum of table over the box of +- window[axis] around every cell, from a summed-area table."""
+    area = np.zeros(tuple(n + 1 for n in table.shape))
+    area[1:, 1:, 1:] = table.cumsum(axis=0).cumsum(axis=1).cumsum(axis=2)
+    bounds = []
+    for n, w in zip(table.shape, window):
+        i = np.arange(n)
+        bounds.append((np.clip(i - w, 0, None), np.clip(i + w + 1, None, n)))
+    (r0, r1), (b0, b1), (w0, w1) = bounds
+    total = np.zeros(table.shape)
+    for r, b, w, sign in ((r1, b1, w1, 1), (r0, b1, w1, -1), (r1, b0, w1, -1), (r1, b1, w0, -1),
+                          (r0, b0, w1, 1), (r0, b1, w0, 1), (r1, b0, w0, 1), (r0, b0, w0, -1)):
+        total += sign * area[np.ix_(r, b, w)]
+    return total
+
+
+def smooth(wins, states):
+    """Win probability per cell: observed wins shrunk towards the nearest well-populated neighbourhood.
+
+    Cells with no such neighbourhood (far more runs needed than any chase faced with those
+    balls) take the value of the nearest such cell needing fewer runs. The result is made
+    monotone in every axis.
+    """
+    prior = np.full(states.shape, np.nan)
+    for window in PRIOR_WINDOWS:
+        window_states = _box_sums(states, window)
+        ready = np.isnan(prior) & (window_states >= MIN_PRIOR_STATES)
+        prior[ready] = _box_sums(wins, window)[ready] / window_states[ready]
+    probability = (wins + PRIOR_STRENGTH * prior) / (states + PRIOR_STRENGTH)
+    runs = np.arange(states.shape[0])[:, None, None]
+    nearest = np.maximum.accumulate(np.where(np.isnan(prior), 0, runs), axis=0)
+    probability = np.take_along_axis(probability, nearest, axis=0)
+    overall = wins.sum() / states.sum() if states.sum() else 0.5
+    probability[np.isnan(probability)] = overall
+    return _monotone(probability)
+
+
+def _monotone(probability):
+    """The table made to never favour needing more runs, fewer balls or fewer wickets.
+
+    Cells shrunk from a few deliveries of one chase can still sit above easier ones. Along each
+    axis in turn the table becomes the mean of its running upper and lower monotone envelopes,
+    which stays monotone along the axes already done.
+    """
+    for axis, increasing in ((0, False), (1, True), (2, True)):
+        rise, fall = (np.maximum, np.minimum) if increasing else (np.minimum, np.maximum)
+        forward = rise.accumulate(probability, axis=axis)
+        backward = np.flip(fall.accumulate(np.flip(probability, axis=axis), axis=axis), axis=axis)
+        probability = (forward + backward) / 2
+    return probability
+
+
+class ChaseTable:
+    """Dense (runs required, balls remaining, wickets in hand) table of chase outcomes.
+
+    states counts the observed deliveries faced in each state, wins sums their outcomes and
+    probability is the smoothed win probability of the chasing side. States the chase cannot
+    continue from are exact: target reached is 1, balls or wickets run out is 0 (0.5 for scores
+    level). Lookups index the array directly; annotate() does whole arrays of states.
+    """
+
+    def __init__(self, wins, states, probability=None):
+        self.wins = wins
+        self.states = states
+        self.probability = smooth(wins, states) if probability is None else probability
+        if probability is None:
+            self._settle_terminal_states()
+
+    def _settle_terminal_states(self):
+        p = self.probability
+        p[:, 0, :] = 0.0
+        p[:, :, 0] = 0.0
+        p[1, 0, :] = 0.5
+        p[1, :, 0] = 0.5
+        p[0] = 1.0
+        # The terminal states are the first cell of every axis and its extreme, so running
+        # min/max from them keeps them exact and settles the cells next to them monotonically
+        np.minimum.accumulate(p, axis=0, out=p)
+        np.maximum.accumulate(p, axis=1, out=p)
+        np.maximum.accumulate(p, axis=2, out=p)
+
+    @classmethod
+    def from_states(cls, runs_required, balls_remaining, wickets_in_hand, outcome):
+        shape = (MAX_RUNS + 1, BALLS + 1, WICKETS + 1)
+        cells = np.ravel_multi_index(_cells(runs_required, balls_remaining, wickets_in_hand), shape)
+        size = int(np.prod(shape))
+        states = np.bincount(cells, minlength=size).reshape(shape).astype(np.float64)
+        wins = np.bincount(cells, weights=outcome, minlength=size).reshape(shape)
+        return cls(wins, states)
+
+    def lookup(self, runs_required, balls_remaining, wickets_in_hand):
+        """Win probability of the chasing side in one match state."""
+        return float(self.probability[min(max(runs_required, 0), MAX_RUNS),
+                                      min(max(balls_remaining, 0), BALLS),
+                                      min(max(wickets_in_hand, 0), WICKETS)])
+
+    def annotate(self, runs_required, balls_remaining, wickets_in_hand):
+        """Win probabilities for arrays of match states."""
+        return self.probability[_cells(np.asarray(runs_required), np.asarray(balls_remaining),
+                                       np.asarray(wickets_in_hand))]
+
+    def save(self, out_dir=CHASE_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        for name in ("wins", "states", "probability"):
+            np.save(os.path.join(out_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(out_dir, "table.json"), 'w') as f:
+            json.dump({"version": CHASE_VERSION, "shape": list(self.states.shape),
+                       "chase_states": int(self.states.sum())}, f)
+
+
+def load_chase_table(table_dir=CHASE_DIR):
+    with open(os.path.join(table_dir, "table.json"), 'r') as f:
+        meta = json.load(f)
+    if meta.get("version") != CHASE_VERSION:
+        raise ValueError(f"Chase table in {table_dir} has version {meta.get('version')}, "
+                         f"expected {CHASE_VERSION}. Rebuild it.")
+    return ChaseTable(*(np.load(os.path.join(table_dir, f"{name}.npy")) for name in ("wins", "states", "probability")))
+
+
+def build_chase_table(store):
+    table = ChaseTable.from_states(*chase_states(store))
+    logging.info(f"Built chase table from {int(table.states.sum())} chase deliveries "
+                 f"({int((table.states > 0).sum())} observed states)")
+    return table
+
+# ------------------------ Innings Annotation ------------------------
+
+def annotate_innings(table, store, match_id, target=None):
+    """State and win probability before every delivery of a match's chase.
+
+    The target defaults to the first innings total plus one; pass the revised target for
+    rain-affected matches. Returns a dict of arrays aligned with the store rows in "row".
+    """
+    c = store.columns
+    match_row = store.match_row(match_id)
+    if match_row == -1:
+        raise KeyError(f"Match {match_id} is not in the delivery store")
+    # Rows are stored match by match, so the match is one slice
+    start, stop = np.searchsorted(c["match"], np.array([match_row, match_row + 1], dtype=c["match"].dtype))
+    regular = ~np.asarray(c["super_over"][start:stop])
+    innings = np.asarray(c["innings"][start:stop])
+    rows = start + np.flatnonzero(regular & (innings == 2))
+    if target is None:
+        target = int(np.asarray(c["runs_total"][start:stop], dtype=np.int64)[regular & (innings == 1)].sum()) + 1
+
+    starts = np.zeros(len(rows), dtype=bool)
+    starts[:1] = True
+    runs_required = target - _exclusive_cumsum(np.asarray(c["runs_total"][rows], dtype=np.int64), starts)
+    balls_remaining = BALLS - _exclusive_cumsum(np.asarray(c["is_legal"][rows], dtype=np.int64), starts)
+    wickets_in_hand = WICKETS - _exclusive_cumsum(np.asarray(c["wickets"][rows], dtype=np.int64), starts)
+    return {
+        "row": rows,
+        "over": np.asarray(c["over"])[rows],
+        "ball": np.asarray(c["ball"])[rows],
+        "runs_required": runs_required,
+        "balls_remaining": balls_remaining,
+        "wickets_in_hand": wickets_in_hand,
+        "win_probability": table.annotate(runs_required, balls_remaining, wickets_in_hand),
+    }
+
+# ------------------------ Main Execution ------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the chase state table from the delivery store.")
+    parser.add_argument("--store", default=STORE_DIR, help="Delivery store to read; built from the corpus if missing")
+    parser.add_argument("--out", default=CHASE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
+    store = load_store(args.store) if os.path.exists(os.path.join(args.store, "dictionaries.json")) else build_store()
+    table = build_chase_table(store)
+    table.save(args.out)
+    print(f"Saved chase table of {int(table.states.sum())} chase deliveries to {args.out}")
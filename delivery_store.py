@@ -0,0 +1,227 @@
+import argparse
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+
+from ball_index import PHASE_TABLE, PHASES
+from match_cache import load_match
+
+# ------------------------ Configuration ------------------------
+
+DATA_ROOT = "data/ipl_matches"
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "delivery_store")
+STORE_VERSION = 2   # 2: matches carry the outcome and scheduled overs
+
+EXTRAS_TYPES = ("wides", "noballs", "byes", "legbyes", "penalty")
+NO_ID = -1
+
+# Column name -> dtype. Every column has one row per delivery in the corpus.
+COLUMNS = {
+    "match": np.int32,          # row in the matches table
+    "innings": np.int8,         # 1-based innings number within the match
+    "super_over": np.bool_,
+    "batting_team": np.int16,   # teams dictionary
+    "over": np.int8,            # 0-based, as in Cricsheet
+    "ball": np.int8,            # 1-based legal-ball index within the over
+    "delivery": np.int8,        # 1-based position in the over, illegal deliveries included
+    "batter": np.int32,         # players dictionary
+    "bowler": np.int32,
+    "non_striker": np.int32,
+    "runs_batter": np.int8,
+    "runs_extras": np.int8,
+    "runs_total": np.int8,
+    "wides": np.int8,
+    "noballs": np.int8,
+    "byes": np.int8,
+    "legbyes": np.int8,
+    "penalty": np.int8,
+    "is_legal": np.bool_,
+    "wickets": np.int8,         # dismissals on this delivery (run outs can make it 2)
+    "wicket_kind": np.int8,     # wicket kinds dictionary, NO_ID when no wicket
+    "player_out": np.int32,
+    "phase": np.int8,           # index into PHASES, NO_ID for super overs
+}
+
+# ------------------------ Store ------------------------
+
+class DeliveryStore:
+    """Columnar ball-by-ball table of the whole corpus.
+
+    Columns are fixed-width NumPy arrays (memory-mapped when loaded from disk); names are
+    dictionary-encoded into the players, teams and wicket_kinds lists.
+    """
+
+    def __init__(self, columns, matches, players, teams, wicket_kinds):
+        self.columns = columns
+        self.matches = matches
+        self.players = players
+        self.teams = teams
+        self.wicket_kinds = wicket_kinds
+        self._player_index = None
+        self._match_index = None
+
+    def __len__(self):
+        return len(self.columns["match"])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def player_id(self, key):
+        """Dictionary id for a registry id or player name, or NO_ID."""
+        if self._player_index is None:
+            self._player_index = {}
+            for i, player in enumerate(self.players):
+                self._player_index[player["registry_id"]] = i
+                self._player_index.setdefault(player["name"], i)
+        return self._player_index.get(key, NO_ID)
+
+    def player_name(self, player_id):
+        return self.players[player_id]["name"] if player_id != NO_ID else None
+
+    def team_id(self, name):
+        return self.teams.index(name) if name in self.teams else NO_ID
+
+    def match_row(self, match_id):
+        if self._match_index is None:
+            self._match_index = {m["match_id"]: i for i, m in enumerate(self.matches)}
+        return self._match_index.get(match_id, NO_ID)
+
+    def season_column(self):
+        """Season year of every delivery, via the matches table."""
+        seasons = np.array([int(m["season"]) for m in self.matches], dtype=np.int16)
+        return seasons[self.columns["match"]]
+
+    def save(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(out_dir, "dictionaries.json"), 'w') as f:
+            json.dump({
+                "version": STORE_VERSION,
+                "rows": len(self),
+                "matches": self.matches,
+                "players": self.players,
+                "teams": self.teams,
+                "wicket_kinds": self.wicket_kinds,
+            }, f)
+
+# ------------------------ Build ------------------------
+
+class _Dictionary:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def encode(self, key, value=None):
+        if key is None:
+            return NO_ID
+        if key not in self.ids:
+            self.ids[key] = len(self.values)
+            self.values.append(key if value is None else value)
+        return self.ids[key]
+
+
+def build_store(data_root=DATA_ROOT, files=None):
+    """Columnar store of every match file under data_root, or of the given files only."""
+    rows = {name: [] for name in COLUMNS}
+    matches = []
+    players = _Dictionary()
+    teams = _Dictionary()
+    kinds = _Dictionary()
+
+    if files is None:
+        files = sorted(glob.glob(os.path.join(data_root, "S*-*", "*.json")))
+    for file in files:
+        data = load_match(file)
+        info = data.get('info', {})
+        registry = info.get('registry', {}).get('people', {})
+        match_number = info.get('event', {}).get('match_number')
+        match_date = info.get('dates', [None])[0]
+        outcome = info.get('outcome', {})
+
+        def player(name):
+            registry_id = registry.get(name)
+            if registry_id is None:
+                return NO_ID
+            return players.encode(registry_id, {"registry_id": registry_id, "name": name})
+
+        match_row = len(matches)
+        matches.append({
+            "match_id": f"{match_number}_{match_date}",
+            "file_id": os.path.splitext(os.path.basename(file))[0],
+            "season": info.get('season'),
+            "date": match_date,
+            "teams": info.get('teams', []),
+            "overs": info.get('overs'),
+            "winner": outcome.get('winner'),
+            "result": outcome.get('result'),     # "tie" or "no result" when there is no winner
+            "method": outcome.get('method'),     # e.g. "D/L" for a revised target
+        })
+
+        for i, innings in enumerate(data.get('innings', [])):
+            is_super_over = innings.get('super_over', False)
+            team = teams.encode(innings.get('team'))
+            for over_data in innings.get('overs', []):
+                over = over_data.get('over')
+                legal_ball = 0
+                for position, delivery in enumerate(over_data.get('deliveries', []), start=1):
+                    runs = delivery.get('runs', {})
+                    extras = delivery.get('extras', {})
+                    wickets = delivery.get('wickets', [])
+                    is_legal = "wides" not in extras and "noballs" not in extras
+                    ball = legal_ball + 1
+
+                    rows["match"].append(match_row)
+                    rows["innings"].append(i + 1)
+                    rows["super_over"].append(is_super_over)
+                    rows["batting_team"].append(team)
+                    rows["over"].append(over)
+                    rows["ball"].append(ball)
+                    rows["delivery"].append(position)
+                    rows["batter"].append(player(delivery.get('batter')))
+                    rows["bowler"].append(player(delivery.get('bowler')))
+                    rows["non_striker"].append(player(delivery.get('non_striker')))
+                    rows["runs_batter"].append(runs.get('batter', 0))
+                    rows["runs_extras"].append(runs.get('extras', 0))
+                    rows["runs_total"].append(runs.get('total', 0))
+                    for extras_type in EXTRAS_TYPES:
+                        rows[extras_type].append(extras.get(extras_type, 0))
+                    rows["is_legal"].append(is_legal)
+                    rows["wickets"].append(len(wickets))
+                    rows["wicket_kind"].append(kinds.encode(wickets[0].get('kind')) if wickets else NO_ID)
+                    rows["player_out"].append(player(wickets[0].get('player_out')) if wickets else NO_ID)
+
+                    if is_legal:
+                        legal_ball += 1
+
+    # Phases in one pass over the whole corpus, from the 1-based over as the importers classify it
+    rows["phase"] = np.where(rows["super_over"], NO_ID, PHASE_TABLE.classify(np.add(rows["over"], 1), rows["ball"]))
+    columns = {name: np.array(values, dtype=COLUMNS[name]) for name, values in rows.items()}
+    logging.info(f"Built delivery store: {len(columns['match'])} deliveries from {len(matches)} matches")
+    return DeliveryStore(columns, matches, players.values, teams.values, kinds.values)
+
+
+def load_store(store_dir=STORE_DIR, mmap=True):
+    with open(os.path.join(store_dir, "dictionaries.json"), 'r') as f:
+        meta = json.load(f)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"Delivery store in {store_dir} has version {meta.get('version')}, expected {STORE_VERSION}. Rebuild it.")
+    columns = {name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+               for name in COLUMNS}
+    return DeliveryStore(columns, meta["matches"], meta["players"], meta["teams"], meta["wicket_kinds"])
+
+# ------------------------ Main Execution ------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar ball-by-ball delivery store.")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--out", default=STORE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
+    store = build_store(args.data_root)
+    store.save(args.out)
+    print(f"Saved {len(store)} deliveries from {len(store.matches)} matches to {args.out}")
@@ -0,0 +1,70 @@
+import threading
+from collections import Counter
+
+# ------------------------ Dimension Cache ------------------------
+
+class DimensionCache:
+    """Thread-safe record of the dimension nodes and relationships merged in this session.
+
+    Keys are tuples whose first element is the label or relationship type, e.g.
+    ("Team", ("Mumbai Indians",)) or ("PLAYS_FOR", (registry_id,), (team,)). The per-entity
+    importer also keeps the bound py2neo Node for each dimension key so later matches can
+    link to it without another MERGE.
+    """
+
+    def __init__(self):
+        self._merged = set()
+        self._nodes = {}
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def cached(self, keys):
+        """Subset of keys already merged; counts a hit or miss for each key."""
+        with self._lock:
+            found = {key for key in keys if key in self._merged}
+            for key in keys:
+                (self.hits if key in found else self.misses)[key[0]] += 1
+        return found
+
+    def seen(self, key):
+        return bool(self.cached([key]))
+
+    def mark(self, keys):
+        with self._lock:
+            self._merged.update(keys)
+
+    def get_node(self, key):
+        with self._lock:
+            node = self._nodes.get(key)
+            self.hits[key[0]] += node is not None
+            self.misses[key[0]] += node is None
+            return node
+
+    def put_node(self, key, node):
+        with self._lock:
+            self._nodes.setdefault(key, node)
+            self._merged.add(key)
+            return self._nodes[key]
+
+    def clear(self):
+        with self._lock:
+            self._merged.clear()
+            self._nodes.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def hit_rate(self, category=None):
+        if category is None:
+            hits, total = sum(self.hits.values()), sum(self.hits.values()) + sum(self.misses.values())
+        else:
+            hits, total = self.hits[category], self.hits[category] + self.misses[category]
+        return hits / total if total else 0.0
+
+    def report(self):
+        lines = [f"Dimension cache: {self.hit_rate():.1%} hit rate "
+                 f"({sum(self.hits.values())} skipped writes, {sum(self.misses.values())} merges)"]
+        for category in sorted(set(self.hits) | set(self.misses)):
+            lines.append(f"  {category:<16} {self.hit_rate(category):6.1%}  "
+                         f"hits={self.hits[category]} misses={self.misses[category]}")
+        return "\n".join(lines)
@@ -1,41 +1,239 @@
+import argparse
+import logging
+import os
+import re
+import shutil
+import time
+
 from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError
+
+from import_ledger import LEDGER_PATH, ImportLedger
+from matchups import MATCHUP_DIR, sync_matchups
 
 # Database connection details
 URI = "bolt://localhost:7687"  # Replace with your Neo4j URI
 USERNAME = "neo4j"  # Replace with your username
 PASSWORD = "Myapple7@"  # Replace with your password
+DATABASE = "neo4j"
 
-def empty_database(tx, batch_size=10000):
-    # Delete relationships in batches
-    while True:
-        result = tx.run(f"""
-            MATCH ()-[r]->()
-            WITH r LIMIT {batch_size}
-            DELETE r
-            RETURN count(r) as deleted
-        """)
-        if result.single()["deleted"] == 0:
-            break
+BATCH_SIZE = 10000  # entities deleted per transaction
+
+# ------------------------ Queries ------------------------
+
+# Each query deletes at most $batch_size entities and reports how many it deleted; the caller
+# repeats it, one transaction per batch, until nothing is left.
+DELETE_RELATIONSHIPS = """
+    MATCH ()-[r]->()
+    WITH r LIMIT $batch_size
+    DELETE r
+    RETURN count(r) AS deleted
+"""
+
+DELETE_NODES = """
+    MATCH (n)
+    WITH n LIMIT $batch_size
+    DETACH DELETE n
+    RETURN count(n) AS deleted
+"""
+
+# Single auto-commit statement; the server commits every $batch_size rows
+DELETE_ALL_IN_TRANSACTIONS = """
+    MATCH (n)
+    CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+MATCH_IDS_OF_SEASON = "MATCH (m:Match {season: $season}) RETURN m.match_id AS match_id"
+
+# Match-owned nodes, children first. Phase has no match_id so it is reached through its Innings.
+MATCH_OWNED_DELETES = [
+    ("Phase", """
+        MATCH (i:Innings)-[:HAS_PHASE]->(n:Phase) WHERE i.match_id IN $match_ids
+        WITH n LIMIT $batch_size DETACH DELETE n RETURN count(n) AS deleted"""),
+] + [
+    (label, f"""
+        MATCH (n:{label}) WHERE n.match_id IN $match_ids
+        WITH n LIMIT $batch_size DETACH DELETE n RETURN count(n) AS deleted""")
+    for label in ("Dismissal", "Partnership", "Delivery", "Over", "Innings", "PlayerMatchPerformance", "Match")
+]
 
-    # Delete nodes in batches
+
+def label_delete_query(label):
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", label):
+        raise ValueError(f"Invalid label: {label!r}")
+    return f"""
+        MATCH (n:`{label}`)
+        WITH n LIMIT $batch_size
+        DETACH DELETE n
+        RETURN count(n) AS deleted
+    """
+
+# ------------------------ Batched Deletes ------------------------
+
+def delete_in_batches(run_batch, query, parameters=None, batch_size=BATCH_SIZE, description="entities"):
+    """Repeat a LIMIT $batch_size delete until it deletes nothing.
+
+    run_batch(query, parameters) runs one batch in its own transaction and returns the number
+    deleted, so no transaction ever holds more than batch_size deletions.
+    """
+    parameters = dict(parameters or {}, batch_size=batch_size)
+    total = 0
+    start = time.perf_counter()
     while True:
-        result = tx.run(f"""
-            MATCH (n)
-            WITH n LIMIT {batch_size}
-            DELETE n
-            RETURN count(n) as deleted
-        """)
-        if result.single()["deleted"] == 0:
+        deleted = run_batch(query, parameters)
+        if not deleted:
             break
+        total += deleted
+        elapsed = time.perf_counter() - start
+        logging.info(f"Deleted {total} {description} ({total / elapsed:.0f}/s)")
+    return total
+
+
+def purge_matches(run_batch, match_ids, batch_size=BATCH_SIZE):
+    """Delete the subgraphs of the given matches; shared dimension nodes are left alone.
+
+    Returns {label: deleted}. The import ledger is not touched; see forget_purged().
+    """
+    match_ids = list(match_ids)
+    return {label: delete_in_batches(run_batch, query, {"match_ids": match_ids}, batch_size, f"{label} nodes")
+            for label, query in MATCH_OWNED_DELETES}
+
+
+def forget_purged(match_ids, ledger_path=LEDGER_PATH, matchups_dir=MATCHUP_DIR):
+    """Drop purged matches from the import ledger, so the next import brings their files back and
+    recomputes their seasons, player aggregates and leaderboards without them. Their counts are
+    taken out of the matchup store too."""
+    if not ledger_exists(ledger_path):
+        return []
+    ledger = ImportLedger(ledger_path)
+    forgotten = ledger.forget_matches(match_ids)
+    if matchups_dir:
+        sync_matchups(ledger, matchups_dir)
+    ledger.save()
+    logging.info(f"Forgot {len(forgotten)} purged files in the import ledger")
+    return forgotten
+
 
-def main():
+def ledger_exists(ledger_path=LEDGER_PATH):
+    return os.path.exists(ledger_path) or os.path.exists(f"{ledger_path}.journal")
+
+
+def remove_ledger(ledger_path=LEDGER_PATH, matchups_dir=MATCHUP_DIR):
+    """Remove the import ledger and the matchup store built from the files it recorded."""
+    for path in (ledger_path, f"{ledger_path}.journal"):
+        if os.path.exists(path):
+            os.remove(path)
+    logging.info(f"Removed import ledger {ledger_path}")
+    if matchups_dir and os.path.isdir(matchups_dir):
+        shutil.rmtree(matchups_dir)
+        logging.info(f"Removed matchup store {matchups_dir}")
+
+
+def driver_batch_runner(driver, database=DATABASE):
+    def run_batch(query, parameters):
+        def work(tx):
+            return tx.run(query, parameters).single()["deleted"]
+        with driver.session(database=database) as session:
+            return session.execute_write(work)
+    return run_batch
+
+# ------------------------ Operations ------------------------
+
+def empty_database(driver, batch_size=BATCH_SIZE, database=DATABASE):
+    run_batch = driver_batch_runner(driver, database)
+    relationships = delete_in_batches(run_batch, DELETE_RELATIONSHIPS, batch_size=batch_size,
+                                      description="relationships")
+    nodes = delete_in_batches(run_batch, DELETE_NODES, batch_size=batch_size, description="nodes")
+    return {"relationships": relationships, "nodes": nodes}
+
+
+def empty_database_in_transactions(driver, batch_size=BATCH_SIZE, database=DATABASE):
+    with driver.session(database=database) as session:
+        summary = session.run(DELETE_ALL_IN_TRANSACTIONS, batch_size=batch_size).consume()
+    return {"relationships": summary.counters.relationships_deleted, "nodes": summary.counters.nodes_deleted}
+
+
+def recreate_database(driver, database=DATABASE):
+    """Drop and recreate the database: fastest reset, but it also drops indexes and constraints.
+
+    Needs Enterprise Edition; returns False when the server does not allow it.
+    """
+    try:
+        with driver.session(database="system") as session:
+            session.run("CREATE OR REPLACE DATABASE $name WAIT", name=database).consume()
+    except ClientError as e:
+        logging.warning(f"Cannot recreate database {database}: {e.message}")
+        return False
+    return True
+
+
+def purge_label(driver, label, batch_size=BATCH_SIZE, database=DATABASE):
+    return {label: delete_in_batches(driver_batch_runner(driver, database), label_delete_query(label),
+                                     batch_size=batch_size, description=f"{label} nodes")}
+
+
+def purge_season(driver, season, batch_size=BATCH_SIZE, database=DATABASE):
+    # Cricsheet seasons are integers except for split years such as "2007/08"
+    season = int(season) if str(season).isdigit() else season
+    with driver.session(database=database) as session:
+        match_ids = [r["match_id"] for r in session.run(MATCH_IDS_OF_SEASON, season=season)]
+    logging.info(f"Season {season}: purging {len(match_ids)} matches")
+    deleted = purge_matches(driver_batch_runner(driver, database), match_ids, batch_size)
+    forget_purged(match_ids)
+    return deleted
+
+# ------------------------ Main Execution ------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Empty the database, or purge one label, season or match.")
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--label", help="Delete every node with this label")
+    scope.add_argument("--season", help="Delete the matches of one season, e.g. 2024 or 2007/08")
+    scope.add_argument("--match-id", action="append", dest="match_ids", help="Delete one match (repeatable)")
+    scope.add_argument("--recreate", action="store_true",
+                       help="Drop and recreate the database (Enterprise only; falls back to batched deletes)")
+    parser.add_argument("--in-transactions", action="store_true",
+                        help="Delete everything with one CALL {} IN TRANSACTIONS statement")
+    parser.add_argument("--forget-ledger", action="store_true",
+                        help="Also remove the import ledger and matchup store, so the next import re-imports "
+                             "every file; required to empty the database or purge a label while a ledger exists")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args(argv)
+
+    # Season and match purges update the ledger themselves; anything wider would leave it
+    # listing matches the database no longer has, and the next import would skip them
+    wide = not (args.season or args.match_ids)
+    if wide and ledger_exists() and not args.forget_ledger:
+        parser.error(f"an import ledger exists at {LEDGER_PATH}; pass --forget-ledger to remove it as well")
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
     driver = GraphDatabase.driver(URI, auth=(USERNAME, PASSWORD))
-    
-    with driver.session() as session:
-        session.execute_write(empty_database)
-    
-    print("Database emptied successfully.")
-    driver.close()
+    start = time.perf_counter()
+    try:
+        if args.label:
+            deleted = purge_label(driver, args.label, args.batch_size, args.database)
+        elif args.season:
+            deleted = purge_season(driver, args.season, args.batch_size, args.database)
+        elif args.match_ids:
+            deleted = purge_matches(driver_batch_runner(driver, args.database), args.match_ids, args.batch_size)
+            forget_purged(args.match_ids)
+        elif args.recreate and recreate_database(driver, args.database):
+            deleted = {"database": "recreated"}
+        elif args.in_transactions:
+            deleted = empty_database_in_transactions(driver, args.batch_size, args.database)
+        else:
+            deleted = empty_database(driver, args.batch_size, args.database)
+    finally:
+        driver.close()
+    if wide and args.forget_ledger:
+        remove_ledger()
+
+    elapsed = time.perf_counter() - start
+    total = sum(v for v in deleted.values() if isinstance(v, int))
+    print(f"Deleted {deleted} in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} entities/s)")
+    print("Database emptied successfully." if not (args.label or args.season or args.match_ids)
+          else "Purge completed successfully.")
 
 if __name__ == "__main__":
     main()
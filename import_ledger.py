@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from leaderboards import Leaderboards
+from player_aggregates import PlayerAggregates
+from season_stats import SeasonStats, reduce_season_stats
+
+# ------------------------ Configuration ------------------------
+
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_ledger.json")
+SAVE_EVERY = 200   # journal entries before the snapshot is rewritten and the journal truncated
+FSYNC = True       # a checkpoint survives a machine crash, not just a crashed import
+
+NEW = "new"
+UNCHANGED = "unchanged"
+REVISED = "revised"
+
+# ------------------------ Helper Functions ------------------------
+
+def file_id(path):
+    """Cricsheet file id: the match file name without its extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# ------------------------ Ledger ------------------------
+
+class ImportLedger:
+    """Local record of every imported match file: content hash, Cricsheet revision, match_id and
+    the file's own season stats contribution.
+
+    classify() decides from the file alone whether it is new, unchanged or revised, so unchanged
+    files never reach the database, and season totals can be rebuilt from the ledger after a
+    partial run.
+
+    It is also the import checkpoint. Every change is appended to a journal next to the snapshot
+    as it happens (one line per committed match), so a crashed run resumes after its last
+    committed match. Seasons stay in unfinalized_seasons from their first recorded file until
+    their Season node is written, and files that failed are kept in dead_letters with the error
+    until a later import of the file succeeds.
+
+    Each entry also keeps the match's per-player contribution, and players holds the career and
+    season aggregates: a recorded match is added, and the contribution of the entry it replaces
+    (or of a forgotten one) is subtracted. Players changed since their aggregate nodes were last
+    written stay in unsynced_players. leaderboards keeps the top players of every season and
+    all-time current with the same contributions. Files recorded or forgotten since the matchup
+    store last took them in stay in unsynced_matchups.
+    """
+
+    def __init__(self, path=LEDGER_PATH, fsync=FSYNC):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._journal = None
+        self.entries = {}
+        self.dead_letters = {}
+        self.unfinalized_seasons = set()
+        self.unsynced_players = set()
+        self.unsynced_matchups = set()
+        self.players = PlayerAggregates()
+        self.leaderboards = Leaderboards()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+            self.entries = snapshot.get("files", {})
+            self.dead_letters = snapshot.get("dead_letters", {})
+            self.unfinalized_seasons = set(snapshot.get("unfinalized_seasons", []))
+            self.unsynced_players = set(snapshot.get("unsynced_players", []))
+            self.unsynced_matchups = set(snapshot.get("unsynced_matchups", []))
+        for entry in self.entries.values():
+            self.players.apply(entry.get("player_stats"))
+        self.leaderboards.rebuild(self.players)
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        replayed = 0
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line torn by the crash: everything before it was committed
+                    break
+                self._apply(change)
+                replayed += 1
+        self._unsaved = replayed
+        if replayed:
+            logging.info(f"Resumed import ledger: replayed {replayed} journal entries")
+
+    def _apply(self, change):
+        op, key = change["op"], change.get("id")
+        if op == "record":
+            old = self.entries.get(key)
+            if old is not None:
+                self._apply_players(old.get("player_stats"), sign=-1)
+            self.entries[key] = change["entry"]
+            self._apply_players(change["entry"].get("player_stats"))
+            self.dead_letters.pop(key, None)
+            self.unfinalized_seasons.add(change["entry"]["season_stats"]["season"])
+            self.unsynced_matchups.add(key)
+        elif op == "forget":
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self._apply_players(old.get("player_stats"), sign=-1)
+                # The Season node still counts the match until the season is finalized again,
+                # and the matchup store until it is synced
+                self.unfinalized_seasons.add(old["season_stats"]["season"])
+                self.unsynced_matchups.add(key)
+        elif op == "touch":
+            if key in self.entries:
+                self.entries[key]["mtime_ns"] = change["mtime_ns"]
+        elif op == "dead_letter":
+            attempts = self.dead_letters.get(key, {}).get("attempts", 0)
+            self.dead_letters[key] = dict(change["entry"], attempts=attempts + 1)
+        elif op == "finalized":
+            self.unfinalized_seasons.discard(change["season"])
+        elif op == "players_synced":
+            self.unsynced_players.difference_update(change["ids"])
+        elif op == "matchups_synced":
+            self.unsynced_matchups.difference_update(change["ids"])
+
+    def _apply_players(self, contributions, sign=1):
+        self.unsynced_players |= self.players.apply(contributions, sign=sign)
+        self.leaderboards.apply(self.players, contributions)
+
+    def _log_change(self, change):
+        # Caller holds the lock. Journal first, then apply: what is applied is also durable.
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a')
+        self._journal.write(json.dumps(change) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._apply(change)
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self._save_locked()
+
+    def classify(self, path):
+        entry = self.entries.get(file_id(path))
+        if entry is None:
+            return NEW, None
+        st = os.stat(path)
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return UNCHANGED, entry
+        if entry["sha1"] == file_hash(path):
+            # Same content with a new mtime: remember it, so the file is not hashed again
+            with self._lock:
+                self._log_change({"op": "touch", "id": file_id(path), "mtime_ns": st.st_mtime_ns})
+            return UNCHANGED, entry
+        return REVISED, entry
+
+    def record(self, path, match_id, revision, season_stats, player_stats=None):
+        st = os.stat(path)
+        entry = {
+            "path": os.path.abspath(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": file_hash(path),
+            "revision": revision,
+            "match_id": match_id,
+            "imported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "season_stats": season_stats.to_dict(),
+            "player_stats": player_stats or {},
+        }
+        with self._lock:
+            self._log_change({"op": "record", "id": file_id(path), "entry": entry})
+
+    def forget(self, path):
+        with self._lock:
+            if file_id(path) in self.entries:
+                self._log_change({"op": "forget", "id": file_id(path)})
+
+    def forget_matches(self, match_ids):
+        """Forget the files recorded under these match_ids, e.g. after their subgraphs were purged.
+        Returns the forgotten file ids."""
+        match_ids = set(match_ids)
+        with self._lock:
+            keys = [key for key, entry in self.entries.items() if entry["match_id"] in match_ids]
+            for key in keys:
+                self._log_change({"op": "forget", "id": key})
+        return keys
+
+    def dead_letter(self, path, error):
+        """Park a file that failed to import; retry_paths() lists them for a retry-only run."""
+        entry = {
+            "path": os.path.abspath(path),
+            "error": f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error),
+            "failed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._log_change({"op": "dead_letter", "id": file_id(path), "entry": entry})
+
+    def retry_paths(self):
+        with self._lock:
+            return [entry["path"] for entry in self.dead_letters.values()]
+
+    def players_synced(self, player_ids):
+        """Mark the aggregate nodes of these players as written from the current totals."""
+        with self._lock:
+            ids = sorted(set(player_ids) & self.unsynced_players)
+            if ids:
+                self._log_change({"op": "players_synced", "ids": ids})
+
+    def matchups_synced(self, file_ids):
+        """Mark these files as taken into the matchup store as currently recorded."""
+        with self._lock:
+            ids = sorted(set(file_ids) & self.unsynced_matchups)
+            if ids:
+                self._log_change({"op": "matchups_synced", "ids": ids})
+
+    def finalized(self, season):
+        """Mark a season's Season node as written from the current totals."""
+        with self._lock:
+            if season in self.unfinalized_seasons:
+                self._log_change({"op": "finalized", "season": season})
+
+    def season_stats(self, seasons=None):
+        """Season aggregates rebuilt from every recorded file, optionally limited to some seasons."""
+        with self._lock:
+            partials = [SeasonStats.from_dict(entry["season_stats"]) for entry in self.entries.values()]
+        return reduce_season_stats(p for p in partials if seasons is None or p.season in seasons)
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.entries, "dead_letters": self.dead_letters,
+                       "unfinalized_seasons": sorted(self.unfinalized_seasons, key=str),
+                       "unsynced_players": sorted(self.unsynced_players),
+                       "unsynced_matchups": sorted(self.unsynced_matchups)}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # The snapshot now holds everything journalled so far
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._unsaved = 0
+        logging.debug(f"Saved import ledger with {len(self.entries)} files")
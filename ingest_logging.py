@@ -0,0 +1,186 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+# ------------------------ Configuration ------------------------
+
+LOG_FILE = "importing.log"
+LOG_FORMAT = '%(asctime)s %(levelname)s:%(message)s'
+
+SAMPLE_FIRST = 5          # messages per category always written in full
+SAMPLE_PER_SECOND = 2.0   # after that, at most this many per category per second
+
+_listener = None
+_log_file = None
+_counters = None
+_sampling = None
+
+# ------------------------ Sampling and Counters ------------------------
+
+class SamplingFilter(logging.Filter):
+    """Rate-limits INFO/DEBUG records that carry a category (extra={"category": ...}).
+
+    The first SAMPLE_FIRST records of a category pass, then a token bucket allows
+    SAMPLE_PER_SECOND; suppressed records are only counted. Warnings, errors and records
+    without a category always pass.
+    """
+
+    def __init__(self, first=SAMPLE_FIRST, per_second=SAMPLE_PER_SECOND):
+        super().__init__()
+        self.first = first
+        self.per_second = per_second
+        self.seen = Counter()
+        self.suppressed = Counter()
+        self._tokens = defaultdict(float)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        category = getattr(record, "category", None)
+        if category is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            self.seen[category] += 1
+            if self.seen[category] <= self.first:
+                return True
+            now = time.monotonic()
+            tokens = min(self.per_second, self._tokens[category]
+                         + (now - self._last.get(category, now)) * self.per_second)
+            self._last[category] = now
+            if tokens >= 1:
+                self._tokens[category] = tokens - 1
+                return True
+            self._tokens[category] = tokens
+            self.suppressed[category] += 1
+            return False
+
+    def drain(self):
+        with self._lock:
+            suppressed = dict(self.suppressed)
+            self.suppressed.clear()
+        return suppressed
+
+
+class EventCounters:
+    """Thread-safe tallies such as ("merged", "players") reported as one line: "merged 22 players"."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, action, noun, n=1):
+        with self._lock:
+            self._counts[(action, noun)] += n
+
+    def drain(self):
+        with self._lock:
+            counts = dict(self._counts)
+            self._counts.clear()
+        return counts
+
+    @staticmethod
+    def format(counts):
+        by_action = defaultdict(list)
+        for (action, noun), n in sorted(counts.items()):
+            by_action[action].append(f"{n} {noun}")
+        return "; ".join(f"{action} {', '.join(parts)}" for action, parts in by_action.items())
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueues the record as is; the listener thread does all message formatting."""
+
+    def prepare(self, record):
+        return record
+
+# ------------------------ Setup ------------------------
+
+def setup_logging(filename=LOG_FILE, filemode='w', level=logging.INFO,
+                  first=SAMPLE_FIRST, per_second=SAMPLE_PER_SECOND):
+    """Route the root logger through a queue to a background file writer.
+
+    Callers only pay for a filter check and a queue put; formatting and file I/O happen on
+    the listener thread. Idempotent: later calls return the running listener.
+    """
+    global _listener, _log_file, _counters, _sampling
+    if _listener is not None:
+        return _listener
+
+    file_handler = logging.FileHandler(filename, mode=filemode)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    queue = SimpleQueue()
+    queue_handler = _DeferredQueueHandler(queue)
+    _sampling = SamplingFilter(first, per_second)
+    queue_handler.addFilter(_sampling)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _counters = EventCounters()
+    _log_file = filename
+    _listener = QueueListener(queue, file_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def init_worker_logging(filename, level=logging.INFO):
+    """ProcessPoolExecutor initializer: worker processes append to the log file directly.
+
+    A forked worker inherits the parent's queue handler, but not its listener thread.
+    """
+    if filename is None:
+        return
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.FileHandler(filename, mode='a')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(SamplingFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def log_file():
+    """File the background writer appends to, or None when setup_logging() was not called."""
+    return _log_file
+
+
+def log_sampled(category, msg, *args, level=logging.INFO):
+    """Log a repetitive message; arguments are formatted later, and only if it is sampled."""
+    logging.log(level, msg, *args, extra={"category": category})
+
+
+def count(action, noun, n=1):
+    """Tally an event instead of logging it, e.g. count("merged", "players")."""
+    if _counters is not None:
+        _counters.count(action, noun, n)
+
+
+def flush_counters():
+    """Write the tallies and suppressed message counts gathered since the last flush."""
+    if _counters is not None:
+        counts = _counters.drain()
+        if counts:
+            logging.info(EventCounters.format(counts))
+    if _sampling is not None:
+        suppressed = _sampling.drain()
+        if suppressed:
+            logging.info("Suppressed repetitive log lines: "
+                         + ", ".join(f"{category}={n}" for category, n in sorted(suppressed.items())))
+
+
+def shutdown_logging():
+    """Flush the tallies and stop the background writer once the queue is empty."""
+    global _listener
+    if _listener is None:
+        return
+    flush_counters()
+    _listener.stop()
+    _listener = None
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from queue import Empty, Queue
+
+from tqdm import tqdm
+
+from batch_writer import combine_batches, write_match_batch
+from ingest_logging import init_worker_logging, log_file
+from match_cache import load_match
+from match_transform import build_dimension_batch, build_match_batch
+from run_metrics import LOAD, NORMALIZE
+from season_stats import reduce_season_stats
+from write_control import TARGET_LATENCY, AdaptiveController, TokenBucket
+
+# ------------------------ Configuration ------------------------
+
+PARSE_WORKERS = 4
+WRITE_WORKERS = 2
+QUEUE_SIZE = 16
+
+_STOP = object()
+
+# ------------------------ Parse Stage (worker processes) ------------------------
+
+def parse_match(file, tournament_name, replaces_match_id=None):
+    """Load and transform one match file. Runs in a worker process, so it must stay picklable.
+
+    Returns (file, batch, season_stats, timings) where timings is {stage: (seconds, calls, bytes)}.
+    """
+    start = time.perf_counter()
+    try:
+        data = load_match(file)
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON decode error in file {file}: {e}")
+        return file, None, None, {}
+    loaded = time.perf_counter()
+
+    batch, season_stats = build_match_batch(data, file, tournament_name)
+    if batch is not None:
+        batch.replaces_match_id = replaces_match_id
+    timings = {LOAD: (loaded - start, 1, os.path.getsize(file)),
+               NORMALIZE: (time.perf_counter() - loaded, 1, 0)}
+    return file, batch, season_stats, timings
+
+# ------------------------ Dimension Phase ------------------------
+
+def load_dimensions(json_files, tournament_name, graph, dimension_cache):
+    """Phase one of a two-phase import: write every dimension node and relationship up front.
+
+    The keys are marked in dimension_cache, so the match batches written afterwards only MATCH
+    Season, Team, Player, Venue and Official by key instead of merging onto them from every
+    writer at once. Returns the number of dimension rows written.
+    """
+    batch = build_dimension_batch(((file, load_match(file)) for file in json_files), tournament_name)
+    batch.match_id = "dimensions"
+    write_match_batch(graph, batch, dimension_cache)
+    logging.info(f"Loaded {batch.node_count()} dimension nodes and {batch.relationship_count()} "
+                 f"dimension relationships from {len(json_files)} files")
+    return batch.node_count() + batch.relationship_count()
+
+# ------------------------ Write Stage (writer threads) ------------------------
+
+def _write_one(graph, file, batch, partial, fail, on_written, dimension_cache, metrics):
+    try:
+        with metrics.context(file, partial.season) if metrics is not None else nullcontext():
+            write_match_batch(graph, batch, dimension_cache)
+        if on_written is not None:
+            on_written(file, batch, partial)
+    except Exception as exc:
+        fail(file, exc)
+
+
+def _pace(batch, limits):
+    for bucket, unit in limits:
+        bucket.take(batch.group_count() if unit == "statements" else batch.node_count() + batch.relationship_count())
+
+
+def _take_group(queue, first, size):
+    # The first item was waited for; the rest of the group is only what is already queued
+    items = [first]
+    while len(items) < size:
+        try:
+            item = queue.get_nowait()
+        except Empty:
+            break
+        queue.task_done()
+        if item is _STOP:
+            queue.put(_STOP)
+            break
+        items.append(item)
+    return items
+
+
+def _write_group(graph, items, fail, on_written, dimension_cache, metrics, controller, limits):
+    """Write several queued matches in one transaction, paced by the controller and rate limits."""
+    batch = combine_batches(batch for _, batch, _ in items)
+    _pace(batch, limits)
+    controller.acquire()
+    try:
+        start = time.perf_counter()
+        if len(items) == 1:
+            _write_one(graph, *items[0], fail, on_written, dimension_cache, metrics)
+            controller.observe(time.perf_counter() - start, 1)
+            return
+        try:
+            write_match_batch(graph, batch, dimension_cache)
+        except Exception as exc:
+            # Keep one bad match from failing its neighbours: fall back to a transaction each
+            logging.warning(f"Group write of {len(items)} matches failed ({exc}); writing them one at a time")
+            for item in items:
+                _write_one(graph, *item, fail, on_written, dimension_cache, metrics)
+            return
+        controller.observe(time.perf_counter() - start, len(items))
+        if on_written is not None:
+            for file, match_batch, partial in items:
+                on_written(file, match_batch, partial)
+    finally:
+        controller.release()
+
+
+def _writer(queue, graph, progress, fail, on_written, dimension_cache, metrics,
+            controller=None, limits=()):
+    while True:
+        item = queue.get()
+        try:
+            if item is _STOP:
+                return
+            if controller is None:
+                _pace(item[1], limits)
+                _write_one(graph, *item, fail, on_written, dimension_cache, metrics)
+                progress.update(1)
+            else:
+                items = _take_group(queue, item, controller.batch_size)
+                _write_group(graph, items, fail, on_written, dimension_cache, metrics, controller, limits)
+                progress.update(len(items))
+        finally:
+            queue.task_done()
+
+# ------------------------ Pipeline ------------------------
+
+def run_pipeline(json_files, tournament_name, graph_factory,
+                 parse_workers=PARSE_WORKERS, write_workers=WRITE_WORKERS, queue_size=QUEUE_SIZE,
+                 replacements=None, on_written=None, on_failed=None, dimension_cache=None, metrics=None,
+                 adaptive=False, target_latency=TARGET_LATENCY, statements_per_second=None, rows_per_second=None):
+    """Parse files on a process pool and write the batches from a few writer threads.
+
+    Each writer thread gets its own graph from graph_factory. The batch queue is bounded,
+    and no more parse jobs are submitted while it is full, so parsing cannot outrun the writers.
+    replacements maps a file to the match_id whose subgraph its batch replaces, and
+    on_written(file, batch, season_stats) is called from the writer after each commit,
+    on_failed(file, exc) for each file that could not be parsed or written, and
+    dimension_cache (shared by all writers) skips dimension rows merged earlier in the session.
+    With a RunMetrics, parse timings from the workers are folded in and writes are attributed
+    to their file (graph_factory should return an InstrumentedGraph to time the writes).
+    With adaptive, an AdaptiveController groups queued matches into shared transactions and
+    limits the active writers (write_workers at most) to keep commit latency in target_latency;
+    its decisions are recorded as RunMetrics events. statements_per_second and rows_per_second
+    cap the write rate with token buckets.
+    Returns ({season: SeasonStats}, failed_files); the per-file partials are reduced once the
+    pool has drained.
+    """
+    replacements = replacements or {}
+    queue = Queue(maxsize=queue_size)
+    partials = {}
+    failures = []
+    lock = threading.Lock()
+    progress = tqdm(total=len(json_files), desc="Processing files")
+
+    def fail(file, exc):
+        logging.error(f"File {file} generated an exception: {exc}")
+        with lock:
+            failures.append(file)
+        if on_failed is not None:
+            on_failed(file, exc)
+
+    controller = AdaptiveController(write_workers, target_latency, metrics=metrics) if adaptive else None
+    limits = [(TokenBucket(rate), unit) for rate, unit in ((statements_per_second, "statements"),
+                                                           (rows_per_second, "rows")) if rate]
+
+    writers = [threading.Thread(target=_writer, daemon=True,
+                                args=(queue, graph_factory(), progress, fail, on_written, dimension_cache, metrics,
+                                      controller, limits))
+               for _ in range(write_workers)]
+    for thread in writers:
+        thread.start()
+
+    pending_files = iter(json_files)
+    in_flight = {}
+    max_in_flight = parse_workers * 2
+
+    # Forked workers inherit the queue handler but not its listener, so they log to the file directly
+    with ProcessPoolExecutor(max_workers=parse_workers, initializer=init_worker_logging,
+                             initargs=(log_file(),)) as executor:
+        def submit_next():
+            file = next(pending_files, None)
+            if file is not None:
+                in_flight[executor.submit(parse_match, file, tournament_name, replacements.get(file))] = file
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file = in_flight.pop(future)
+                try:
+                    _, batch, partial, timings = future.result()
+                except Exception as exc:
+                    fail(file, exc)
+                    progress.update(1)
+                    submit_next()
+                    continue
+                partials[file] = partial
+                if metrics is not None:
+                    metrics.add_timings(timings, file=file, season=partial.season if partial else None)
+                if batch is None:
+                    progress.update(1)
+                else:
+                    # Blocks while the writers are behind: this is the backpressure point
+                    queue.put((file, batch, partial))
+                submit_next()
+
+    for _ in writers:
+        queue.put(_STOP)
+    for thread in writers:
+        thread.join()
+    progress.close()
+    if controller is not None:
+        report = controller.report()
+        logging.info(f"Write controller: {len(report['decisions'])} adjustments, final batch size "
+                     f"{report['final_batch_size']}, concurrency {report['final_concurrency']}")
+    for bucket, unit in limits:
+        logging.info(f"Rate limit {bucket.rate:g} {unit}/s: writers waited {bucket.waited:.2f}s")
+        if metrics is not None:
+            metrics.event("rate_limit", unit=unit, rate=bucket.rate, waited_seconds=round(bucket.waited, 3))
+
+    season_stats = reduce_season_stats(partials[file] for file in sorted(partials) if file not in failures)
+    return season_stats, failures
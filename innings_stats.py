@@ -0,0 +1,152 @@
+import numpy as np
+
+from ball_index import PHASES
+
+# ------------------------ Configuration ------------------------
+
+NO_ID = -1
+
+# Column name -> dtype; one row per delivery of the match, in file order
+COLUMNS = {
+    "innings": np.int16,        # position of the innings in the file (0-based)
+    "kept": np.bool_,           # becomes a Delivery node (the over has a number, <= 6 legal balls so far)
+    "counted": np.bool_,        # kept, and batter, bowler and non-striker are in the registry
+    "phase": np.int8,           # index into PHASES for kept regular-innings deliveries, else NO_ID
+    "batter": np.int32,         # players dictionary, NO_ID unless counted
+    "bowler": np.int32,
+    "runs_batter": np.int32,
+    "runs_total": np.int32,
+    "byes": np.int32,           # byes + leg byes, which are not charged to the bowler
+    "is_legal": np.bool_,
+    "has_wicket": np.bool_,
+    "wickets": np.int32,        # dismissals on this delivery
+}
+
+# ------------------------ Columns ------------------------
+
+class DeliveryColumns:
+    """Per-delivery column buffers for one match, filled by build_match_batch in its delivery loop.
+
+    Player names are dictionary-encoded in the order the stats loops used to first touch them
+    (batter, then bowler, then fielders of counted deliveries), so reduce_match() yields players, and
+    therefore PlayerMatchPerformance rows, in the same order as before.
+    """
+
+    def __init__(self):
+        self.rows = {name: [] for name in COLUMNS}
+        self.fielders = []   # (row, player id) for every fielder credited on a counted delivery
+        self.innings = []    # every innings started, including ones without deliveries
+        self.player_ids = {}
+        self.players = []
+
+    def player_id(self, name):
+        if name not in self.player_ids:
+            self.player_ids[name] = len(self.players)
+            self.players.append(name)
+        return self.player_ids[name]
+
+    def start_innings(self, innings):
+        self.innings.append(innings)
+
+    def add(self, innings, runs_batter, runs_total, byes=0, is_legal=True, wickets=(), has_wicket=False,
+            phase=NO_ID, kept=True, batter=None, bowler=None, fielders=()):
+        """Append a delivery; batter and bowler are given only when it counts towards player stats."""
+        counted = batter is not None
+        rows = self.rows
+        rows["innings"].append(innings)
+        rows["kept"].append(kept)
+        rows["counted"].append(counted)
+        rows["phase"].append(phase)
+        rows["batter"].append(self.player_id(batter) if counted else NO_ID)
+        rows["bowler"].append(self.player_id(bowler) if counted else NO_ID)
+        rows["runs_batter"].append(runs_batter)
+        rows["runs_total"].append(runs_total)
+        rows["byes"].append(byes)
+        rows["is_legal"].append(is_legal)
+        rows["has_wicket"].append(has_wicket)
+        rows["wickets"].append(len(wickets))
+        if counted:
+            row = len(rows["innings"]) - 1
+            for name in fielders:
+                self.fielders.append((row, self.player_id(name)))
+
+    def arrays(self):
+        return {name: np.array(values, dtype=COLUMNS[name]) for name, values in self.rows.items()}
+
+# ------------------------ Grouped Reductions ------------------------
+
+class MatchStats:
+    """Totals of one match computed from its DeliveryColumns.
+
+    players: {name: stats} in first-seen order with the keys the per-delivery loops produced;
+    phases: {innings: {phase: {"runs", "balls", "wickets"}}};
+    innings: {innings: {"runs", "wickets", "fours", "sixes"}}, where runs only count deliveries
+    with known players and the others count every delivery in the file.
+    """
+
+    def __init__(self, players, phases, innings):
+        self.players = players
+        self.phases = phases
+        self.innings = innings
+
+
+def _sum_by(ids, weights, size):
+    return np.bincount(ids, weights=weights, minlength=size).astype(np.int64).tolist()
+
+
+def reduce_match(columns):
+    """All per-player, per-phase and per-innings totals of a match as bincount reductions."""
+    c = columns.arrays()
+    n_players = len(columns.players)
+
+    counted = c["counted"]
+    batter, bowler = c["batter"][counted], c["bowler"][counted]
+    runs_batter, runs_total = c["runs_batter"][counted], c["runs_total"][counted]
+    legal = c["is_legal"][counted]
+
+    balls_faced = np.bincount(batter, minlength=n_players).tolist()
+    runs = _sum_by(batter, runs_batter, n_players)
+    fours = np.bincount(batter[runs_batter == 4], minlength=n_players).tolist()
+    sixes = np.bincount(batter[runs_batter == 6], minlength=n_players).tolist()
+    balls_bowled = np.bincount(bowler[legal], minlength=n_players).tolist()
+    no_balls = np.bincount(bowler[~legal], minlength=n_players).tolist()
+    runs_conceded = _sum_by(bowler, runs_total - c["byes"][counted], n_players)
+    wickets = _sum_by(bowler, c["wickets"][counted], n_players)
+    fielder_ids = np.array([player for _, player in columns.fielders], dtype=np.int64)
+    catches = np.bincount(fielder_ids, minlength=n_players).tolist()
+
+    players = {}
+    for i, name in enumerate(columns.players):
+        stats = {
+            "runs": runs[i], "balls_faced": balls_faced[i], "runs_conceded": runs_conceded[i],
+            "balls_bowled": balls_bowled[i], "wickets": wickets[i], "fours": fours[i], "sixes": sixes[i],
+            "catches": catches[i], "run_outs": 0, "stumpings": 0,
+        }
+        if no_balls[i]:
+            stats["no_balls"] = no_balls[i]
+        players[name] = stats
+
+    # Phases: one flat bincount over (innings, phase) cells
+    innings_ids = columns.innings
+    n_innings = max(innings_ids, default=-1) + 1
+    in_phase = c["kept"] & (c["phase"] != NO_ID)
+    cell = c["innings"][in_phase].astype(np.int64) * len(PHASES) + c["phase"][in_phase]
+    size = n_innings * len(PHASES)
+    phase_runs = _sum_by(cell, c["runs_total"][in_phase], size)
+    phase_balls = np.bincount(cell[c["is_legal"][in_phase]], minlength=size).tolist()
+    phase_wickets = np.bincount(cell[c["has_wicket"][in_phase]], minlength=size).tolist()
+    phases = {i: {name: {"runs": phase_runs[i * len(PHASES) + p], "balls": phase_balls[i * len(PHASES) + p],
+                         "wickets": phase_wickets[i * len(PHASES) + p]}
+                  for p, name in enumerate(PHASES)}
+              for i in innings_ids}
+
+    innings = c["innings"].astype(np.int64)
+    innings_runs = _sum_by(innings[counted], runs_total, n_innings)
+    innings_wickets = _sum_by(innings, c["wickets"], n_innings)
+    innings_fours = np.bincount(innings[c["runs_batter"] == 4], minlength=n_innings).tolist()
+    innings_sixes = np.bincount(innings[c["runs_batter"] == 6], minlength=n_innings).tolist()
+    totals = {i: {"runs": innings_runs[i], "wickets": innings_wickets[i],
+                  "fours": innings_fours[i], "sixes": innings_sixes[i]}
+              for i in innings_ids}
+
+    return MatchStats(players, phases, totals)
@@ -0,0 +1,193 @@
+import bisect
+import heapq
+import logging
+
+from batch_writer import call_with_retries, relationship_merge_query
+
+# ------------------------ Configuration ------------------------
+
+TOP_K = 10
+ALL_TIME = "all"   # scope of the career boards; season scopes are the Season years
+
+# Board -> (count or rate, highest first?, qualifying count, season minimum, all-time minimum)
+BOARDS = {
+    "runs": ("runs", True, None, 0, 0),                                # orange cap
+    "wickets": ("wickets", True, None, 0, 0),                          # purple cap
+    "sixes": ("sixes", True, None, 0, 0),
+    "strike_rate": ("strike_rate", True, "balls_faced", 100, 1000),
+    "economy": ("economy", False, "balls_bowled", 120, 1200),
+}
+
+# Season node properties naming each season's leader
+SEASON_LEADERS = {"runs": "orange_cap", "wickets": "purple_cap", "sixes": "most_sixes_player"}
+
+LEADERBOARD_QUERY = ("UNWIND $rows AS r "
+                     "MERGE (n:Leaderboard {leaderboard_key: r.leaderboard_key}) "
+                     "SET n = r")
+SEASON_BOARDS = relationship_merge_query("Season", ("year",), "HAS_LEADERBOARD", "Leaderboard", ("leaderboard_key",))
+TOURNAMENT_BOARDS = relationship_merge_query("Tournament", ("name",), "HAS_LEADERBOARD", "Leaderboard",
+                                             ("leaderboard_key",))
+
+# ------------------------ Scoring ------------------------
+
+def _score(board, counts, scope):
+    """Sort key of a player's counts on a board (lower ranks higher), or None if not qualified."""
+    if counts is None or not counts.get("matches"):
+        return None
+    stat, descending, qualifier, season_minimum, all_time_minimum = BOARDS[board]
+    minimum = all_time_minimum if scope == ALL_TIME else season_minimum
+    if qualifier is not None and counts.get(qualifier, 0) < max(minimum, 1):
+        return None
+    if stat == "strike_rate":
+        value = counts["runs"] / counts["balls_faced"] * 100
+    elif stat == "economy":
+        value = counts["runs_conceded"] / (counts["balls_bowled"] / 6)
+    else:
+        value = counts.get(stat, 0)
+        if not value:
+            return None
+    return -value if descending else value
+
+# ------------------------ Leaderboards ------------------------
+
+class Leaderboards:
+    """Bounded top-k of every board, per season and all-time, over a PlayerAggregates.
+
+    apply() takes the same per-match contributions as PlayerAggregates.apply, after they were
+    applied there, and re-scores only the players and scopes they touch: a player moves within
+    the board, enters it by beating the last entry, or leaves it. Only a full board losing an
+    entry is re-selected from the scope's aggregates. Ties rank by player id.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.boards = {}   # (scope, board) -> sorted [(score, player_id)], at most k
+
+    def rebuild(self, aggregates):
+        self.boards = {}
+        scopes = {season for _, season in aggregates.seasons}
+        for scope in scopes | {ALL_TIME}:
+            for board in BOARDS:
+                self._select(aggregates, scope, board)
+        return self
+
+    def _counts(self, aggregates, player_id, scope):
+        if scope == ALL_TIME:
+            return aggregates.career.get(player_id)
+        return aggregates.seasons.get((player_id, scope))
+
+    def _select(self, aggregates, scope, board):
+        if scope == ALL_TIME:
+            candidates = aggregates.career.items()
+        else:
+            candidates = ((player_id, counts) for (player_id, season), counts in aggregates.seasons.items()
+                          if season == scope)
+        scored = ((_score(board, counts, scope), player_id) for player_id, counts in candidates)
+        entries = heapq.nsmallest(self.k, (entry for entry in scored if entry[0] is not None))
+        if entries:
+            self.boards[(scope, board)] = entries
+        else:
+            self.boards.pop((scope, board), None)
+
+    def apply(self, aggregates, contributions):
+        """Re-rank the players of some per-match contributions; returns the scopes that changed."""
+        changed = set()
+        for player_id, contribution in (contributions or {}).items():
+            for scope in (contribution["season"], ALL_TIME):
+                counts = self._counts(aggregates, player_id, scope)
+                for board in BOARDS:
+                    if self._offer(aggregates, scope, board, player_id, _score(board, counts, scope)):
+                        changed.add(scope)
+        return changed
+
+    def _offer(self, aggregates, scope, board, player_id, score):
+        entries = self.boards.get((scope, board), [])
+        old = next((entry for entry in entries if entry[1] == player_id), None)
+        entry = (score, player_id) if score is not None else None
+        if old is not None:
+            if entry == old:
+                return False
+            if len(entries) == self.k and (entry is None or entry > entries[-1]):
+                # Dropping out of a full board lets someone not on it in
+                self._select(aggregates, scope, board)
+                return True
+            entries.remove(old)
+        elif entry is None or (len(entries) == self.k and entry > entries[-1]):
+            return False
+        if entry is not None:
+            bisect.insort(entries, entry)
+            del entries[self.k:]
+        if entries:
+            self.boards[(scope, board)] = entries
+        else:
+            self.boards.pop((scope, board), None)
+        return True
+
+    def top(self, board, scope=ALL_TIME, names=None):
+        """Ranked rows of one board: [{"rank", "player_id", "name", "value"}]."""
+        stat, descending = BOARDS[board][:2]
+        return [{"rank": rank,
+                 "player_id": player_id,
+                 "name": (names or {}).get(player_id),
+                 "value": -score if descending else score}
+                for rank, (score, player_id) in enumerate(self.boards.get((scope, board), []), start=1)]
+
+    def leaders(self, scope, names=None):
+        """Season node properties for the leader of each SEASON_LEADERS board."""
+        leaders = {}
+        for board, prop in SEASON_LEADERS.items():
+            rows = self.top(board, scope, names)
+            leaders[prop] = rows[0]["name"] if rows else None
+        return leaders
+
+    def records(self, scope, names=None):
+        """Leaderboard node properties of every board of a scope."""
+        records = []
+        for board in BOARDS:
+            rows = self.top(board, scope, names)
+            stat, descending, qualifier, season_minimum, all_time_minimum = BOARDS[board]
+            records.append({
+                "leaderboard_key": f"{scope}_{board}",
+                "scope": str(scope),
+                "board": board,
+                "qualifier": qualifier,
+                "minimum": (all_time_minimum if scope == ALL_TIME else season_minimum) if qualifier else None,
+                "player_ids": [row["player_id"] for row in rows],
+                "names": [row["name"] for row in rows],
+                "values": [row["value"] for row in rows],
+            })
+        return records
+
+# ------------------------ Graph ------------------------
+
+def _write_records(graph, scope, tournament_name, records):
+    tx = graph.begin()
+    try:
+        tx.run(LEADERBOARD_QUERY, {"rows": records})
+        if scope == ALL_TIME:
+            query, start = TOURNAMENT_BOARDS, [tournament_name]
+        else:
+            query, start = SEASON_BOARDS, [scope]
+        tx.run(query, {"rows": [{"start": start, "end": [r["leaderboard_key"]], "props": {}} for r in records]})
+        graph.commit(tx)
+    except Exception:
+        try:
+            graph.rollback(tx)
+        except Exception as exc:
+            logging.debug(f"Rollback of leaderboards failed: {exc}")
+        raise
+
+
+def write_leaderboards(graph, leaderboards, scope, tournament_name, names=None):
+    """Rewrite the Leaderboard nodes of a season (linked to its Season) or ALL_TIME (linked to the Tournament)."""
+    records = leaderboards.records(scope, names)
+    call_with_retries(_write_records, graph, scope, tournament_name, records, description=f"leaderboards {scope}")
+    logging.info(f"Updated {len(records)} leaderboards for {scope}")
+    return records
+
+
+def read_leaderboards(graph, scope=ALL_TIME):
+    """{board: Leaderboard node properties} of a scope as stored in the graph."""
+    return {r["props"]["board"]: r["props"]
+            for r in graph.run("MATCH (n:Leaderboard) RETURN properties(n) AS props")
+            if r["props"]["scope"] == str(scope)}
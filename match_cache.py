@@ -0,0 +1,237 @@
+import gc
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import sys
+import threading
+
+# ------------------------ Configuration ------------------------
+
+CACHE_DIR = os.environ.get("IPL_MATCH_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".match_cache"))
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# marshal output is only readable by the same Python minor version, so it is part of the format tag
+CACHE_FORMAT = f"match-cache-1-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+# ------------------------ Cache ------------------------
+
+class MatchCache:
+    """On-disk cache of parsed Cricsheet matches, shared by the import and maintenance scripts.
+
+    Each entry is keyed by the source path and validated against the file's size, mtime, content
+    hash and meta.revision; any change re-parses the JSON. Entries are marshal-encoded and the
+    directory is kept under max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _entry_path(self, path):
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.bin")
+
+    def _read_entry(self, entry_path, with_data=True):
+        # Layout: 4-byte header length, marshalled header, marshalled match.
+        # marshal.load() on a file object reads in tiny chunks, so whole blobs go through loads().
+        try:
+            with open(entry_path, 'rb') as f:
+                (header_len,) = struct.unpack("<I", f.read(4))
+                header = marshal.loads(f.read(header_len))
+                if not isinstance(header, dict) or header.get("format") != CACHE_FORMAT:
+                    return None, None
+                return header, _loads(f.read()) if with_data else None
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            return None, None
+
+    def load(self, path):
+        st = os.stat(path)
+        entry_path = self._entry_path(path)
+        header, data = self._read_entry(entry_path)
+
+        if header and header["size"] == st.st_size and header["mtime_ns"] == st.st_mtime_ns:
+            self._touch(entry_path)
+            self.hits += 1
+            return data
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        content_hash = hashlib.sha1(raw).hexdigest()
+
+        # Touched but unchanged file: keep the parsed entry, refresh the stat fingerprint
+        if header and header["sha1"] == content_hash:
+            self._store(path, entry_path, st, content_hash, data)
+            self.hits += 1
+            return data
+
+        data = normalize_match(json.loads(raw))
+        self.misses += 1
+        previous_revision = header["revision"] if header else None
+        if previous_revision is not None and previous_revision != data["meta"].get("revision"):
+            logging.info(f"Cricsheet revision changed for {path}: {previous_revision} -> {data['meta'].get('revision')}")
+        self._store(path, entry_path, st, content_hash, data)
+        return data
+
+    def _store(self, path, entry_path, st, content_hash, data):
+        header = {
+            "format": CACHE_FORMAT,
+            "path": os.path.abspath(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": content_hash,
+            "revision": data["meta"].get("revision"),
+        }
+        header_bytes = marshal.dumps(header)
+        payload = struct.pack("<I", len(header_bytes)) + header_bytes + marshal.dumps(_intern_strings(data))
+        tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            old_size = os.path.getsize(entry_path) if os.path.exists(entry_path) else 0
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logging.warning(f"Could not write match cache entry for {path}: {e}")
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(payload) - old_size
+        self._evict_if_needed()
+
+    def _touch(self, entry_path):
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(".bin"):
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            if self._size <= self.max_bytes:
+                return
+            # Evict least recently used entries down to 90% of the limit
+            for _, size, full in sorted(self._entries()):
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(full)
+                    self._size -= size
+                except FileNotFoundError:
+                    pass
+
+    def revision(self, path):
+        """Cricsheet revision recorded for path, without parsing it; None if not cached."""
+        header, _ = self._read_entry(self._entry_path(path), with_data=False)
+        return header["revision"] if header else None
+
+    def prune(self):
+        """Drop entries whose source file no longer exists."""
+        removed = 0
+        for _, _, full in self._entries():
+            header, _ = self._read_entry(full, with_data=False)
+            if header is None or not os.path.exists(header["path"]):
+                os.remove(full)
+                removed += 1
+        with self._lock:
+            self._size = None
+        return removed
+
+    def clear(self):
+        for _, _, full in self._entries():
+            os.remove(full)
+        with self._lock:
+            self._size = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# ------------------------ Helper Functions ------------------------
+
+def _intern_strings(value):
+    # Interned strings are written once and back-referenced by marshal: smaller entries, faster loads
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern_strings(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_strings(v) for v in value]
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _loads(blob):
+    # marshal.loads runs no Python code, so pausing the cyclic GC while it allocates is safe
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return marshal.loads(blob)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def normalize_match(data):
+    return {
+        "meta": data.get('meta', {}),
+        "info": data.get('info', {}),
+        "innings": data.get('innings', []),
+    }
+
+
+_default_cache = MatchCache()
+
+
+def load_match(path):
+    """Drop-in replacement for json.load on a match file, served from the shared cache."""
+    return _default_cache.load(path)
+
+
+def get_cache():
+    return _default_cache
+
+# ------------------------ Main Execution ------------------------
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Warm, prune or clear the parsed-match cache.")
+    parser.add_argument("action", choices=["warm", "prune", "clear"])
+    parser.add_argument("--data-root", default="data/ipl_matches")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.action == "warm":
+        files = sorted(glob.glob(os.path.join(args.data_root, "S*-*", "*.json")))
+        for file in files:
+            cache.load(file)
+        print(f"Cached {len(files)} matches ({cache.misses} parsed, {cache.hits} already cached).")
+    elif args.action == "prune":
+        print(f"Removed {cache.prune()} stale entries.")
+    else:
+        cache.clear()
+        print("Cache cleared.")
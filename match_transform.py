@@ -0,0 +1,499 @@
+import logging
+from collections import Counter
+
+from ball_index import PHASE_TABLE, ball_index
+from batch_writer import MatchBatch
+from innings_stats import NO_ID, DeliveryColumns, reduce_match
+from partnerships import PartnershipTracker, partnership_nodes
+from player_aggregates import BOWLER_KINDS, NOT_OUT_KINDS, match_contributions
+from season_stats import SeasonStats
+
+# ------------------------ Helper Functions ------------------------
+
+def get_phase(over, ball):
+    """Phase of the 1-based over and legal ball; see ball_index.PhaseTable."""
+    return PHASE_TABLE.phase(over, ball)
+
+
+def tournament_properties(info, tournament_name):
+    event = info.get('event', {})
+    return {
+        "name": tournament_name,
+        "country": "India",
+        "format": "T20",
+        "gender": info.get('gender', 'male'),
+        "tournament": event.get('name', tournament_name),
+        "match_type": info.get('match_type', 'T20'),
+        "overs": info.get('overs', 20),
+        "balls_per_over": info.get('balls_per_over', 6),
+        "governing_body": "BCCI",
+        "founded": 2007,
+        "inaugural_season": 2008,
+        "logo": "https://www.iplt20.com/assets/images/ipl-logo.png",
+        "website": "https://www.iplt20.com"
+    }
+
+def match_id_of(info):
+    """Match id used across the graph, or None when the file lacks a match number or date."""
+    match_number = info.get('event', {}).get('match_number')
+    match_date = info.get('dates', [None])[0]
+    if not match_number or not match_date:
+        return None
+    return f"{match_number}_{match_date}"
+
+# ------------------------ Dimensions ------------------------
+
+def add_dimensions(batch, info, tournament_name, file, warn=True):
+    """Merge one match's dimension nodes and relationships (Season, Team, Venue, Official, Player,
+    HAS_SEASON, PARTICIPATES_IN, PLAYS_FOR, HAS_PLAYER) into batch.
+
+    Returns the refs the match facts link to: season, teams {name: ref}, venue, officials [ref]
+    and players {name: ref}.
+    """
+    tournament_ref = batch.ref("Tournament", "name", tournament_name)
+
+    season_ref = batch.merge_node("Season", "year", {"year": info.get('season')})
+    batch.merge_relationship(tournament_ref, "HAS_SEASON", season_ref)
+
+    team_refs = {}
+    for team_name in info.get('teams', []):
+        team_refs[team_name] = batch.merge_node("Team", "name", {"name": team_name})
+        batch.merge_relationship(team_refs[team_name], "PARTICIPATES_IN", tournament_ref)
+
+    venue_ref = batch.merge_node("Venue", "name", {"name": info.get('venue'), "city": info.get('city')})
+
+    official_refs = []
+    for role, official_names in info.get('officials', {}).items():
+        for official_name in official_names:
+            official_refs.append(batch.merge_node("Official", "name", {"name": official_name, "role": role}))
+
+    registry = info.get('registry', {}).get('people', {})
+    player_refs = {}
+    for team_name, players in info.get('players', {}).items():
+        team_ref = team_refs.get(team_name)
+        if not team_ref:
+            if warn:
+                logging.warning(f"Team {team_name} not found in team_nodes.")
+            continue
+        for player_name in players:
+            registry_id = registry.get(player_name)
+            if not registry_id:
+                if warn:
+                    logging.warning(f"No registry ID for player '{player_name}' in file {file}. Skipping player.")
+                continue
+            player_ref = batch.merge_node("Player", "registry_id", {"registry_id": registry_id, "name": player_name})
+            batch.merge_relationship(player_ref, "PLAYS_FOR", team_ref)
+            batch.merge_relationship(team_ref, "HAS_PLAYER", player_ref)
+            player_refs[player_name] = player_ref
+
+    return {"season": season_ref, "teams": team_refs, "venue": venue_ref,
+            "officials": official_refs, "players": player_refs}
+
+
+def build_dimension_batch(matches, tournament_name):
+    """Every dimension node and relationship of an import in one batch, from the info blocks of
+    (file, data) pairs. Matches the importer would skip contribute nothing."""
+    batch = MatchBatch()
+    # Later merges overwrite properties, while the per-match path keeps a dimension's first-seen
+    # properties (e.g. a player's name); walking the files backwards keeps the first file's.
+    for file, data in reversed(list(matches)):
+        info = data.get('info', {})
+        if match_id_of(info) is None or not info.get('season') or len(info.get('teams', [])) != 2:
+            continue
+        add_dimensions(batch, info, tournament_name, file, warn=False)
+    return batch
+
+# ------------------------ Match Transform ------------------------
+
+def build_match_batch(data, file, tournament_name):
+    """Turn one Cricsheet match into a MatchBatch mirroring the graph process_file writes.
+
+    Returns (batch, season_stats) where season_stats is this match's own SeasonStats partial,
+    or (None, None) when the file is skipped for the same reasons process_file skips it.
+    """
+    meta = data.get('meta', {})
+    info = data.get('info', {})
+    innings_list = data.get('innings', [])
+
+    match_number = info.get('event', {}).get('match_number')
+    match_date = info.get('dates', [None])[0]
+    if not match_number or not match_date:
+        logging.error(f"Missing match_number or date in file {file}. Skipping.")
+        return None, None
+    match_id = f"{match_number}_{match_date}"
+
+    season_year = info.get('season')
+    if not season_year:
+        logging.error(f"Missing season in file {file}. Skipping.")
+        return None, None
+
+    teams = info.get('teams', [])
+    if len(teams) != 2:
+        logging.error(f"Invalid number of teams in file {file}. Skipping.")
+        return None, None
+
+    batch = MatchBatch(match_id)
+    batch.revision = meta.get('revision')
+    dimensions = add_dimensions(batch, info, tournament_name, file)
+    season_ref = dimensions["season"]
+    team_refs = dimensions["teams"]
+    player_refs = dimensions["players"]
+
+    season_stats = SeasonStats(season_year)
+    season_stats.teams.update(teams)
+
+    toss_info = info.get('toss', {})
+
+    player_of_match = info.get('player_of_match', [])
+    if isinstance(player_of_match, str):
+        player_of_match = [player_of_match]
+
+    outcome = info.get('outcome', {})
+    winner = outcome.get('winner')
+    eliminator = outcome.get('eliminator')
+    by_runs = outcome.get('by', {}).get('runs')
+    by_wickets = outcome.get('by', {}).get('wickets')
+
+    if winner:
+        winner_str = winner
+        if by_runs:
+            result = f"{winner} won by {by_runs} runs"
+        elif by_wickets:
+            result = f"{winner} won by {by_wickets} wickets"
+        else:
+            result = f"{winner} won"
+    elif eliminator:
+        winner_str = eliminator
+        result = f"{eliminator} won by super over"
+        season_stats.super_over_matches += 1
+    else:
+        winner_str = None
+        result = outcome.get('result', 'No result')
+
+    duckworth_lewis = "method" in info["outcome"] and info["outcome"]["method"] == "D/L"
+    match_properties = {
+        "match_id": match_id,
+        "date": match_date,
+        "season": season_year,
+        "tournament": info.get('event', {}).get('name', tournament_name),
+        "match_number": match_number,
+        "stage": info.get('event', {}).get('stage'),
+        "venue": info.get('venue'),
+        "city": info.get('city'),
+        "match_type": info.get('match_type'),
+        "gender": info.get('gender'),
+        "total_overs": info.get('overs'),
+        "balls_per_over": info.get('balls_per_over'),
+        "toss_winner": toss_info.get('winner'),
+        "toss_decision": toss_info.get('decision'),
+        "player_of_match": player_of_match,
+        "result": result,
+        "winner": winner_str,
+        "had_super_over": bool(eliminator),
+        "data_version": meta.get('data_version'),
+        "created": meta.get('created'),
+        "revision": meta.get('revision'),
+        "playoffs": info.get('event', {}).get('stage', '').lower() != 'group stage',
+        "duckworth_lewis": duckworth_lewis
+    }
+    if winner_str:
+        if by_runs is not None:
+            match_properties["won_by_runs"] = int(by_runs)
+        if by_wickets is not None:
+            match_properties["won_by_wickets"] = int(by_wickets)
+
+    match_ref = batch.merge_node("Match", "match_id", match_properties)
+    batch.merge_relationship(season_ref, "HAS_MATCH", match_ref)
+
+    batch.merge_relationship(match_ref, "PLAYED_AT", dimensions["venue"])
+
+    for official_ref in dimensions["officials"]:
+        batch.merge_relationship(match_ref, "OFFICIATED_BY", official_ref)
+
+    for team_ref in team_refs.values():
+        batch.merge_relationship(team_ref, "PLAYED_IN", match_ref)
+
+    if winner_str and winner_str in team_refs:
+        batch.merge_relationship(match_ref, "WON_BY", team_refs[winner_str])
+
+    registry = info.get('registry', {}).get('people', {})
+
+    # Every delivery is recorded once; player, phase and season totals are reduced from the columns
+    columns = DeliveryColumns()
+    innings_refs = []
+    dismissals = Counter()
+    bowler_wickets = Counter()
+
+    season_stats.total_matches += 1
+    if duckworth_lewis:
+        season_stats.duckworth_lewis_matches += 1
+
+    # Carried across innings exactly like process_file: super over deliveries reuse the last phase seen.
+    phase = None
+    for i, innings_data in enumerate(innings_list):
+        if isinstance(innings_data, dict) and len(innings_data) == 1:
+            innings = innings_data[next(iter(innings_data))]
+        elif isinstance(innings_data, dict) and 'team' in innings_data:
+            innings = innings_data
+        else:
+            logging.error(f"Invalid innings_data structure in file {file}")
+            continue
+
+        team_name = innings.get('team')
+        if not team_name:
+            logging.warning(f"Missing team name in innings in file {file}. Skipping innings.")
+            continue
+
+        if team_name not in team_refs:
+            logging.warning(f"Team {team_name} not found in team_nodes.")
+            continue
+
+        overs_list = innings.get('overs', [])
+        over_number = -1
+        is_super_over = innings.get('super_over', False)
+        innings_key = f"{match_id}_{i+1}_{team_name}_{'super_over' if is_super_over else 'regular'}"
+
+        innings_props = {
+            "innings_key": innings_key,
+            "team": team_name,
+            "runs": 0,
+            "total_overs": 0,
+            "innings_number": i + 1,
+            "match_id": match_id,
+            "is_super_over": is_super_over,
+        }
+        innings_ref = batch.merge_node("Innings", "innings_key", innings_props)
+        batch.merge_relationship(match_ref, "HAS_INNINGS", innings_ref)
+        innings_refs.append((i, innings_ref, innings_props, is_super_over))
+        columns.start_innings(i)
+        partnerships = PartnershipTracker()
+
+        for over_data in overs_list:
+            over_number = over_data.get('over')
+            if over_number is None:
+                logging.warning(f"Missing over number in file {file}. Skipping over.")
+                # Season totals still count these deliveries
+                for delivery_data in over_data.get('deliveries', []):
+                    columns.add(i, delivery_data.get("runs", {}).get("batter", 0), 0,
+                                wickets=delivery_data.get("wickets", []), kept=False)
+                continue
+
+            over_number += 1
+            over_ref = batch.merge_node("Over", "over_key", {
+                "over_key": f"{match_id}_{i+1}_{over_number}_{team_name}",
+                "number": over_number,
+                "innings_number": i + 1,
+                "match_id": match_id,
+                "team": team_name,
+            })
+            batch.merge_relationship(innings_ref, "HAS_OVER", over_ref)
+
+            legal_ball_in_over = 0
+            current_ball_number = 1
+
+            for delivery_index, delivery_data in enumerate(over_data.get('deliveries', [])):
+                runs_batter = delivery_data.get("runs", {}).get("batter", 0)
+                wickets = delivery_data.get("wickets", [])
+                if legal_ball_in_over == 6:
+                    # Past the sixth legal ball: no Delivery node, but part of the season totals
+                    columns.add(i, runs_batter, 0, wickets=wickets, kept=False)
+                    continue
+
+                runs_extras = delivery_data.get("runs", {}).get("extras", 0)
+                total_runs_delivery = delivery_data.get("runs", {}).get("total", 0)
+                extras_type = delivery_data.get("extras", {})
+
+                is_legal = "wides" not in extras_type and "noballs" not in extras_type
+                is_wicket = "wickets" in delivery_data
+                delivery_stats = {
+                    "runs_batter": runs_batter,
+                    "runs_total": total_runs_delivery,
+                    "byes": extras_type.get("legbyes", 0) + extras_type.get("byes", 0),
+                    "is_legal": is_legal,
+                    "wickets": wickets,
+                    "has_wicket": is_wicket,
+                    "phase": NO_ID,
+                }
+
+                if not is_super_over:
+                    delivery_stats["phase"] = PHASE_TABLE.phase_id(over_number, current_ball_number)
+                    phase = PHASE_TABLE.phases[delivery_stats["phase"]]
+
+                ball_number = PHASE_TABLE.label(over_number - 1, current_ball_number)
+                delivery_ball_index = ball_index(over_number - 1, current_ball_number)
+
+                delivery_type = "regular"
+                if not is_legal:
+                    if "wides" in extras_type:
+                        delivery_type = "wide"
+                    elif "noballs" in extras_type:
+                        delivery_type = "no_ball"
+                else:
+                    if "legbyes" in extras_type:
+                        delivery_type = "leg_bye"
+                    elif "byes" in extras_type:
+                        delivery_type = "bye"
+
+                delivery_ref = batch.merge_node("Delivery", "delivery_key", {
+                    "delivery_key": f"{match_id}_{i+1}_{ball_number}_{delivery_index}",
+                    "ball_number": ball_number,
+                    "ball_index": delivery_ball_index,
+                    "delivery_index": delivery_index + 1,
+                    "runs_batter": runs_batter,
+                    "runs_extras": runs_extras,
+                    "total_runs": total_runs_delivery,
+                    "is_wicket": is_wicket,
+                    "is_legal": is_legal,
+                    "over_number": over_number,
+                    "legal_ball_in_over": legal_ball_in_over + 1,
+                    "innings_number": i + 1,
+                    "match_id": match_id,
+                    "phase": phase,
+                    "batsman": delivery_data.get('batter'),
+                    "bowler": delivery_data.get('bowler'),
+                    "non_striker": delivery_data.get('non_striker'),
+                    "delivery_type": delivery_type,
+                })
+                batch.merge_relationship(over_ref, "HAS_DELIVERY", delivery_ref)
+                partnerships.add(delivery_data.get('batter'), delivery_data.get('non_striker'), runs_batter,
+                                 total_runs_delivery, is_legal, delivery_ball_index, ball_number,
+                                 [wicket.get('kind') for wicket in wickets])
+
+                bowler_name = delivery_data.get('bowler')
+                bowler_ref = player_refs.get(bowler_name)
+                if not bowler_ref:
+                    logging.warning(f"Bowler '{bowler_name}' not found in file {file}. Skipping delivery.")
+                    columns.add(i, **delivery_stats)
+                    continue
+
+                batter_name = delivery_data.get('batter')
+                batter_ref = player_refs.get(batter_name)
+                if not batter_ref:
+                    logging.warning(f"Batter '{batter_name}' not found in file {file}. Skipping delivery.")
+                    columns.add(i, **delivery_stats)
+                    continue
+
+                non_striker_name = delivery_data.get('non_striker')
+                if non_striker_name not in player_refs:
+                    logging.warning(f"Non-Striker '{non_striker_name}' not found in file {file}. Skipping delivery.")
+                    columns.add(i, **delivery_stats)
+                    continue
+
+                columns.add(i, batter=batter_name, bowler=bowler_name,
+                            fielders=[fielder.get("name") for wicket in wickets for fielder in wicket.get("fielders", [])],
+                            **delivery_stats)
+
+                batch.merge_relationship(delivery_ref, "BOWLED_BY", bowler_ref)
+                batch.merge_relationship(delivery_ref, "BATTED_BY", batter_ref)
+
+                for wicket in wickets:
+                    player_out = wicket.get("player_out")
+                    if wicket.get("kind") not in NOT_OUT_KINDS:
+                        dismissals[player_out] += 1
+                    if wicket.get("kind") in BOWLER_KINDS:
+                        bowler_wickets[bowler_name] += 1
+                    fielders = [fielder.get("name") for fielder in wicket.get("fielders", [])]
+                    wicket_ref = batch.merge_node("Dismissal", "wicket_key", {
+                        "wicket_key": f"{match_id}_{i+1}_{ball_number}_{player_out}",
+                        "kind": wicket.get("kind"),
+                        "player_out": player_out,
+                        "ball_number": ball_number,
+                        "over_number": over_number,
+                        "innings_number": i + 1,
+                        "match_id": match_id,
+                        "fielders": ", ".join(fielders),
+                    })
+                    batch.merge_relationship(delivery_ref, "RESULTS_IN", wicket_ref)
+
+                    for fielder_name in fielders:
+                        if fielder_name in player_refs:
+                            batch.merge_relationship(wicket_ref, "FIELDED_BY", player_refs[fielder_name])
+
+                if is_legal:
+                    legal_ball_in_over += 1
+                    current_ball_number += 1
+
+        innings_props["total_overs"] = over_number
+
+        for partnership in partnership_nodes(innings_key, match_id, i + 1, team_name, partnerships.finish()):
+            partnership_ref = batch.merge_node("Partnership", "partnership_key", partnership)
+            batch.merge_relationship(innings_ref, "HAS_PARTNERSHIP", partnership_ref)
+            for batter_name in (partnership["batter_1"], partnership["batter_2"]):
+                if batter_name in player_refs:
+                    batch.merge_relationship(partnership_ref, "PARTNERSHIP_OF", player_refs[batter_name])
+
+        if is_super_over:
+            match_properties["had_super_over"] = True
+            batch.merge_node("Match", "match_id", match_properties)
+
+    match_stats = reduce_match(columns)
+    for i, innings_ref, innings_props, is_super_over in innings_refs:
+        totals = match_stats.innings[i]
+        innings_props["runs"] = totals["runs"]
+        batch.merge_node("Innings", "innings_key", innings_props)
+
+        if not is_super_over:
+            for phase_name, phase_totals in match_stats.phases[i].items():
+                phase_ref = batch.merge_node("Phase", ("innings_key", "phase"), {
+                    "innings_key": innings_props["innings_key"],
+                    "phase": phase_name,
+                    **phase_totals,
+                })
+                batch.merge_relationship(innings_ref, "HAS_PHASE", phase_ref)
+
+        season_stats.add_innings_score(totals["runs"], counts_for_lowest=not duckworth_lewis
+                                       and innings_props["total_overs"] > 0 and not is_super_over)
+        season_stats.total_wickets += totals["wickets"]
+        season_stats.total_fours += totals["fours"]
+        season_stats.total_sixes += totals["sixes"]
+
+    for player_name, stats in match_stats.players.items():
+        player_ref = player_refs.get(player_name)
+        if not player_ref:
+            continue
+        registry_id = player_ref.values[0]
+
+        performances = []
+        if stats["balls_faced"] > 0:
+            performances.append(("Batting", {
+                "runs": stats["runs"],
+                "balls_faced": stats["balls_faced"],
+                "fours": stats.get("fours", 0),
+                "sixes": stats.get("sixes", 0),
+                "strike_rate": float(stats['runs'] / stats['balls_faced'] * 100)
+            }))
+        if stats["balls_bowled"] > 0:
+            performances.append(("Bowling", {
+                "wickets": stats["wickets"],
+                "runs_conceded": stats["runs_conceded"],
+                "balls_bowled": stats["balls_bowled"],
+                "no_balls": stats.get("no_balls", 0),
+                "economy": float(stats['runs_conceded'] / (stats['balls_bowled'] / 6))
+            }))
+        fielding_stats = {
+            "catches": stats.get("catches", 0),
+            "run_outs": stats.get("run_outs", 0),
+            "stumpings": stats.get("stumpings", 0)
+        }
+        if any(fielding_stats.values()):
+            performances.append(("Fielding", fielding_stats))
+
+        # Keyed on (match_id, player_id, type), as process_file merges them, so a replayed match
+        # updates its performances instead of duplicating them
+        for perf_type, perf_stats in performances:
+            perf_ref = batch.merge_node("PlayerMatchPerformance", ("match_id", "player_id", "type"), {
+                "type": perf_type,
+                "match_id": match_id,
+                "player_id": registry_id,
+                **perf_stats,
+            })
+            batch.merge_relationship(match_ref, "HAS_PLAYER_PERFORMANCE", perf_ref)
+            batch.merge_relationship(perf_ref, "PERFORMANCE_OF", player_ref)
+
+    batch.player_stats = match_contributions(season_year, player_refs, match_stats.players, dismissals,
+                                             bowler_wickets)
+
+    if info.get('event', {}).get('stage') == 'Final':
+        season_stats.record_final(match_date, winner)
+
+    return batch, season_stats
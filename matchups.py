@@ -0,0 +1,381 @@
+import argparse
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+
+from ball_index import PHASES
+from delivery_store import DATA_ROOT, NO_ID, build_store
+from player_aggregates import BOWLER_KINDS
+
+# ------------------------ Configuration ------------------------
+
+MATCHUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "matchup_store")
+MATCHUP_VERSION = 1
+
+# Additive counts per batter x bowler pair
+METRICS = ("balls", "runs", "dots", "fours", "sixes", "dismissals")
+
+# Keys pack (batter, bowler, slot) into one int64. Slot 0 is the whole match, 1.. the PHASES;
+# PLAYER_SLOTS bounds the player dictionary so keys never change as players are added.
+PLAYER_SLOTS = 1 << 18
+PHASE_SLOTS = len(PHASES) + 1
+KEY_SPACE = PLAYER_SLOTS * PLAYER_SLOTS * PHASE_SLOTS
+
+
+def pack_key(batter, bowler, slot=0):
+    return (batter * PLAYER_SLOTS + bowler) * PHASE_SLOTS + slot
+
+
+def unpack_key(key):
+    pair, slot = divmod(key, PHASE_SLOTS)
+    batter, bowler = divmod(pair, PLAYER_SLOTS)
+    return batter, bowler, slot
+
+
+def phase_slot(phase):
+    """Slot of a phase name, or 0 (all phases) for None."""
+    if phase is None:
+        return 0
+    if phase not in PHASES:
+        raise ValueError(f"Unknown phase {phase!r}; expected one of {PHASES}")
+    return PHASES.index(phase) + 1
+
+# ------------------------ Reduction ------------------------
+
+def _sum_by_key(keys, values):
+    """Sorted unique keys and the per-key sums of every values array."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, {name: np.bincount(inverse, weights=column, minlength=len(unique)).astype(np.int32)
+                    for name, column in values.items()}
+
+
+def _drop_empty(keys, values):
+    keep = np.zeros(len(keys), dtype=bool)
+    for column in values.values():
+        keep |= column != 0
+    return keys[keep], {name: column[keep] for name, column in values.items()}
+
+
+def store_contributions(store, player_ids):
+    """Per-match matchup counts of a DeliveryStore in one vectorized pass.
+
+    player_ids maps the store's player dictionary onto the matchup's. Returns (match rows,
+    keys, counts), one row per match and key with at least one non-zero count.
+    """
+    c = store.columns
+    batter = np.asarray(c["batter"], dtype=np.int64)
+    bowler = np.asarray(c["bowler"], dtype=np.int64)
+    valid = (batter != NO_ID) & (bowler != NO_ID)
+    batter = np.where(valid, player_ids[batter], 0)
+    bowler = np.where(valid, player_ids[bowler], 0)
+
+    runs_batter = np.asarray(c["runs_batter"], dtype=np.int64)
+    faced = np.asarray(c["wides"]) == 0
+    credited = np.array([kind in BOWLER_KINDS for kind in store.wicket_kinds] + [False], dtype=bool)
+    counts = {
+        "balls": faced,
+        "runs": runs_batter,
+        "dots": np.asarray(c["is_legal"]) & (runs_batter == 0),
+        "fours": faced & (runs_batter == 4),
+        "sixes": faced & (runs_batter == 6),
+        # wicket_kind is NO_ID without a wicket, which picks the trailing False
+        "dismissals": credited[np.asarray(c["wicket_kind"], dtype=np.int64)]
+                      & (np.asarray(c["player_out"], dtype=np.int64) == np.asarray(c["batter"], dtype=np.int64)),
+    }
+
+    # Every delivery counts once for the whole match and once for its phase (super overs have none)
+    phase = np.asarray(c["phase"], dtype=np.int64)
+    in_phase = valid & (phase != NO_ID)
+    match = np.asarray(c["match"], dtype=np.int64)
+    pairs = pack_key(batter, bowler)
+    keys = np.concatenate([match[valid] * KEY_SPACE + pairs[valid],
+                           match[in_phase] * KEY_SPACE + pairs[in_phase] + phase[in_phase] + 1])
+    values = {name: np.concatenate([column[valid], column[in_phase]]).astype(np.int64)
+              for name, column in counts.items()}
+    keys, values = _drop_empty(*_sum_by_key(keys, values))
+    matches, keys = np.divmod(keys, KEY_SPACE)
+    return matches, keys, values
+
+# ------------------------ Matchup Matrix ------------------------
+
+class MatchupMatrix:
+    """Sparse batter x bowler matrix of METRICS, whole-match and per phase.
+
+    Rows are sorted by packed key, so a batter's matchups are one contiguous range. The
+    per-match contributions are kept alongside, so re-adding a revised match replaces its
+    old counts instead of adding to them. matchup() is a dictionary read; top() sorts at most
+    one batter's or bowler's rows, or reuses a cached ordering for the whole matrix.
+    """
+
+    def __init__(self, players=(), files=(), keys=None, counts=None, contributions=None):
+        self.players = list(players)              # [{"registry_id", "name"}], index = player id
+        self.files = list(files)                  # file ids; contribution match rows index this
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.counts = counts if counts is not None else {name: np.zeros(0, dtype=np.int32) for name in METRICS}
+        if contributions is None:
+            contributions = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64),
+                             {name: np.zeros(0, dtype=np.int32) for name in METRICS})
+        self.contributions = contributions        # (file rows, keys, counts)
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self._player_index = {}
+        for i, player in enumerate(self.players):
+            self._player_index[player["registry_id"]] = i
+            self._player_index.setdefault(player["name"], i)
+        self._file_index = {file: i for i, file in enumerate(self.files)}
+        self._rows = None
+        self._by_bowler = None
+        self._rankings = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ---- players ----
+
+    def player_id(self, key):
+        """Matchup id for a registry id or player name, or NO_ID."""
+        return self._player_index.get(key, NO_ID)
+
+    def _encode_players(self, players):
+        ids = np.empty(len(players) + 1, dtype=np.int64)
+        for i, player in enumerate(players):
+            player_id = self._player_index.get(player["registry_id"])
+            if player_id is None:
+                player_id = len(self.players)
+                if player_id >= PLAYER_SLOTS:
+                    raise ValueError(f"More than {PLAYER_SLOTS} players; raise PLAYER_SLOTS and rebuild")
+                self.players.append(player)
+                self._player_index[player["registry_id"]] = player_id
+                self._player_index.setdefault(player["name"], player_id)
+            ids[i] = player_id
+        ids[-1] = 0   # NO_ID rows are masked out by the caller
+        return ids
+
+    # ---- updates ----
+
+    def add_store(self, store):
+        """Add (or replace) every match of a DeliveryStore; returns the number of matches."""
+        player_ids = self._encode_players(store.players)
+        match_rows, keys, counts = store_contributions(store, player_ids)
+        file_ids = [match["file_id"] for match in store.matches]
+        replaced = self.remove(file_ids, log=False)
+
+        rows = []
+        for file in file_ids:
+            self._file_index[file] = len(self.files)
+            self.files.append(file)
+            rows.append(self._file_index[file])
+        match_rows = np.array(rows, dtype=np.int32)[match_rows] if rows else match_rows.astype(np.int32)
+
+        self._merge(keys, counts)
+        old_files, old_keys, old_counts = self.contributions
+        self.contributions = (
+            np.concatenate([old_files, match_rows]),
+            np.concatenate([old_keys, keys]),
+            {name: np.concatenate([old_counts[name], counts[name]]).astype(np.int32) for name in METRICS},
+        )
+        self._reset_indexes()
+        logging.info(f"Matchups: added {len(file_ids)} matches ({replaced} replaced); "
+                     f"{len(self)} rows over {len(self.players)} players")
+        return len(file_ids)
+
+    def remove(self, file_ids, log=True):
+        """Take the counts of these match files back out of the matrix; returns the number removed."""
+        gone = {self._file_index[file] for file in file_ids if file in self._file_index}
+        if not gone:
+            return 0
+        old_files, old_keys, old_counts = self.contributions
+        removed = np.isin(old_files, list(gone))
+        self._merge(old_keys[removed], {name: -old_counts[name][removed] for name in METRICS})
+
+        # Renumber the remaining files so contribution rows keep indexing self.files
+        keep = np.ones(len(self.files), dtype=bool)
+        keep[list(gone)] = False
+        renumber = (np.cumsum(keep) - 1).astype(np.int32)
+        kept = ~removed
+        self.files = [file for file, keep_file in zip(self.files, keep) if keep_file]
+        self.contributions = (renumber[old_files[kept]], old_keys[kept],
+                              {name: old_counts[name][kept] for name in METRICS})
+        self._reset_indexes()
+        if log:
+            logging.info(f"Matchups: removed {len(gone)} matches; {len(self)} rows over {len(self.players)} players")
+        return len(gone)
+
+    def _merge(self, keys, counts):
+        keys = np.concatenate([self.keys, keys])
+        values = {name: np.concatenate([self.counts[name], counts[name]]) for name in METRICS}
+        self.keys, self.counts = _drop_empty(*_sum_by_key(keys, values))
+
+    # ---- lookups ----
+
+    def _row_of(self, batter, bowler, slot):
+        if self._rows is None:
+            self._rows = dict(zip(self.keys.tolist(), range(len(self.keys))))
+        return self._rows.get(pack_key(batter, bowler, slot))
+
+    def _record(self, row):
+        batter, bowler, slot = unpack_key(int(self.keys[row]))
+        record = {name: int(self.counts[name][row]) for name in METRICS}
+        balls, runs = record["balls"], record["runs"]
+        record.update(
+            batter=self.players[batter]["registry_id"],
+            batter_name=self.players[batter]["name"],
+            bowler=self.players[bowler]["registry_id"],
+            bowler_name=self.players[bowler]["name"],
+            phase=PHASES[slot - 1] if slot else None,
+            boundaries=record["fours"] + record["sixes"],
+            strike_rate=runs / balls * 100 if balls else None,
+            average=runs / record["dismissals"] if record["dismissals"] else None,
+        )
+        return record
+
+    def matchup(self, batter, bowler, phase=None):
+        """Counts of batter against bowler (registry ids or names), or None if they never met."""
+        batter, bowler = self.player_id(batter), self.player_id(bowler)
+        if batter == NO_ID or bowler == NO_ID:
+            return None
+        row = self._row_of(batter, bowler, phase_slot(phase))
+        return None if row is None else self._record(row)
+
+    def _rows_of(self, batter=None, bowler=None):
+        """Row numbers of one batter's or one bowler's matchups, all slots."""
+        if batter is not None:
+            start, stop = np.searchsorted(self.keys, [pack_key(batter, 0), pack_key(batter + 1, 0)])
+            return np.arange(start, stop)
+        if self._by_bowler is None:
+            _, bowlers, slots = unpack_key(self.keys)
+            order = np.argsort(bowlers, kind='stable')
+            self._by_bowler = (order, bowlers[order])
+        order, bowlers = self._by_bowler
+        start, stop = np.searchsorted(bowlers, [bowler, bowler + 1])
+        return order[start:stop]
+
+    def top(self, n=10, by="runs", batter=None, bowler=None, phase=None, min_balls=0, ascending=False):
+        """The n matchups with the highest (or lowest) `by`: for one batter, one bowler, or overall.
+
+        `by` is a metric, "boundaries" or "strike_rate"; matchups with fewer than min_balls
+        balls are left out.
+        """
+        slot = phase_slot(phase)
+        if batter is not None or bowler is not None:
+            player = self.player_id(batter if batter is not None else bowler)
+            if player == NO_ID:
+                return []
+            rows = self._rows_of(batter=player) if batter is not None else self._rows_of(bowler=player)
+            rows = rows[self.keys[rows] % PHASE_SLOTS == slot]
+            rows = rows[self.counts["balls"][rows] >= min_balls]
+            order = np.argsort(self._score(by)[rows], kind='stable')
+            ranked = rows[order if ascending else order[::-1]]
+        else:
+            ranking = (by, slot, min_balls, ascending)
+            if ranking not in self._rankings:
+                rows = np.flatnonzero((self.keys % PHASE_SLOTS == slot) & (self.counts["balls"] >= min_balls))
+                order = np.argsort(self._score(by)[rows], kind='stable')
+                self._rankings[ranking] = rows[order if ascending else order[::-1]]
+            ranked = self._rankings[ranking]
+        return [self._record(row) for row in ranked[:n]]
+
+    def _score(self, by):
+        if by in self.counts:
+            return self.counts[by]
+        if by == "boundaries":
+            return self.counts["fours"] + self.counts["sixes"]
+        if by == "strike_rate":
+            balls = self.counts["balls"]
+            return np.divide(self.counts["runs"] * 100.0, balls, out=np.zeros(len(balls)), where=balls > 0)
+        raise ValueError(f"Cannot rank matchups by {by!r}")
+
+    # ---- persistence ----
+
+    def save(self, out_dir=MATCHUP_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        contribution_files, contribution_keys, contribution_counts = self.contributions
+        arrays = {"keys": self.keys, "contribution_files": contribution_files, "contribution_keys": contribution_keys}
+        arrays.update(self.counts)
+        arrays.update({f"contribution_{name}": column for name, column in contribution_counts.items()})
+        for name, values in arrays.items():
+            np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(out_dir, "dictionaries.json"), 'w') as f:
+            json.dump({"version": MATCHUP_VERSION, "rows": len(self), "players": self.players, "files": self.files}, f)
+
+
+def load_matchups(store_dir=MATCHUP_DIR):
+    with open(os.path.join(store_dir, "dictionaries.json"), 'r') as f:
+        meta = json.load(f)
+    if meta.get("version") != MATCHUP_VERSION:
+        raise ValueError(f"Matchup store in {store_dir} has version {meta.get('version')}, "
+                         f"expected {MATCHUP_VERSION}. Rebuild it.")
+
+    def array(name):
+        return np.load(os.path.join(store_dir, f"{name}.npy"))
+
+    contributions = (array("contribution_files"), array("contribution_keys"),
+                     {name: array(f"contribution_{name}") for name in METRICS})
+    return MatchupMatrix(meta["players"], meta["files"], array("keys"), {name: array(name) for name in METRICS},
+                         contributions)
+
+
+def build_matchups(data_root=DATA_ROOT, files=None):
+    """Matchup matrix of every match file under data_root, or of the given files only."""
+    matrix = MatchupMatrix()
+    matrix.add_store(build_store(data_root, files))
+    return matrix
+
+
+def update_matchups(files, store_dir=MATCHUP_DIR):
+    """Add new or revised match files to the matchup store on disk, creating it if needed."""
+    matrix = load_matchups(store_dir) if os.path.exists(os.path.join(store_dir, "dictionaries.json")) else MatchupMatrix()
+    if files:
+        matrix.add_store(build_store(files=sorted(files)))
+        matrix.save(store_dir)
+    return matrix
+
+
+def sync_matchups(ledger, store_dir=MATCHUP_DIR):
+    """Bring the matchup store up to date with the files an ImportLedger recorded or forgot since
+    it last took them in, including those of a run that stopped before updating the store."""
+    file_ids = set(ledger.unsynced_matchups)
+    if not file_ids:
+        return None
+    exists = os.path.exists(os.path.join(store_dir, "dictionaries.json"))
+    matrix = load_matchups(store_dir) if exists else MatchupMatrix()
+    # Recorded files are replaced, forgotten ones (purged or replaced by another) only removed
+    removed = matrix.remove(file_ids)
+    files = []
+    for file in sorted(file_ids & set(ledger.entries)):
+        path = ledger.entries[file]["path"]
+        if os.path.exists(path):
+            files.append(path)
+        else:
+            logging.warning(f"Matchups: recorded file {path} no longer exists; left out of the store")
+    if files:
+        matrix.add_store(build_store(files=files))
+    if files or removed:
+        matrix.save(store_dir)
+    # Saved before it is marked: a crash in between only means taking the same files in again
+    ledger.matchups_synced(file_ids)
+    return matrix
+
+# ------------------------ Main Execution ------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the batter x bowler matchup store.")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--out", default=MATCHUP_DIR)
+    parser.add_argument("--update", nargs="+", metavar="FILE",
+                        help="Add or replace these match files instead of rebuilding from the whole corpus")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
+    if args.update:
+        files = [file for path in args.update
+                 for file in (sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path])]
+        matrix = update_matchups(files, args.out)
+    else:
+        matrix = build_matchups(args.data_root)
+        matrix.save(args.out)
+    print(f"Saved {len(matrix)} matchup rows over {len(matrix.players)} players and {len(matrix.files)} matches to {args.out}")
@@ -0,0 +1,524 @@
+import asyncio
+import itertools
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from py2neo.errors import Neo4jError
+
+# ------------------------ Configuration ------------------------
+
+DEFAULT_LATENCY = 0.0  # seconds per simulated Bolt round trip
+ASYNC_MAX_RETRIES = 5  # execute_write attempts before a simulated transient error is raised
+
+# ------------------------ Cypher Subset ------------------------
+
+# Only the statements the importers actually send are understood; anything else raises.
+_NODE_MERGE = re.compile(r"UNWIND \$rows AS r MERGE \(n:(\w+) \{([^}]*)\}\) SET n (\+?)= r$")
+_REL_MERGE = re.compile(r"UNWIND \$rows AS r "
+                        r"MATCH \(a:(\w+) \{([^}]*)\}\) "
+                        r"MATCH \(b:(\w+) \{([^}]*)\}\) "
+                        r"MERGE \(a\)-\[rel:(\w+)\]->\(b\) SET rel \+= r\.props$")
+_DELETE_BY_PROPERTY = re.compile(r"MATCH \(n:(\w+) \{(\w+): \$(\w+)\}\) DETACH DELETE n$")
+_DELETE_NEIGHBOURS = re.compile(r"MATCH \(:(\w+) \{(\w+): \$(\w+)\}\)-\[:(\w+)\]->\((\w+):(\w+)\) DETACH DELETE \5$")
+_DELETE_IN_LIMIT = re.compile(r"MATCH \(n:(\w+)\) WHERE n\.(\w+) IN \$(\w+) "
+                              r"WITH n LIMIT \$(\w+) DETACH DELETE n RETURN count\(n\) AS (\w+)$")
+_DELETE_NEIGHBOURS_IN_LIMIT = re.compile(r"MATCH \((\w+):(\w+)\)-\[:(\w+)\]->\(n:(\w+)\) WHERE \1\.(\w+) IN \$(\w+) "
+                                         r"WITH n LIMIT \$(\w+) DETACH DELETE n RETURN count\(n\) AS (\w+)$")
+_RETURN_PROPERTY = re.compile(r"MATCH \((\w+):(\w+) \{(\w+): \$(\w+)\}\) RETURN \1\.(\w+) AS (\w+)$")
+_RETURN_PROPERTIES = re.compile(r"MATCH \(n:(\w+)\) RETURN properties\(n\) AS (\w+)$")
+_COUNT_LABELS = re.compile(r"MATCH \(n\) RETURN labels\(n\)\[0\] AS (\w+), count\(\*\) AS (\w+)$")
+_COUNT_TYPES = re.compile(r"MATCH \(\)-\[r\]->\(\) RETURN type\(r\) AS (\w+), count\(\*\) AS (\w+)$")
+_KEY_FIELD = re.compile(r"(\w+): r\.(?:(start|end)\[(\d+)\]|(\w+))")
+
+
+def _normalize(cypher):
+    return " ".join(cypher.split())
+
+
+def _key_fields(key_map):
+    """Parse "k1: r.k1, k2: r.end[1]" into [(property, (row_field, index_or_None))]."""
+    fields = []
+    for prop, side, index, row_key in _KEY_FIELD.findall(key_map):
+        fields.append((prop, (row_key, None) if row_key else (side, int(index))))
+    return fields
+
+
+def _row_value(row, source):
+    field, index = source
+    return row[field] if index is None else row[field][index]
+
+
+class Record(dict):
+    """Stand-in for a py2neo Record: supports record["key"] and record[0]."""
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return dict.__getitem__(self, key)
+
+
+class Cursor(list):
+    """Stand-in for a py2neo Cursor: a list of Records with evaluate() and data()."""
+
+    def evaluate(self, field=0):
+        return self[0][field] if self else None
+
+    def data(self):
+        return [dict(record) for record in self]
+
+
+class MemoryTransaction:
+    """Statements are queued and applied atomically on commit; reads inside it see no results."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.statements = []
+        self.finished = False
+
+    def run(self, cypher, parameters=None, **kwparameters):
+        self.graph._round_trip()
+        self.statements.append((cypher, dict(parameters or {}, **kwparameters)))
+        return Cursor()
+
+# ------------------------ Graph ------------------------
+
+class MemoryGraph:
+    """In-memory stand-in for the subset of py2neo.Graph the importers use.
+
+    Supports merge (primary label/key, Subgraph unions), push, create, begin/commit/rollback and
+    run for the Cypher statements the batch writer and benchmarks send. Every call counts Bolt
+    round trips and can sleep latency seconds per round trip, so importer throughput can be
+    compared without a database. With failure_rate, that fraction of writes (commits and
+    auto-committed merge/create/push calls) fails with a transient deadlock before changing
+    anything, to exercise retries.
+    """
+
+    def __init__(self, latency=DEFAULT_LATENCY, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.name = "memory"
+        self.service = self
+        self.nodes = {}          # id -> {"labels": set, "props": dict}
+        self.relationships = {}  # id -> {"start": id, "type": str, "end": id, "props": dict}
+        self._rel_index = {}     # (start, type, end) -> id
+        self._adjacency = defaultdict(set)  # node id -> ids of its relationships
+        self._key_indexes = {}   # (label, keys) -> {values: id}
+        self._ids = itertools.count()
+        self._lock = threading.RLock()
+        self.round_trips = 0
+        self.calls = Counter()
+
+    # -------- accounting --------
+
+    def _round_trip(self, count=1):
+        with self._lock:
+            self.round_trips += count
+        if self.latency:
+            time.sleep(self.latency * count)
+
+    async def _async_round_trip(self, count=1):
+        with self._lock:
+            self.round_trips += count
+        if self.latency:
+            await asyncio.sleep(self.latency * count)
+
+    def _maybe_fail(self):
+        if not self.failure_rate:
+            return
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            self.failures += failed
+        if failed:
+            raise Neo4jError.hydrate({"code": "Neo.TransientError.Transaction.DeadlockDetected",
+                                      "message": "Simulated deadlock"})
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips = 0
+            self.calls.clear()
+
+    # -------- storage primitives --------
+
+    def _index(self, label, keys):
+        index = self._key_indexes.get((label, keys))
+        if index is None:
+            index = {}
+            for node_id, node in self.nodes.items():
+                if label in node["labels"] and all(k in node["props"] for k in keys):
+                    index[tuple(node["props"][k] for k in keys)] = node_id
+            self._key_indexes[(label, keys)] = index
+        return index
+
+    def _unindex(self, node_id):
+        node = self.nodes[node_id]
+        for (label, keys), index in self._key_indexes.items():
+            if label in node["labels"] and all(k in node["props"] for k in keys):
+                values = tuple(node["props"][k] for k in keys)
+                if index.get(values) == node_id:
+                    del index[values]
+
+    def _reindex(self, node_id):
+        node = self.nodes[node_id]
+        for (label, keys), index in self._key_indexes.items():
+            if label in node["labels"] and all(k in node["props"] for k in keys):
+                index.setdefault(tuple(node["props"][k] for k in keys), node_id)
+
+    def _create_node(self, labels, props):
+        node_id = next(self._ids)
+        self.nodes[node_id] = {"labels": set(labels), "props": {k: v for k, v in props.items() if v is not None}}
+        self._reindex(node_id)
+        return node_id
+
+    def _set_node(self, node_id, props, replace=False, labels=None):
+        self._unindex(node_id)
+        node = self.nodes[node_id]
+        if replace:
+            node["props"] = {}
+        for k, v in props.items():
+            if v is None:
+                node["props"].pop(k, None)
+            else:
+                node["props"][k] = v
+        if labels is not None:
+            node["labels"] = set(labels)
+        self._reindex(node_id)
+
+    def _merge_node(self, label, keys, props, labels=(), replace=False):
+        values = tuple(props.get(k) for k in keys)
+        node_id = self._index(label, keys).get(values)
+        if node_id is None:
+            return self._create_node({label, *labels}, props)
+        self._set_node(node_id, props, replace=replace, labels=self.nodes[node_id]["labels"] | {label, *labels})
+        return node_id
+
+    def _merge_relationship(self, start, rel_type, end, props):
+        rel_id = self._rel_index.get((start, rel_type, end))
+        if rel_id is None:
+            return self._create_relationship(start, rel_type, end, props)
+        self.relationships[rel_id]["props"].update({k: v for k, v in props.items() if v is not None})
+        return rel_id
+
+    def _create_relationship(self, start, rel_type, end, props):
+        rel_id = next(self._ids)
+        self.relationships[rel_id] = {"start": start, "type": rel_type, "end": end,
+                                      "props": {k: v for k, v in props.items() if v is not None}}
+        self._rel_index.setdefault((start, rel_type, end), rel_id)
+        self._adjacency[start].add(rel_id)
+        self._adjacency[end].add(rel_id)
+        return rel_id
+
+    def _detach_delete(self, node_id):
+        for rel_id in self._adjacency.pop(node_id, ()):
+            rel = self.relationships.pop(rel_id)
+            if self._rel_index.get((rel["start"], rel["type"], rel["end"])) == rel_id:
+                del self._rel_index[(rel["start"], rel["type"], rel["end"])]
+            other = rel["end"] if rel["start"] == node_id else rel["start"]
+            self._adjacency[other].discard(rel_id)
+        self._unindex(node_id)
+        del self.nodes[node_id]
+
+    def _neighbours(self, owners, rel_type, target_label):
+        """Ids of target_label nodes reached from owners over outgoing rel_type relationships."""
+        targets = set()
+        for owner in owners:
+            for rel_id in self._adjacency.get(owner, ()):
+                rel = self.relationships[rel_id]
+                if rel["start"] == owner and rel["type"] == rel_type and target_label in self.nodes[rel["end"]]["labels"]:
+                    targets.add(rel["end"])
+        return targets
+
+    def _find(self, label, prop, value):
+        return [node_id for node_id, node in self.nodes.items()
+                if label in node["labels"] and node["props"].get(prop) == value]
+
+    # -------- py2neo Graph API --------
+
+    def _is_bound(self, entity):
+        if entity.graph is None:
+            return False
+        if entity.graph is not self:
+            raise ValueError(f"Entity {entity!r} is already bound to another graph")
+        return True
+
+    def merge(self, subgraph, label=None, *property_keys):
+        keys = tuple(k for key in property_keys for k in (key if isinstance(key, tuple) else (key,)))
+        self.calls["merge"] += 1
+        self._maybe_fail()
+        node_groups = set()
+        rel_types = set()
+        with self._lock:
+            for node in subgraph.nodes:
+                if self._is_bound(node):
+                    continue
+                p_label = node.__primarylabel__ or label
+                p_keys = _as_keys(node.__primarykey__) or keys
+                if p_label is None or not p_keys:
+                    raise ValueError("Primary label and primary key are required for MERGE operation")
+                node_groups.add((p_label, p_keys))
+                self._bind(node, self._merge_node(p_label, p_keys, dict(node), node.labels))
+            for rel in subgraph.relationships:
+                if self._is_bound(rel):
+                    continue
+                rel_types.add(type(rel).__name__)
+                rel.identity = self._merge_relationship(rel.start_node.identity, type(rel).__name__,
+                                                        rel.end_node.identity, dict(rel))
+                rel.graph = self
+        self._round_trip(len(node_groups) + len(rel_types) + 1)
+
+    def create(self, subgraph):
+        self.calls["create"] += 1
+        self._maybe_fail()
+        with self._lock:
+            for node in subgraph.nodes:
+                if not self._is_bound(node):
+                    self._bind(node, self._create_node(node.labels, dict(node)))
+            for rel in subgraph.relationships:
+                if not self._is_bound(rel):
+                    rel.identity = self._create_relationship(rel.start_node.identity, type(rel).__name__,
+                                                             rel.end_node.identity, dict(rel))
+                    rel.graph = self
+        self._round_trip(2)
+
+    def push(self, subgraph):
+        self.calls["push"] += 1
+        self._maybe_fail()
+        count = 0
+        with self._lock:
+            for node in subgraph.nodes:
+                if self._is_bound(node):
+                    self._set_node(node.identity, dict(node), replace=True, labels=node.labels)
+                    count += 1
+            for rel in subgraph.relationships:
+                if self._is_bound(rel):
+                    self.relationships[rel.identity]["props"] = dict(rel)
+                    count += 1
+        self._round_trip(count + 1)
+
+    def run(self, cypher, parameters=None, **kwparameters):
+        self.calls["run"] += 1
+        self._round_trip()
+        with self._lock:
+            return self._execute(cypher, dict(parameters or {}, **kwparameters))
+
+    def begin(self):
+        self.calls["begin"] += 1
+        return MemoryTransaction(self)
+
+    def commit(self, tx):
+        self.calls["commit"] += 1
+        self._round_trip()
+        if tx.finished:
+            raise RuntimeError("Transaction already closed")
+        self._maybe_fail()
+        self._apply(tx.statements)
+        tx.finished = True
+
+    def rollback(self, tx):
+        self.calls["rollback"] += 1
+        self._round_trip()
+        tx.statements = []
+        tx.finished = True
+
+    def async_driver(self, max_connection_pool_size=100):
+        """neo4j AsyncDriver stand-in writing to this graph; see AsyncMemoryDriver."""
+        return AsyncMemoryDriver(self, max_connection_pool_size)
+
+    def _apply(self, statements):
+        with self._lock:
+            for cypher, parameters in statements:
+                self._execute(cypher, parameters)
+
+    def _bind(self, node, node_id):
+        node.graph = self
+        node.identity = node_id
+        node._remote_labels = frozenset(node.labels)
+
+    # -------- Cypher execution --------
+
+    def _execute(self, cypher, parameters):
+        statement = _normalize(cypher)
+
+        match = _NODE_MERGE.match(statement)
+        if match:
+            label, fields, replace = match.group(1), _key_fields(match.group(2)), not match.group(3)
+            keys = tuple(prop for prop, _ in fields)
+            for row in parameters["rows"]:
+                self._merge_node(label, keys, row, replace=replace)
+            return Cursor()
+
+        match = _REL_MERGE.match(statement)
+        if match:
+            start_label, start_fields, end_label, end_fields, rel_type = match.groups()
+            start_fields, end_fields = _key_fields(start_fields), _key_fields(end_fields)
+            start_keys = tuple(prop for prop, _ in start_fields)
+            end_keys = tuple(prop for prop, _ in end_fields)
+            for row in parameters["rows"]:
+                start = self._index(start_label, start_keys).get(tuple(_row_value(row, s) for _, s in start_fields))
+                end = self._index(end_label, end_keys).get(tuple(_row_value(row, s) for _, s in end_fields))
+                if start is not None and end is not None:
+                    self._merge_relationship(start, rel_type, end, row.get("props") or {})
+            return Cursor()
+
+        match = _DELETE_BY_PROPERTY.match(statement)
+        if match:
+            label, prop, param = match.groups()
+            for node_id in self._find(label, prop, parameters[param]):
+                self._detach_delete(node_id)
+            return Cursor()
+
+        match = _DELETE_NEIGHBOURS.match(statement)
+        if match:
+            label, prop, param, rel_type, _, target_label = match.groups()
+            owners = self._find(label, prop, parameters[param])
+            for node_id in self._neighbours(owners, rel_type, target_label):
+                self._detach_delete(node_id)
+            return Cursor()
+
+        match = _DELETE_IN_LIMIT.match(statement)
+        if match:
+            label, prop, values_param, limit_param, column = match.groups()
+            values = set(parameters[values_param])
+            targets = [node_id for node_id, node in self.nodes.items()
+                       if label in node["labels"] and node["props"].get(prop) in values][:parameters[limit_param]]
+            for node_id in targets:
+                self._detach_delete(node_id)
+            return Cursor([Record({column: len(targets)})])
+
+        match = _DELETE_NEIGHBOURS_IN_LIMIT.match(statement)
+        if match:
+            _, label, rel_type, target_label, prop, values_param, limit_param, column = match.groups()
+            values = set(parameters[values_param])
+            owners = [node_id for node_id, node in self.nodes.items()
+                      if label in node["labels"] and node["props"].get(prop) in values]
+            targets = sorted(self._neighbours(owners, rel_type, target_label))[:parameters[limit_param]]
+            for node_id in targets:
+                self._detach_delete(node_id)
+            return Cursor([Record({column: len(targets)})])
+
+        match = _RETURN_PROPERTY.match(statement)
+        if match:
+            _, label, prop, param, returned, column = match.groups()
+            return Cursor(Record({column: self.nodes[node_id]["props"].get(returned)})
+                          for node_id in self._find(label, prop, parameters[param]))
+
+        match = _RETURN_PROPERTIES.match(statement)
+        if match:
+            label, column = match.groups()
+            return Cursor(Record({column: dict(node["props"])})
+                          for node in self.nodes.values() if label in node["labels"])
+
+        match = _COUNT_LABELS.match(statement)
+        if match:
+            counts = Counter(sorted(node["labels"])[0] if len(node["labels"]) == 1 else next(iter(node["labels"]))
+                             for node in self.nodes.values())
+            return Cursor(Record({match.group(1): label, match.group(2): count}) for label, count in counts.items())
+
+        match = _COUNT_TYPES.match(statement)
+        if match:
+            counts = Counter(rel["type"] for rel in self.relationships.values())
+            return Cursor(Record({match.group(1): rel_type, match.group(2): count}) for rel_type, count in counts.items())
+
+        raise NotImplementedError(f"MemoryGraph does not understand: {statement}")
+
+    # -------- inspection helpers --------
+
+    def node_count(self, label=None):
+        return sum(1 for node in self.nodes.values() if label is None or label in node["labels"])
+
+    def relationship_count(self, rel_type=None):
+        return sum(1 for rel in self.relationships.values() if rel_type is None or rel["type"] == rel_type)
+
+    def find_nodes(self, label, **properties):
+        return [dict(node["props"]) for node in self.nodes.values()
+                if label in node["labels"] and all(node["props"].get(k) == v for k, v in properties.items())]
+
+    def shape(self):
+        """Canonical, identity-free view of the graph for comparing two imports."""
+        def node_key(node_id):
+            node = self.nodes[node_id]
+            return (tuple(sorted(node["labels"])), tuple(sorted((k, repr(v)) for k, v in node["props"].items())))
+        nodes = sorted(node_key(node_id) for node_id in self.nodes)
+        rels = sorted((node_key(rel["start"]), rel["type"], node_key(rel["end"]),
+                       tuple(sorted((k, repr(v)) for k, v in rel["props"].items())))
+                      for rel in self.relationships.values())
+        return nodes, rels
+
+
+def _as_keys(key):
+    if key is None:
+        return ()
+    return tuple(key) if isinstance(key, (tuple, list)) else (key,)
+
+# ------------------------ Async Driver ------------------------
+
+class _AsyncResult:
+    async def consume(self):
+        return None
+
+
+class AsyncMemoryTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+        self.statements = []
+
+    async def run(self, query, parameters=None, **kwparameters):
+        await self.graph._async_round_trip()
+        self.statements.append((query, dict(parameters or {}, **kwparameters)))
+        return _AsyncResult()
+
+
+class AsyncMemorySession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def close(self):
+        pass
+
+    async def execute_write(self, transaction_function, *args, **kwargs):
+        # Holds a pooled connection for the whole transaction and replays the transaction
+        # function on transient errors, as the real driver does
+        graph = self.driver.graph
+        async with self.driver.pool:
+            for attempt in range(ASYNC_MAX_RETRIES):
+                tx = AsyncMemoryTransaction(graph)
+                result = await transaction_function(tx, *args, **kwargs)
+                await graph._async_round_trip()
+                graph.calls["commit"] += 1
+                try:
+                    graph._maybe_fail()
+                except Neo4jError:
+                    if attempt == ASYNC_MAX_RETRIES - 1:
+                        raise
+                    continue
+                graph._apply(tx.statements)
+                return result
+
+
+class AsyncMemoryDriver:
+    """Stand-in for neo4j.AsyncDriver over a MemoryGraph: sessions, execute_write and a
+    connection pool of max_connection_pool_size. Latency is awaited, not slept, so many
+    transactions can wait on the simulated network at once."""
+
+    def __init__(self, graph, max_connection_pool_size=100):
+        self.graph = graph
+        self.pool = asyncio.Semaphore(max_connection_pool_size)
+
+    def session(self, **config):
+        return AsyncMemorySession(self)
+
+    async def verify_connectivity(self):
+        await self.graph._async_round_trip()
+
+    async def close(self):
+        pass
@@ -0,0 +1,67 @@
+from player_aggregates import NOT_OUT_KINDS
+
+# ------------------------ Partnership Tracking ------------------------
+
+class PartnershipTracker:
+    """Partnerships of one innings, fed every delivery in file order during the ingest pass.
+
+    A partnership ends with a dismissal on its last delivery; wicket is the number of the wicket
+    it was for (1 is the opening stand). A retirement (NOT_OUT_KINDS) closes it unbroken, and so
+    does a change of pair without a recorded dismissal (a retirement missing from the data); the
+    next partnership keeps the same wicket number.
+    """
+
+    def __init__(self):
+        self.partnerships = []
+        self.current = None
+        self.wicket = 1
+
+    def add(self, batter, non_striker, runs_batter, runs_total, is_legal, ball_index, ball, wicket_kinds=()):
+        current = self.current
+        if current is not None and {current["batter_1"], current["batter_2"]} != {batter, non_striker}:
+            self._close(dismissed=False)
+            current = None
+        if current is None:
+            current = self.current = {
+                "wicket": self.wicket,
+                "batter_1": batter,
+                "batter_2": non_striker,
+                "runs": 0,
+                "balls": 0,
+                "batter_1_runs": 0,
+                "batter_2_runs": 0,
+                "start_ball_index": ball_index,
+                "start_ball": ball,
+            }
+        current["runs"] += runs_total
+        current["balls"] += is_legal
+        current["batter_1_runs" if batter == current["batter_1"] else "batter_2_runs"] += runs_batter
+        current["end_ball_index"] = ball_index
+        current["end_ball"] = ball
+        dismissals = sum(kind not in NOT_OUT_KINDS for kind in wicket_kinds)
+        if dismissals:
+            self.wicket += dismissals
+            self._close(dismissed=True)
+        elif wicket_kinds:
+            self._close(dismissed=False)
+
+    def _close(self, dismissed):
+        self.current["unbroken"] = not dismissed
+        self.partnerships.append(self.current)
+        self.current = None
+
+    def finish(self):
+        """All partnerships of the innings; the one still at the crease is unbroken."""
+        if self.current is not None:
+            self._close(dismissed=False)
+        return self.partnerships
+
+
+def partnership_nodes(innings_key, match_id, innings_number, team, partnerships):
+    """Partnership node properties, keyed innings_key + position in the innings."""
+    return [dict(partnership,
+                 partnership_key=f"{innings_key}_{position}",
+                 match_id=match_id,
+                 innings_number=innings_number,
+                 team=team)
+            for position, partnership in enumerate(partnerships, start=1)]
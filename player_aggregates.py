@@ -0,0 +1,217 @@
+import logging
+from collections import defaultdict
+
+from batch_writer import call_with_retries, relationship_merge_query
+
+# ------------------------ Configuration ------------------------
+
+# Additive per-match counts; everything else on the aggregate nodes is derived from these
+COUNT_FIELDS = (
+    "matches",
+    "innings", "runs", "balls_faced", "outs", "fours", "sixes", "fifties", "hundreds",
+    "bowling_innings", "balls_bowled", "runs_conceded", "wickets",
+    "catches",
+)
+
+# Dismissals that do not count as an innings ended, for the batting average
+NOT_OUT_KINDS = {"retired hurt", "retired not out"}
+
+# Dismissals credited to the bowler; run outs, obstructions and retirements are not wickets
+BOWLER_KINDS = {"bowled", "caught", "caught and bowled", "lbw", "stumped", "hit wicket"}
+
+# Whole node replaced, so a derived value that becomes undefined (e.g. no outs left after a
+# replaced match is reverted) is removed rather than left stale
+CAREER_QUERY = ("UNWIND $rows AS r "
+                "MERGE (n:PlayerCareer {player_id: r.player_id}) "
+                "SET n = r")
+SEASON_QUERY = ("UNWIND $rows AS r "
+                "MERGE (n:PlayerSeason {player_id: r.player_id, season: r.season}) "
+                "SET n = r")
+CAREER_LINKS = relationship_merge_query("Player", ("registry_id",), "HAS_CAREER", "PlayerCareer", ("player_id",))
+SEASON_LINKS = relationship_merge_query("Player", ("registry_id",), "HAS_SEASON_STATS",
+                                        "PlayerSeason", ("player_id", "season"))
+SEASON_OF = relationship_merge_query("PlayerSeason", ("player_id", "season"), "IN_SEASON", "Season", ("year",))
+
+# ------------------------ Per-Match Contributions ------------------------
+
+def match_contributions(season, player_refs, player_stats, dismissals, bowler_wickets):
+    """One match's additive contribution per player: {registry_id: {"name", "season", "stats"}}.
+
+    player_stats are the match totals the PlayerMatchPerformance nodes are built from,
+    dismissals counts each batter's Dismissal nodes and bowler_wickets each bowler's
+    BOWLER_KINDS dismissals (the performance nodes' wickets include run outs). Only non-zero
+    counts are kept, so the contribution stays small enough to store in the import ledger.
+    """
+    contributions = {}
+    for name, player_ref in player_refs.items():
+        stats = player_stats.get(name, {})
+        runs = stats.get("runs", 0)
+        outs = dismissals.get(name, 0)
+        batted = stats.get("balls_faced", 0) > 0 or outs > 0
+        bowled = stats.get("balls_bowled", 0) > 0
+        counts = {
+            "matches": 1,
+            "innings": int(batted),
+            "runs": runs,
+            "balls_faced": stats.get("balls_faced", 0),
+            "outs": outs,
+            "fours": stats.get("fours", 0),
+            "sixes": stats.get("sixes", 0),
+            "fifties": int(50 <= runs < 100),
+            "hundreds": int(runs >= 100),
+            "bowling_innings": int(bowled),
+            "balls_bowled": stats.get("balls_bowled", 0),
+            "runs_conceded": stats.get("runs_conceded", 0) if bowled else 0,
+            "wickets": bowler_wickets.get(name, 0) if bowled else 0,
+            "catches": stats.get("catches", 0),
+        }
+        contributions[player_ref.values[0]] = {
+            "name": name,
+            "season": season,
+            "stats": {field: n for field, n in counts.items() if n},
+        }
+    return contributions
+
+
+def derived(counts):
+    """Averages and rates of a count record; undefined ones (no outs, no balls) are None."""
+    runs, outs, balls = counts.get("runs", 0), counts.get("outs", 0), counts.get("balls_faced", 0)
+    conceded, wickets, bowled = counts.get("runs_conceded", 0), counts.get("wickets", 0), counts.get("balls_bowled", 0)
+    return {
+        "batting_average": runs / outs if outs else None,
+        "strike_rate": runs / balls * 100 if balls else None,
+        "economy": conceded / (bowled / 6) if bowled else None,
+        "bowling_average": conceded / wickets if wickets else None,
+    }
+
+# ------------------------ Aggregates ------------------------
+
+class PlayerAggregates:
+    """Career and per-season count records per player, kept current by adding each imported
+    match's contribution and subtracting it again when the match is replaced or forgotten.
+
+    Lookups are dictionary reads. apply() returns the players it changed.
+    """
+
+    def __init__(self):
+        self.career = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))
+        self.seasons = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))   # (player_id, season) -> counts
+        self.player_seasons = defaultdict(set)
+        self.names = {}
+
+    def apply(self, contributions, sign=1):
+        contributions = contributions or {}
+        for player_id, contribution in contributions.items():
+            career = self.career[player_id]
+            season = self.seasons[(player_id, contribution["season"])]
+            self.player_seasons[player_id].add(contribution["season"])
+            for field, n in contribution["stats"].items():
+                career[field] += sign * n
+                season[field] += sign * n
+            self.names.setdefault(player_id, contribution["name"])
+        return set(contributions)
+
+    def career_of(self, player_id):
+        counts = self.career.get(player_id)
+        if counts is None or not counts["matches"]:
+            return None
+        return dict(counts, player_id=player_id, name=self.names.get(player_id), **derived(counts))
+
+    def season_of(self, player_id, season):
+        counts = self.seasons.get((player_id, season))
+        if counts is None or not counts["matches"]:
+            return None
+        return dict(counts, player_id=player_id, season=season, name=self.names.get(player_id), **derived(counts))
+
+    def seasons_of(self, player_id):
+        return sorted(self.player_seasons.get(player_id, ()), key=str)
+
+    def records(self, player_ids=None):
+        """(career rows, season rows) for some players, or everyone; players whose every match
+        was reverted come out with all counts zero."""
+        player_ids = self.career.keys() if player_ids is None else player_ids
+        careers, seasons = [], []
+        for player_id in sorted(player_ids):
+            careers.append(self.career_of(player_id) or self._empty(player_id))
+            for season in self.seasons_of(player_id):
+                seasons.append(self.season_of(player_id, season) or self._empty(player_id, season=season))
+        return careers, seasons
+
+    def _empty(self, player_id, **keys):
+        return dict(dict.fromkeys(COUNT_FIELDS, 0), player_id=player_id, name=self.names.get(player_id), **keys)
+
+# ------------------------ Graph ------------------------
+
+def _write_records(graph, careers, seasons):
+    tx = graph.begin()
+    try:
+        for query, rows in ((CAREER_QUERY, careers), (SEASON_QUERY, seasons)):
+            if rows:
+                tx.run(query, {"rows": rows})
+        links = [{"start": [r["player_id"]], "end": [r["player_id"]], "props": {}} for r in careers]
+        season_links = [{"start": [r["player_id"]], "end": [r["player_id"], r["season"]], "props": {}} for r in seasons]
+        season_of = [{"start": [r["player_id"], r["season"]], "end": [r["season"]], "props": {}} for r in seasons]
+        for query, rows in ((CAREER_LINKS, links), (SEASON_LINKS, season_links), (SEASON_OF, season_of)):
+            if rows:
+                tx.run(query, {"rows": rows})
+        graph.commit(tx)
+    except Exception:
+        try:
+            graph.rollback(tx)
+        except Exception as exc:
+            logging.debug(f"Rollback of player aggregates failed: {exc}")
+        raise
+
+
+def write_player_aggregates(graph, aggregates, player_ids):
+    """Rewrite the PlayerCareer and PlayerSeason nodes of the given players in one transaction."""
+    careers, seasons = aggregates.records(player_ids)
+    call_with_retries(_write_records, graph, careers, seasons, description="player aggregates")
+    logging.info(f"Updated career aggregates of {len(careers)} players ({len(seasons)} player seasons)")
+    return len(careers)
+
+
+def read_player_aggregates(graph):
+    """(careers {player_id: props}, seasons {(player_id, season): props}) as stored in the graph."""
+    careers = {r["props"]["player_id"]: r["props"]
+               for r in graph.run("MATCH (n:PlayerCareer) RETURN properties(n) AS props")}
+    seasons = {(r["props"]["player_id"], r["props"]["season"]): r["props"]
+               for r in graph.run("MATCH (n:PlayerSeason) RETURN properties(n) AS props")}
+    return careers, seasons
+
+# ------------------------ Verification ------------------------
+
+def diff_aggregates(expected, actual, label):
+    """Differences between two {key: record} maps; records with no matches count as absent."""
+    def present(records):
+        return {key: record for key, record in records.items() if record and record.get("matches")}
+
+    expected, actual = present(expected), present(actual)
+    differences = []
+    for key in sorted(expected.keys() | actual.keys(), key=str):
+        want, got = expected.get(key), actual.get(key)
+        if want is None or got is None:
+            differences.append(f"{label} {key}: expected {want and 'present' or 'absent'}, "
+                               f"found {got and 'present' or 'absent'}")
+            continue
+        for field in sorted(want.keys() | got.keys()):
+            a, b = want.get(field), got.get(field)
+            if isinstance(a, float) and isinstance(b, float) and abs(a - b) < 1e-9:
+                continue
+            if a != b:
+                differences.append(f"{label} {key} {field}: expected {a!r}, found {b!r}")
+    return differences
+
+
+def recompute(contributions):
+    """Fresh PlayerAggregates from an iterable of per-match contributions."""
+    aggregates = PlayerAggregates()
+    for match in contributions:
+        aggregates.apply(match)
+    return aggregates
+
+
+def aggregate_maps(aggregates):
+    careers, seasons = aggregates.records()
+    return ({r["player_id"]: r for r in careers},
+            {(r["player_id"], r["season"]): r for r in seasons})
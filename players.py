@@ -1,9 +1,9 @@
 import os
-import json
+
+from match_cache import load_match
 
 def get_players_from_file(file_path):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+    data = load_match(file_path)
     
     players = set()
     if 'info' in data and 'players' in data['info']:
@@ -1,6 +1,8 @@
 import os
 import json
 
+from match_cache import load_match
+
 def rename_teams(directory):
     team_mappings = {
         "Royal Challengers Bengaluru": "Royal Challengers Bangalore",
@@ -29,12 +31,11 @@ def rename_teams(directory):
             if file.endswith('.json'):
                 file_path = os.path.join(root, file)
                 
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                    except json.JSONDecodeError:
-                        print(f"Error decoding JSON in file: {file_path}")
-                        continue
+                try:
+                    data = load_match(file_path)
+                except json.JSONDecodeError:
+                    print(f"Error decoding JSON in file: {file_path}")
+                    continue
 
                 original_data = json.dumps(data)
                 update_team_names(data)
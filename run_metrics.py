@@ -0,0 +1,264 @@
+import json
+import marshal
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ------------------------ Configuration ------------------------
+
+REPORT_PATH = "import_report.json"
+
+LOAD = "load"
+NORMALIZE = "normalize"
+LOAD_DIMENSIONS = "load_dimensions"
+SEASON_FINALIZE = "season_finalize"
+PLAYER_AGGREGATES = "player_aggregates"
+MATCHUPS = "matchups"
+WRITE_RELATIONSHIPS = "write:relationships"
+WRITE_DELETE = "write:delete"
+WRITE_COMMIT = "write:commit"
+WRITE_OTHER = "write:other"
+
+_NODE_STATEMENT = re.compile(r"MERGE \(n:(\w+)")
+_REL_STATEMENT = re.compile(r"MERGE \(a\)-\[rel:")
+
+
+def write_stage(label):
+    return f"write:{label}"
+
+
+def payload_bytes(value):
+    """Approximate wire size of statement parameters or entity properties."""
+    try:
+        return len(marshal.dumps(value))
+    except ValueError:
+        return len(repr(value))
+
+
+def statement_stage(cypher):
+    match = _NODE_STATEMENT.search(cypher)
+    if match:
+        return write_stage(match.group(1))
+    if _REL_STATEMENT.search(cypher):
+        return WRITE_RELATIONSHIPS
+    if "DELETE" in cypher:
+        return WRITE_DELETE
+    return WRITE_OTHER
+
+# ------------------------ Metrics ------------------------
+
+class _Totals:
+    __slots__ = ("seconds", "calls", "bytes")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.bytes = 0
+
+    def add(self, seconds, calls, nbytes):
+        self.seconds += seconds
+        self.calls += calls
+        self.bytes += nbytes
+
+    def to_dict(self):
+        return {"seconds": round(self.seconds, 6), "calls": self.calls, "bytes": self.bytes}
+
+
+class RunMetrics:
+    """Wall time, call counts and bytes per importer stage, overall and per file and season.
+
+    Stages are load, normalize, load_dimensions, write:<Label>, write:relationships, write:delete,
+    write:commit and season_finalize. Stages may nest (season_finalize includes its own writes) and are summed
+    across threads and worker processes, so stage times can exceed the run's wall time. The file and season a measurement
+    belongs to come from the calling thread's context(), or can be passed explicitly.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._wall = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = defaultdict(_Totals)
+        self.per_file = defaultdict(lambda: defaultdict(_Totals))
+        self.per_season = defaultdict(lambda: defaultdict(_Totals))
+        self.file_seasons = {}
+        self.counters = defaultdict(int)
+        self.events = []
+
+    @contextmanager
+    def context(self, file=None, season=None):
+        previous = (getattr(self._local, "file", None), getattr(self._local, "season", None))
+        self._local.file, self._local.season = file, season
+        if file is not None and season is not None:
+            self.set_season(file, season)
+        try:
+            yield
+        finally:
+            self._local.file, self._local.season = previous
+
+    def set_season(self, file, season):
+        with self._lock:
+            self.file_seasons[file] = season
+        if getattr(self._local, "file", None) == file:
+            self._local.season = season
+
+    def add(self, stage, seconds, calls=1, nbytes=0, file=None, season=None):
+        file = file if file is not None else getattr(self._local, "file", None)
+        season = season if season is not None else getattr(self._local, "season", None)
+        with self._lock:
+            self.stages[stage].add(seconds, calls, nbytes)
+            if file is not None:
+                self.per_file[file][stage].add(seconds, calls, nbytes)
+                season = season if season is not None else self.file_seasons.get(file)
+            if season is not None:
+                self.per_season[str(season)][stage].add(seconds, calls, nbytes)
+
+    @contextmanager
+    def stage(self, stage, nbytes=0, file=None, season=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, 1, nbytes, file=file, season=season)
+
+    def add_timings(self, timings, file=None, season=None):
+        """Fold {stage: (seconds, calls, bytes)} measured elsewhere, e.g. in a worker process."""
+        for stage, (seconds, calls, nbytes) in timings.items():
+            self.add(stage, seconds, calls, nbytes, file=file, season=season)
+
+    def file_seconds(self, file):
+        with self._lock:
+            return sum(t.seconds for t in self.per_file.get(file, {}).values())
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def event(self, kind, **fields):
+        """Record a decision or notable occurrence, e.g. an adaptive controller adjustment."""
+        with self._lock:
+            self.events.append(dict(fields, kind=kind))
+
+    def finish(self):
+        self._wall = time.perf_counter() - self._start
+        return self._wall
+
+    @property
+    def wall_seconds(self):
+        return self._wall if self._wall is not None else time.perf_counter() - self._start
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": round(self.wall_seconds, 6),
+                "counters": dict(self.counters),
+                "events": list(self.events),
+                "stages": {s: t.to_dict() for s, t in sorted(self.stages.items())},
+                "per_season": {season: {s: t.to_dict() for s, t in sorted(stages.items())}
+                               for season, stages in sorted(self.per_season.items())},
+                "per_file": {file: {s: t.to_dict() for s, t in sorted(stages.items())}
+                             for file, stages in sorted(self.per_file.items())},
+            }
+
+    def write_report(self, path=REPORT_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+        return path
+
+    def summary_table(self):
+        wall = self.wall_seconds
+        lines = [f"{'stage':<32} {'seconds':>10} {'% wall':>7} {'calls':>9} {'ms/call':>9} {'MB':>9}"]
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1].seconds)
+            for stage, t in stages:
+                lines.append(f"{stage:<32} {t.seconds:>10.2f} {t.seconds / wall if wall else 0:>7.1%} "
+                             f"{t.calls:>9} {1000 * t.seconds / t.calls if t.calls else 0:>9.3f} "
+                             f"{t.bytes / 1e6:>9.2f}")
+            for season, season_stages in sorted(self.per_season.items()):
+                seconds = sum(t.seconds for s, t in season_stages.items() if s != SEASON_FINALIZE)
+                lines.append(f"  season {season:<23} {seconds:>10.2f}")
+            files = len(self.per_file)
+            event_kinds = defaultdict(int)
+            for event in self.events:
+                event_kinds[event["kind"]] += 1
+            for kind, n in sorted(event_kinds.items()):
+                lines.append(f"  {kind} events: {n} (see report)")
+            counters = ", ".join(f"{name}={value}" for name, value in sorted(self.counters.items()))
+        lines.append(f"Wall time {wall:.2f}s for {files} files"
+                     + (f" ({files / wall:.2f} files/sec)" if wall and files else "")
+                     + (f"; {counters}" if counters else ""))
+        return "\n".join(lines)
+
+# ------------------------ Instrumented Graph ------------------------
+
+class InstrumentedGraph:
+    """Wraps a py2neo Graph (or a stand-in) and times every call into write:<Label> stages.
+
+    merge/create/push of nodes are attributed to the primary label, anything with relationships
+    to write:relationships; transaction statements are classified from their Cypher.
+    """
+
+    def __init__(self, graph, metrics):
+        self.wrapped = graph
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def _entity_stage(self, subgraph, label=None):
+        if subgraph.relationships:
+            return WRITE_RELATIONSHIPS
+        node = next(iter(subgraph.nodes), None)
+        if label is None and node is not None:
+            label = node.__primarylabel__ or min(node.labels, default=None)
+        return write_stage(label or "unlabelled")
+
+    def _entity_bytes(self, subgraph):
+        return sum(payload_bytes(dict(entity)) for entity in (*subgraph.nodes, *subgraph.relationships))
+
+    def merge(self, subgraph, label=None, *property_keys):
+        with self._metrics.stage(self._entity_stage(subgraph, label), self._entity_bytes(subgraph)):
+            return self.wrapped.merge(subgraph, label, *property_keys)
+
+    def create(self, subgraph):
+        with self._metrics.stage(self._entity_stage(subgraph), self._entity_bytes(subgraph)):
+            return self.wrapped.create(subgraph)
+
+    def push(self, subgraph):
+        with self._metrics.stage(self._entity_stage(subgraph), self._entity_bytes(subgraph)):
+            return self.wrapped.push(subgraph)
+
+    def run(self, cypher, parameters=None, **kwparameters):
+        with self._metrics.stage(statement_stage(cypher), payload_bytes(parameters or {})):
+            return self.wrapped.run(cypher, parameters, **kwparameters)
+
+    def begin(self, *args, **kwargs):
+        return InstrumentedTransaction(self.wrapped.begin(*args, **kwargs), self._metrics)
+
+    def commit(self, tx):
+        with self._metrics.stage(WRITE_COMMIT):
+            return self.wrapped.commit(getattr(tx, "_tx", tx))
+
+    def rollback(self, tx):
+        return self.wrapped.rollback(getattr(tx, "_tx", tx))
+
+
+class InstrumentedTransaction:
+    def __init__(self, tx, metrics):
+        self._tx = tx
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+    def run(self, cypher, parameters=None, **kwparameters):
+        with self._metrics.stage(statement_stage(cypher), payload_bytes(parameters or {})):
+            return self._tx.run(cypher, parameters, **kwparameters)
@@ -0,0 +1,105 @@
+# ------------------------ Season Aggregates ------------------------
+
+SUM_FIELDS = ("total_runs", "total_wickets", "total_matches", "total_sixes", "total_fours",
+              "super_over_matches", "duckworth_lewis_matches")
+
+
+class SeasonStats:
+    """Season aggregate that can be built per file and combined with merge().
+
+    merge() is associative and commutative (sums, max, min, set union, and the latest final
+    wins), so totals do not depend on worker count, completion order or how a season was
+    split across runs.
+    """
+
+    def __init__(self, season):
+        self.season = season
+        for field in SUM_FIELDS:
+            setattr(self, field, 0)
+        self.highest_team_score = 0
+        self.lowest_team_score = None
+        self.teams = set()
+        self.final_date = None
+        self.final_winner = None
+
+    def add_innings_score(self, runs, counts_for_lowest):
+        self.total_runs += runs
+        self.highest_team_score = max(self.highest_team_score, runs)
+        if counts_for_lowest and (self.lowest_team_score is None or runs < self.lowest_team_score):
+            self.lowest_team_score = runs
+
+    def record_final(self, date, winner):
+        if self.final_date is None or (date or "", winner or "") > (self.final_date, self.final_winner or ""):
+            self.final_date = date or ""
+            self.final_winner = winner
+
+    def merge(self, other):
+        for field in SUM_FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.highest_team_score = max(self.highest_team_score, other.highest_team_score)
+        if other.lowest_team_score is not None and (self.lowest_team_score is None or other.lowest_team_score < self.lowest_team_score):
+            self.lowest_team_score = other.lowest_team_score
+        self.teams |= other.teams
+        if other.final_date is not None:
+            self.record_final(other.final_date, other.final_winner)
+        return self
+
+    def summary(self):
+        """Season node properties."""
+        return {
+            "total_runs": self.total_runs,
+            "total_wickets": self.total_wickets,
+            "number_of_matches": self.total_matches,
+            "highest_team_score": self.highest_team_score,
+            "lowest_team_score": self.lowest_team_score if self.lowest_team_score is not None else "N/A",
+            "total_sixes": self.total_sixes,
+            "total_fours": self.total_fours,
+            # Kept for existing readers: these have always been season totals, not a player's
+            # tally; the leaders are on the Season's Leaderboard nodes (see leaderboards.py)
+            "most_sixes": self.total_sixes,
+            "most_fours": self.total_fours,
+            "format": "T20",
+            "number_of_teams": len(self.teams),
+            "winner": self.final_winner if self.final_date is not None else "TO_BE_UPDATED",
+            "super_over_matches": self.super_over_matches,
+        }
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in SUM_FIELDS}
+        data.update({
+            "season": self.season,
+            "highest_team_score": self.highest_team_score,
+            "lowest_team_score": self.lowest_team_score,
+            "teams": sorted(self.teams),
+            "final_date": self.final_date,
+            "final_winner": self.final_winner,
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["season"])
+        for field in SUM_FIELDS:
+            setattr(stats, field, data.get(field, 0))
+        stats.highest_team_score = data["highest_team_score"]
+        stats.lowest_team_score = data["lowest_team_score"]
+        stats.teams = set(data["teams"])
+        stats.final_date = data.get("final_date")
+        stats.final_winner = data.get("final_winner")
+        return stats
+
+    def __eq__(self, other):
+        return isinstance(other, SeasonStats) and self.to_dict() == other.to_dict()
+
+# ------------------------ Reducer ------------------------
+
+def reduce_season_stats(partials, totals=None):
+    """Fold per-file SeasonStats into {season: SeasonStats}, optionally on top of existing totals."""
+    totals = {} if totals is None else totals
+    for partial in partials:
+        if partial is None:
+            continue
+        if partial.season not in totals:
+            totals[partial.season] = SeasonStats(partial.season)
+        totals[partial.season].merge(partial)
+    return totals
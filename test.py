@@ -5,29 +5,39 @@ NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "Myapple7@"
 
+TOP_N = 25
+
 # Connect to Neo4j
 graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
-# Cypher query for partnerships
+# Partnerships are materialized at import (see partnerships.py); the index turns the
+# ORDER BY runs DESC LIMIT into an index scan instead of a sort over every partnership
+graph.run("CREATE INDEX partnership_runs IF NOT EXISTS FOR (p:Partnership) ON (p.runs)")
+
+# Cypher query for the top partnerships
 query = """
-MATCH (m:Match)-[:HAS_INNINGS]->(i:Innings)-[:HAS_OVER]->(o:Over)-[:HAS_DELIVERY]->(d:Delivery)
-WITH m, i, d.batsman AS batsman, d.non_batsman AS non_batsman,
-     SUM(d.runs_off_bat + d.extras) AS partnership_runs
-WHERE batsman < non_batsman  // Ensure unique partnerships
-RETURN 
-    m.match_id AS match_id,
-    i.team AS batting_team,
-    batsman,
-    non_batsman,
-    partnership_runs
-ORDER BY match_id, partnership_runs DESC
+MATCH (p:Partnership)
+WHERE p.runs IS NOT NULL
+RETURN
+    p.match_id AS match_id,
+    p.team AS batting_team,
+    p.wicket AS wicket,
+    p.batter_1 AS batter_1,
+    p.batter_2 AS batter_2,
+    p.runs AS partnership_runs,
+    p.balls AS balls,
+    p.unbroken AS unbroken
+ORDER BY p.runs DESC
+LIMIT $top_n
 """
 
 # Execute the query
-results = graph.run(query)
+results = graph.run(query, top_n=TOP_N)
 
 # Print the results
-print("Match ID | Batting Team | Batsman | Non-Batsman | Partnership Runs")
-print("-" * 75)
+print("Match ID | Batting Team | Wicket | Batter 1 | Batter 2 | Partnership Runs (Balls)")
+print("-" * 90)
 for record in results:
-    print(f"{record['match_id']} | {record['batting_team']} | {record['batsman']} | {record['non_batsman']} | {record['partnership_runs']}")
+    not_out = "*" if record['unbroken'] else ""
+    print(f"{record['match_id']} | {record['batting_team']} | {record['wicket']} | {record['batter_1']} | "
+          f"{record['batter_2']} | {record['partnership_runs']}{not_out} ({record['balls']})")
@@ -0,0 +1,40 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from chase_table import BALLS, WICKETS, build_chase_table
+from delivery_store import build_store
+
+DATA_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ipl_matches")
+
+
+@pytest.fixture(scope="module")
+def table():
+    files = sorted(glob.glob(os.path.join(DATA_ROOT, "S1[67]-*", "*.json")))
+    if not files:
+        pytest.skip("match corpus not available")
+    return build_chase_table(build_store(files=files))
+
+
+def test_probability_is_monotone(table):
+    p = table.probability
+    # Needing more runs never helps; more balls or wickets in hand never hurt
+    assert (np.diff(p, axis=0) <= 1e-12).all()
+    assert (np.diff(p, axis=1) >= -1e-12).all()
+    assert (np.diff(p, axis=2) >= -1e-12).all()
+    assert ((p >= 0) & (p <= 1)).all()
+
+
+def test_terminal_states_are_exact(table):
+    assert table.lookup(0, 30, 5) == 1.0
+    assert table.lookup(20, 0, 5) == 0.0
+    assert table.lookup(20, 30, 0) == 0.0
+    assert table.lookup(1, 0, 5) == 0.5
+    assert table.lookup(1, 30, 0) == 0.5
+
+
+def test_easier_chase_is_more_likely(table):
+    assert table.lookup(20, BALLS // 2, WICKETS) > table.lookup(120, BALLS // 2, WICKETS)
+    assert table.lookup(40, 24, 8) > table.lookup(40, 24, 2)
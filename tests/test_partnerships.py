@@ -0,0 +1,19 @@
+from partnerships import PartnershipTracker
+
+
+def test_retirement_keeps_the_wicket_number():
+    tracker = PartnershipTracker()
+    tracker.add("A", "B", 4, 4, True, 1, "0.1")
+    tracker.add("A", "B", 0, 0, True, 2, "0.2", ["caught"])
+    tracker.add("C", "B", 1, 1, True, 3, "0.3")
+    tracker.add("B", "C", 0, 0, True, 4, "0.4", ["retired hurt"])
+    tracker.add("D", "C", 2, 2, True, 5, "0.5")
+    tracker.add("D", "C", 0, 0, True, 6, "0.6", ["bowled"])
+    tracker.add("E", "C", 6, 6, True, 7, "1.1")
+    partnerships = tracker.finish()
+
+    assert [p["wicket"] for p in partnerships] == [1, 2, 2, 3]
+    assert [p["unbroken"] for p in partnerships] == [False, True, False, True]
+    assert [p["runs"] for p in partnerships] == [4, 1, 2, 6]
+    assert (partnerships[2]["batter_1"], partnerships[2]["batter_2"]) == ("D", "C")
+
@@ -1,13 +1,14 @@
 import os
 import json
 
+from match_cache import load_match
+
 def update_season(folder_path, new_season):
     for filename in os.listdir(folder_path):
         if filename.endswith('.json'):
             file_path = os.path.join(folder_path, filename)
             
-            with open(file_path, 'r') as file:
-                data = json.load(file)
+            data = load_match(file_path)
             
             if 'info' in data and 'season' in data['info']:
                 data['info']['season'] = new_season
@@ -1,13 +1,34 @@
+import argparse
 import json
 import glob
 import os
 import logging
+import time
+import asyncio
+from neo4j import AsyncGraphDatabase
 from py2neo import Graph, Node, Relationship, Subgraph
 from py2neo.matching import NodeMatcher
 from tqdm import tqdm
 from collections import defaultdict
-from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from async_ingest import CONCURRENCY, POOL_SIZE, run_async_ingest
+from batch_writer import call_with_retries
+from dimension_cache import DimensionCache
+from empty_database import MATCH_IDS_OF_SEASON, purge_matches
+from ingest_logging import count, flush_counters, log_sampled, setup_logging
+from import_ledger import ImportLedger, REVISED, UNCHANGED, file_id
+from ingest_pipeline import load_dimensions, run_pipeline
+from match_cache import load_match
+from ball_index import PHASE_TABLE, ball_index
+from leaderboards import ALL_TIME, write_leaderboards
+from matchups import MATCHUP_DIR, sync_matchups, update_matchups
+from match_transform import build_match_batch, get_phase, match_id_of, tournament_properties
+from partnerships import PartnershipTracker, partnership_nodes
+from player_aggregates import (aggregate_maps, diff_aggregates, read_player_aggregates, recompute,
+                               write_player_aggregates)
+from run_metrics import (LOAD, LOAD_DIMENSIONS, MATCHUPS, NORMALIZE, PLAYER_AGGREGATES, REPORT_PATH,
+                         SEASON_FINALIZE, InstrumentedGraph, RunMetrics)
+from season_stats import SeasonStats, reduce_season_stats
 
 # ------------------------ Configuration ------------------------
 
@@ -22,17 +43,75 @@ JSON_DIRS = [
 
 TOURNAMENT_NAME = "Indian Premier League"
 
-logging.basicConfig(filename='importing.log', filemode='w', format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
+PARSE_WORKERS = 4
+WRITE_WORKERS = 2
+
+# Replace mode deletes match subgraphs in transactions of at most this many nodes
+PURGE_BATCH_SIZE = 5000
+
+# Batched imports write all dimension nodes first, then match facts that only look them up
+TWO_PHASE = True
+
+# Batched writes go through writer threads ("threads") or the asyncio driver ("async")
+ENGINE = "threads"
+
+# Threaded writes group matches per transaction and throttle writers to keep commit latency in
+# the target band (seconds); optional caps on statements or rows sent per second
+ADAPTIVE_WRITES = True
+TARGET_LATENCY = (0.05, 0.25)
+WRITE_STATEMENTS_PER_SECOND = None
+WRITE_ROWS_PER_SECOND = None
+
+# Batched imports add the matches they write to the batter x bowler matchup store, kept next to
+# the import ledger whatever the working directory; None disables it
+MATCHUPS_DIR = MATCHUP_DIR
+
+# Background writer with sampling of repetitive lines; see ingest_logging
+setup_logging('importing.log')
 
 # ------------------------ Connect to Neo4j ------------------------
 
-try:
-    graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    matcher = NodeMatcher(graph)
-    logging.info("Successfully connected to Neo4j.")
-except Exception as e:
-    logging.error(f"Failed to connect to Neo4j: {e}")
-    raise e
+# The connection is opened on first use so importing this module never needs a database.
+# use_graph() installs a stand-in such as memory_graph.MemoryGraph for offline runs.
+graph = None
+matcher = None
+graph_factory = None
+async_driver_factory = None
+
+def connect():
+    if graph_factory is not None:
+        return graph_factory()
+    return Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+
+def connect_async(pool_size=POOL_SIZE):
+    if async_driver_factory is not None:
+        return async_driver_factory(pool_size)
+    return AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                     max_connection_pool_size=pool_size)
+
+def get_graph():
+    global graph, matcher
+    if graph is None:
+        try:
+            graph = connect()
+            matcher = NodeMatcher(graph)
+            logging.info("Successfully connected to Neo4j.")
+        except Exception as e:
+            logging.error(f"Failed to connect to Neo4j: {e}")
+            raise e
+    return graph
+
+def use_graph(stand_in):
+    """Route every connection, including pipeline writers and the async driver, to stand_in."""
+    global graph, matcher, graph_factory, async_driver_factory
+    graph = stand_in
+    matcher = None
+    graph_factory = lambda: stand_in
+    async_driver_factory = getattr(stand_in, "async_driver", None)
+    dimension_cache.clear()
+
+# Dimension nodes/relationships already merged by this process
+dimension_cache = DimensionCache()
 
 # ------------------------ Helper Functions ------------------------
 
@@ -45,106 +124,146 @@ def get_or_create_tournament(name, properties=None):
     return tournament
 
 def get_or_create_season(year, tournament_node, properties=None):
-    season = Node("Season", year=year)
-    if properties:
-        season.update(properties)
-    graph.merge(season, "Season", "year")
-    rel = Relationship(tournament_node, "HAS_SEASON", season)
-    graph.merge(rel)
-    logging.info(f"Created/Merged Season: {year} and linked to Tournament: {tournament_node['name']}")
+    season = dimension_cache.get_node(("Season", (year,)))
+    if season is None or properties:
+        season = season or Node("Season", year=year)
+        if properties:
+            season.update(properties)
+        graph.merge(season, "Season", "year")
+        season = dimension_cache.put_node(("Season", (year,)), season)
+    rel_key = ("HAS_SEASON", (tournament_node['name'],), (year,))
+    if not dimension_cache.seen(rel_key):
+        rel = Relationship(tournament_node, "HAS_SEASON", season)
+        graph.merge(rel)
+        dimension_cache.mark([rel_key])
+        count("merged", "seasons")
+        log_sampled("season", "Created/Merged Season: %s and linked to Tournament: %s", year, tournament_node['name'])
     return season
 
 def get_or_create_team(name, tournament_node, properties=None):
-    team = Node("Team", name=name)
-    if properties:
-        team.update(properties)
-    graph.merge(team, "Team", "name")
-    rel = Relationship(team, "PARTICIPATES_IN", tournament_node)
-    graph.merge(rel)
-    logging.info(f"Created/Merged Team: {name} and linked to Tournament: {tournament_node['name']}")
+    team = dimension_cache.get_node(("Team", (name,)))
+    if team is None or properties:
+        team = team or Node("Team", name=name)
+        if properties:
+            team.update(properties)
+        graph.merge(team, "Team", "name")
+        team = dimension_cache.put_node(("Team", (name,)), team)
+    rel_key = ("PARTICIPATES_IN", (name,), (tournament_node['name'],))
+    if not dimension_cache.seen(rel_key):
+        rel = Relationship(team, "PARTICIPATES_IN", tournament_node)
+        graph.merge(rel)
+        dimension_cache.mark([rel_key])
+        count("merged", "teams")
+        log_sampled("team", "Created/Merged Team: %s and linked to Tournament: %s", name, tournament_node['name'])
     return team
 
 def get_or_create_player(name, registry_id, team_node):
-    player = Node("Player", registry_id=registry_id, name=name)
-    graph.merge(player, "Player", "registry_id")
-    rel_team = Relationship(player, "PLAYS_FOR", team_node)
-    rel_has = Relationship(team_node, "HAS_PLAYER", player)
-    graph.merge(rel_team | rel_has)
-    logging.info(f"Created/Merged Player: {name} and linked to Team: {team_node['name']}")
+    player = dimension_cache.get_node(("Player", (registry_id,)))
+    if player is None:
+        player = Node("Player", registry_id=registry_id, name=name)
+        graph.merge(player, "Player", "registry_id")
+        player = dimension_cache.put_node(("Player", (registry_id,)), player)
+    rel_keys = [("PLAYS_FOR", (registry_id,), (team_node['name'],)), ("HAS_PLAYER", (team_node['name'],), (registry_id,))]
+    if len(dimension_cache.cached(rel_keys)) < len(rel_keys):
+        rel_team = Relationship(player, "PLAYS_FOR", team_node)
+        rel_has = Relationship(team_node, "HAS_PLAYER", player)
+        graph.merge(rel_team | rel_has)
+        dimension_cache.mark(rel_keys)
+        count("merged", "players")
+        log_sampled("player", "Created/Merged Player: %s and linked to Team: %s", name, team_node['name'])
     return player
 
 def get_or_create_official(name, role):
-    official = Node("Official", name=name, role=role)
-    graph.merge(official, "Official", "name")
-    logging.info(f"Created/Merged Official: {name} with role: {role}")
+    official = dimension_cache.get_node(("Official", (name,)))
+    if official is None:
+        official = Node("Official", name=name, role=role)
+        graph.merge(official, "Official", "name")
+        official = dimension_cache.put_node(("Official", (name,)), official)
+        count("merged", "officials")
+        log_sampled("official", "Created/Merged Official: %s with role: %s", name, role)
     return official
 
 def get_or_create_venue(name, city):
-    venue = Node("Venue", name=name, city=city)
-    graph.merge(venue, "Venue", "name")
-    logging.info(f"Created/Merged Venue: {name} in city: {city}")
+    venue = dimension_cache.get_node(("Venue", (name,)))
+    if venue is None:
+        venue = Node("Venue", name=name, city=city)
+        graph.merge(venue, "Venue", "name")
+        venue = dimension_cache.put_node(("Venue", (name,)), venue)
+        count("merged", "venues")
+        log_sampled("venue", "Created/Merged Venue: %s in city: %s", name, city)
     return venue
 
-def get_phase(over, ball):
-    over_ball = Decimal(f"{over}.{ball}")
-    if over_ball <= Decimal('5.6'):
-        return "Powerplay"
-    elif over_ball <= Decimal('15.6'):
-        return "Middle Overs"
-    else:
-        return "Death Overs"
-
 # ------------------------ Import Function ------------------------
 
-def import_json_to_neo4j(json_directory, tournament_name):
-    json_files = glob.glob(os.path.join(json_directory, "*.json"))
+def import_json_to_neo4j(json_directory, tournament_name, batched=True,
+                         parse_workers=PARSE_WORKERS, write_workers=WRITE_WORKERS, incremental=True,
+                         report_path=REPORT_PATH, engine=ENGINE, concurrency=CONCURRENCY, pool_size=POOL_SIZE,
+                         files=None, two_phase=TWO_PHASE, adaptive=ADAPTIVE_WRITES,
+                         target_latency=TARGET_LATENCY, statements_per_second=WRITE_STATEMENTS_PER_SECOND,
+                         rows_per_second=WRITE_ROWS_PER_SECOND, matchups_dir=MATCHUPS_DIR):
+    """Import match files. batched=False is the per-entity reference path, kept for benchmarks
+    and parity checks only: each merge/push auto-commits on its own, so a file that fails part
+    way leaves a partial subgraph and is reported, not retried. Re-import such files with
+    replace_matches().
+    """
+    global graph
+    json_files = list(files) if files is not None else glob.glob(os.path.join(json_directory, "*.json"))
     logging.info(f"Found {len(json_files)} JSON files to import.")
 
     if not json_files:
         logging.warning("No JSON files found to import.")
         return
 
+    ledger = ImportLedger() if batched and incremental else None
+    replacements = {}
+    if ledger is not None:
+        if matchups_dir and ledger.unsynced_matchups:
+            # An earlier run recorded these files but stopped before the matchup store took them in
+            logging.info(f"Matchups: catching up {len(ledger.unsynced_matchups)} files of an earlier run")
+            sync_matchups(ledger, matchups_dir)
+        pending = []
+        for file in json_files:
+            status, entry = ledger.classify(file)
+            if status == UNCHANGED:
+                continue
+            if status == REVISED:
+                replacements[file] = entry["match_id"]
+            pending.append(file)
+        logging.info(f"Ledger: {len(json_files) - len(pending)} unchanged, "
+                     f"{len(pending) - len(replacements)} new, {len(replacements)} revised files.")
+        if not pending and not ledger.unfinalized_seasons and not ledger.unsynced_players:
+            ledger.save()
+            logging.info(f"Nothing to import in {json_directory}.")
+            return
+        if not pending:
+            # An earlier run committed its matches but stopped before writing the Season or aggregate nodes
+            logging.info(f"Nothing to import in {json_directory}; finalizing seasons left open "
+                         f"({sorted(ledger.unfinalized_seasons, key=str)}) and "
+                         f"{len(ledger.unsynced_players)} player aggregates")
+        first_file = json_files[0]
+        json_files = pending
+    else:
+        first_file = json_files[0]
+
+    # Every graph call made by this run is timed into the run's stages
+    metrics = RunMetrics()
+    metrics.count("files", len(json_files))
+    connection = get_graph()
+    if isinstance(connection, InstrumentedGraph):
+        connection = connection.wrapped
+    graph = InstrumentedGraph(connection, metrics)
+
     # Extract tournament properties from the first file
-    with open(json_files[0], 'r') as f:
-        data = json.load(f)
-        info = data.get('info', {})
-        event = info.get('event', {})
-
-    tournament_properties = {
-        "name": tournament_name,
-        "country": "India",
-        "format": "T20",
-        "gender": info.get('gender', 'male'),
-        "tournament": event.get('name', tournament_name),
-        "match_type": info.get('match_type', 'T20'),
-        "overs": info.get('overs', 20),
-        "balls_per_over": info.get('balls_per_over', 6),
-        "governing_body": "BCCI",
-        "founded": 2007,
-        "inaugural_season": 2008,
-        "logo": "https://www.iplt20.com/assets/images/ipl-logo.png",
-        "website": "https://www.iplt20.com"
-    }
-
-    tournament_node = get_or_create_tournament(tournament_name, properties=tournament_properties)
-
-    season_stats = defaultdict(lambda: {
-        "total_runs": 0,
-        "total_wickets": 0,
-        "total_matches": 0,
-        "highest_team_score": 0,
-        "lowest_team_score": None,
-        "total_sixes": 0,
-        "total_fours": 0,
-        "teams": set(),
-        "super_over_matches": 0,
-    })
+    info = load_match(first_file).get('info', {})
+
+    tournament_node = call_with_retries(get_or_create_tournament, tournament_name,
+                                        tournament_properties(info, tournament_name), description="tournament")
 
     def process_file(file):
         try:
-            with open(file, 'r') as f:
-                data = json.load(f)
-            logging.info(f"Loaded JSON file: {file}")
+            with metrics.stage(LOAD, os.path.getsize(file)):
+                data = load_match(file)
+            log_sampled("load", "Loaded JSON file: %s", file)
         except json.JSONDecodeError as e:
             logging.error(f"JSON decode error in file {file}: {e}")
             return
@@ -164,6 +283,7 @@ def import_json_to_neo4j(json_directory, tournament_name):
         if not season_year:
             logging.error(f"Missing season in file {file}. Skipping.")
             return
+        metrics.set_season(file, season_year)
 
         season_node = get_or_create_season(season_year, tournament_node)
 
@@ -173,8 +293,8 @@ def import_json_to_neo4j(json_directory, tournament_name):
             return
         team1_name, team2_name = teams
 
-        season_stats[season_year]["teams"].add(team1_name)
-        season_stats[season_year]["teams"].add(team2_name)
+        season_stats = SeasonStats(season_year)
+        season_stats.teams.update(teams)
 
         team1_node = get_or_create_team(team1_name, tournament_node)
         team2_node = get_or_create_team(team2_name, tournament_node)
@@ -205,7 +325,7 @@ def import_json_to_neo4j(json_directory, tournament_name):
         elif eliminator:
             winner_str = eliminator
             result = f"{eliminator} won by super over"
-            season_stats[season_year]["super_over_matches"] += 1
+            season_stats.super_over_matches += 1
         else:
             winner_str = None
             result = outcome.get('result', 'No result')
@@ -303,7 +423,9 @@ def import_json_to_neo4j(json_directory, tournament_name):
             "stumpings": 0
         })
 
-        season_stats[season_year]["total_matches"] += 1
+        season_stats.total_matches += 1
+        if match_properties["duckworth_lewis"]:
+            season_stats.duckworth_lewis_matches += 1
 
         for i, innings_data in enumerate(innings_list):
             if isinstance(innings_data, dict) and len(innings_data) == 1:
@@ -353,6 +475,7 @@ def import_json_to_neo4j(json_directory, tournament_name):
                 "Middle Overs": {"runs": 0, "balls": 0, "wickets": 0},
                 "Death Overs": {"runs": 0, "balls": 0, "wickets": 0}
             }
+            partnerships = PartnershipTracker()
 
             for over_data in overs_list:
                 over_number = over_data.get('over')
@@ -398,7 +521,7 @@ def import_json_to_neo4j(json_directory, tournament_name):
                         if is_wicket:
                             phase_stats[phase]["wickets"] += 1
 
-                    ball_number = f"{over_number-1}.{current_ball_number}"
+                    ball_number = PHASE_TABLE.label(over_number - 1, current_ball_number)
 
                     delivery_key = f"{match_id}_{i+1}_{ball_number}_{delivery_index}"
 
@@ -427,6 +550,7 @@ def import_json_to_neo4j(json_directory, tournament_name):
                     delivery_node = Node("Delivery",
                                          delivery_key=delivery_key,
                                          ball_number=ball_number,
+                                         ball_index=ball_index(over_number - 1, current_ball_number),
                                          delivery_index=delivery_index + 1,
                                          runs_batter=runs_batter,
                                          runs_extras=runs_extras,
@@ -446,6 +570,9 @@ def import_json_to_neo4j(json_directory, tournament_name):
 
                     rel = Relationship(over_node, "HAS_DELIVERY", delivery_node)
                     graph.merge(rel)
+                    partnerships.add(delivery_data.get('batter'), delivery_data.get('non_striker'), runs_batter,
+                                     total_runs_delivery, is_legal, delivery_node['ball_index'], ball_number,
+                                     [wicket.get('kind') for wicket in delivery_data.get("wickets", [])])
 
                     bowler_name = delivery_data.get('bowler')
                     bowler_node = player_nodes.get(bowler_name)
@@ -538,9 +665,13 @@ def import_json_to_neo4j(json_directory, tournament_name):
             innings_node['total_overs'] = over_number
             graph.push(innings_node)
 
-            if not match_node["duckworth_lewis"] and innings_node['total_overs'] > 0 and not is_super_over:
-                if season_stats[season_year]["lowest_team_score"] is None or runs < season_stats[season_year]["lowest_team_score"]:
-                    season_stats[season_year]["lowest_team_score"] = runs
+            for props in partnership_nodes(innings_key, match_id, i + 1, team_name, partnerships.finish()):
+                partnership_node = Node("Partnership", **props)
+                graph.merge(partnership_node, "Partnership", "partnership_key")
+                graph.merge(Relationship(innings_node, "HAS_PARTNERSHIP", partnership_node))
+                for batter_name in (props["batter_1"], props["batter_2"]):
+                    if batter_name in player_nodes:
+                        graph.merge(Relationship(partnership_node, "PARTNERSHIP_OF", player_nodes[batter_name]))
 
             if not is_super_over:
                 for phase, stats in phase_stats.items():
@@ -555,21 +686,18 @@ def import_json_to_neo4j(json_directory, tournament_name):
                     rel = Relationship(innings_node, "HAS_PHASE", phase_node)
                     graph.merge(rel)
 
-            season_stats[season_year]["total_runs"] += runs
-            season_stats[season_year]["highest_team_score"] = max(season_stats[season_year]["highest_team_score"], runs)
+            season_stats.add_innings_score(runs, counts_for_lowest=not match_node["duckworth_lewis"] and innings_node['total_overs'] > 0 and not is_super_over)
 
             for over_data in overs_list:
                 for delivery_data in over_data.get('deliveries', []):
                     if "wickets" in delivery_data:
-                        season_stats[season_year]["total_wickets"] += len(delivery_data["wickets"])
+                        season_stats.total_wickets += len(delivery_data["wickets"])
 
                     runs_batter = delivery_data.get("runs", {}).get("batter", 0)
                     if runs_batter == 4:
-                        season_stats[season_year]["total_fours"] += 1
+                        season_stats.total_fours += 1
                     elif runs_batter == 6:
-                        season_stats[season_year]["total_sixes"] += 1
-
-            season_stats[season_year]["duckworth_lewis_matches"] = season_stats[season_year].get("duckworth_lewis_matches", 0) + (1 if match_node["duckworth_lewis"] else 0)
+                        season_stats.total_sixes += 1
 
             if is_super_over:
                 match_node['had_super_over'] = True
@@ -591,10 +719,10 @@ def import_json_to_neo4j(json_directory, tournament_name):
                                         match_id=match_node['match_id'],
                                         player_id=player_node['registry_id'],
                                         **batting_stats)
-                    graph.create(batting_perf)
+                    graph.merge(batting_perf, "PlayerMatchPerformance", ("match_id", "player_id", "type"))
                     rel1 = Relationship(match_node, "HAS_PLAYER_PERFORMANCE", batting_perf)
                     rel2 = Relationship(batting_perf, "PERFORMANCE_OF", player_node)
-                    graph.create(rel1 | rel2)
+                    graph.merge(rel1 | rel2)
 
                 if stats["balls_bowled"] > 0:
                     bowling_stats = {
@@ -609,10 +737,10 @@ def import_json_to_neo4j(json_directory, tournament_name):
                                         match_id=match_node['match_id'],
                                         player_id=player_node['registry_id'],
                                         **bowling_stats)
-                    graph.create(bowling_perf)
+                    graph.merge(bowling_perf, "PlayerMatchPerformance", ("match_id", "player_id", "type"))
                     rel1 = Relationship(match_node, "HAS_PLAYER_PERFORMANCE", bowling_perf)
                     rel2 = Relationship(bowling_perf, "PERFORMANCE_OF", player_node)
-                    graph.create(rel1 | rel2)
+                    graph.merge(rel1 | rel2)
 
                 fielding_stats = {
                     "catches": stats.get("catches", 0),
@@ -625,51 +753,292 @@ def import_json_to_neo4j(json_directory, tournament_name):
                                          match_id=match_node['match_id'],
                                          player_id=player_node['registry_id'],
                                          **fielding_stats)
-                    graph.create(fielding_perf)
+                    graph.merge(fielding_perf, "PlayerMatchPerformance", ("match_id", "player_id", "type"))
                     rel1 = Relationship(match_node, "HAS_PLAYER_PERFORMANCE", fielding_perf)
                     rel2 = Relationship(fielding_perf, "PERFORMANCE_OF", player_node)
-                    graph.create(rel1 | rel2)
+                    graph.merge(rel1 | rel2)
 
         if info.get('event', {}).get('stage') == 'Final':
-            season_stats[season_year]["winner"] = winner
+            season_stats.record_final(match_date, winner)
 
-    max_workers = 8
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_file, file): file for file in json_files}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing files"):
-            file = futures[future]
-            try:
-                future.result()
-            except Exception as exc:
-                logging.error(f"File {file} generated an exception: {exc}")
+        return season_stats
 
-    for season, stats in season_stats.items():
+    def timed_process_file(file):
+        # Writes and loading are timed as they happen; the rest of the file's time is transformation.
+        # Not retried: the writes auto-commit one by one, and replaying the file on top of a
+        # half-written subgraph does not converge to a clean import.
+        start = time.perf_counter()
+        with metrics.context(file):
+            try:
+                return process_file(file)
+            finally:
+                metrics.add(NORMALIZE, time.perf_counter() - start - metrics.file_seconds(file))
+
+    written = []
+    if batched:
+        def record(file, batch, partial):
+            written.append(file)
+            if ledger is not None:
+                ledger.record(file, batch.match_id, batch.revision, partial, batch.player_stats)
+
+        def dead_letter(file, exc):
+            if ledger is not None:
+                ledger.dead_letter(file, exc)
+
+        if two_phase and json_files:
+            with metrics.stage(LOAD_DIMENSIONS):
+                call_with_retries(load_dimensions, json_files, tournament_name, graph, dimension_cache,
+                                  description="dimension load")
+
+        if not json_files:
+            season_stats, failed = {}, []
+        elif engine == "async":
+            async def ingest():
+                driver = connect_async(pool_size)
+                try:
+                    return await run_async_ingest(json_files, tournament_name, driver, concurrency=concurrency,
+                                                  parse_workers=parse_workers, replacements=replacements,
+                                                  on_written=record, on_failed=dead_letter,
+                                                  dimension_cache=dimension_cache, metrics=metrics)
+                finally:
+                    await driver.close()
+
+            season_stats, failed = asyncio.run(ingest())
+        else:
+            season_stats, failed = run_pipeline(json_files, tournament_name,
+                                                lambda: InstrumentedGraph(connect(), metrics),
+                                                parse_workers=parse_workers, write_workers=write_workers,
+                                                replacements=replacements, on_written=record,
+                                                on_failed=dead_letter, dimension_cache=dimension_cache,
+                                                metrics=metrics, adaptive=adaptive, target_latency=target_latency,
+                                                statements_per_second=statements_per_second,
+                                                rows_per_second=rows_per_second)
+        if failed:
+            logging.error(f"{len(failed)} files failed to import and were dead-lettered: {failed}")
+        if ledger is not None:
+            # Totals must cover every imported file of the season, not just this run's, and
+            # seasons an interrupted run left unfinalized are finalized now
+            season_stats = ledger.season_stats(seasons=set(season_stats) | ledger.unfinalized_seasons)
+            # A season whose matches were all purged is finalized back to empty totals
+            for season in ledger.unfinalized_seasons - set(season_stats):
+                season_stats[season] = SeasonStats(season)
+            ledger.save()
+    else:
+        max_workers = 8
+        partials = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(timed_process_file, file): file for file in json_files}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing files"):
+                file = futures[future]
+                try:
+                    partials[file] = future.result()
+                except Exception as exc:
+                    logging.error(f"File {file} generated an exception: {exc}")
+                    failed.append(file)
+        if failed:
+            logging.error(f"{len(failed)} files failed part way and may have partial subgraphs; "
+                          f"re-import them with --replace: {sorted(failed)}")
+        season_stats = reduce_season_stats(partials[file] for file in sorted(partials))
+
+    def finalize_season(season, stats):
         season_node = get_or_create_season(season, tournament_node)
         
-        season_node.update({
-            "total_runs": stats["total_runs"],
-            "total_wickets": stats["total_wickets"],
-            "number_of_matches": stats["total_matches"],
-            "highest_team_score": stats["highest_team_score"],
-            "lowest_team_score": stats["lowest_team_score"] if stats["lowest_team_score"] is not None else "N/A",
-            "most_sixes": stats["total_sixes"],
-            "most_fours": stats["total_fours"],
-            "format": "T20",
-            "number_of_teams": len(stats["teams"]),
-            "winner": stats.get("winner", "TO_BE_UPDATED"),
-            "super_over_matches": stats["super_over_matches"],
-        })
+        season_node.update(stats.summary())
+        if ledger is not None:
+            season_node.update(ledger.leaderboards.leaders(season, ledger.players.names))
         graph.push(season_node)
         logging.info(f"Updated Season node for {season} with calculated statistics, including number of super over matches.")
         graph.push(season_node)
         logging.info(f"Updated Season node for {season} with calculated statistics, including number of super over matches.")
 
+    for season, stats in season_stats.items():
+        with metrics.context(season=season), metrics.stage(SEASON_FINALIZE):
+            call_with_retries(finalize_season, season, stats, description=f"season {season}")
+            if ledger is not None:
+                write_leaderboards(graph, ledger.leaderboards, season, tournament_name, ledger.players.names)
+        if ledger is not None:
+            ledger.finalized(season)
+    # Any season finalized means some player's totals changed, so the career boards too
+    if ledger is not None and season_stats:
+        with metrics.stage(SEASON_FINALIZE):
+            write_leaderboards(graph, ledger.leaderboards, ALL_TIME, tournament_name, ledger.players.names)
+
+    # Career and season aggregates of the players this run added, replaced or reverted
+    if ledger is not None and ledger.unsynced_players:
+        player_ids = set(ledger.unsynced_players)
+        with metrics.stage(PLAYER_AGGREGATES):
+            write_player_aggregates(graph, ledger.players, player_ids)
+        ledger.players_synced(player_ids)
+    if ledger is not None:
+        ledger.save()
+
+    # Matches written by this run, new or revised, replace their counts in the matchup store;
+    # the ledger keeps them unsynced until the store is saved
+    if matchups_dir and ledger is not None:
+        with metrics.stage(MATCHUPS):
+            sync_matchups(ledger, matchups_dir)
+        ledger.save()
+    elif matchups_dir and written:
+        with metrics.stage(MATCHUPS):
+            update_matchups(written, matchups_dir)
+
+    logging.info(dimension_cache.report())
+    flush_counters()
     logging.info("Finished processing all files and updating season statistics.")
 
+    metrics.finish()
+    table = metrics.summary_table()
+    print(table)
+    logging.info(f"Import performance:\n{table}")
+    if report_path:
+        metrics.write_report(report_path)
+        logging.info(f"Wrote performance report to {report_path}")
+    return metrics
+
+# ------------------------ Replace Mode ------------------------
+
+def replace_matches(paths, tournament_name=TOURNAMENT_NAME, batch_size=PURGE_BATCH_SIZE, **import_options):
+    """Delete and re-import corrected matches; paths are match files or whole season directories.
+
+    Each match subgraph (Match, Innings, Over, Delivery, Dismissal, Phase, PlayerMatchPerformance)
+    is deleted in transactions of at most batch_size nodes, both under the match_id the ledger
+    recorded and the one in the file now. For a season directory, matches the database holds for
+    that season but no file provides any more are deleted too. The files are then imported as new,
+    which recomputes the Season aggregates from the ledger.
+    """
+    files_by_dir = defaultdict(list)
+    for path in paths:
+        if os.path.isdir(path):
+            files_by_dir[path].extend(glob.glob(os.path.join(path, "*.json")))
+        else:
+            files_by_dir[os.path.dirname(path)].append(path)
+
+    connection = get_graph()
+
+    def run_batch(query, parameters):
+        return call_with_retries(lambda: connection.run(query, parameters).evaluate() or 0,
+                                 description="purge batch")
+
+    ledger = ImportLedger()
+    match_ids = set()
+    for path in paths:
+        if os.path.isdir(path):
+            seasons = {load_match(file).get('info', {}).get('season') for file in files_by_dir[path]}
+            for season in seasons - {None}:
+                match_ids.update(r["match_id"] for r in connection.run(MATCH_IDS_OF_SEASON, {"season": season}))
+    for files in files_by_dir.values():
+        for file in files:
+            entry = ledger.entries.get(file_id(file))
+            if entry is not None:
+                match_ids.add(entry["match_id"])
+            match_ids.add(match_id_of(load_match(file).get('info', {})))
+    match_ids.discard(None)
+
+    start = time.perf_counter()
+    deleted = purge_matches(run_batch, sorted(match_ids), batch_size)
+    logging.info(f"Replace: deleted {sum(deleted.values())} nodes of {len(match_ids)} matches "
+                 f"in {time.perf_counter() - start:.1f}s: {deleted}")
+    # Entries are only forgotten (and journalled) once the old subgraphs are gone, so a failed
+    # purge can be re-run with the match_ids the ledger recorded. Forgotten files stay unsynced
+    # in the matchup store until the import below re-adds or removes them.
+    ledger.forget_matches(match_ids)
+    ledger.save()
+
+    for json_directory, files in files_by_dir.items():
+        import_json_to_neo4j(json_directory, tournament_name, files=files, **import_options)
+    return deleted
+
+# ------------------------ Dead Letters ------------------------
+
+def retry_dead_letters(tournament_name=TOURNAMENT_NAME, **import_options):
+    """Import again only the files a previous run dead-lettered. Returns the ones still failing."""
+    files_by_dir = defaultdict(list)
+    for path in ImportLedger().retry_paths():
+        if os.path.exists(path):
+            files_by_dir[os.path.dirname(path)].append(path)
+        else:
+            logging.warning(f"Dead-lettered file {path} no longer exists")
+    logging.info(f"Retrying {sum(len(files) for files in files_by_dir.values())} dead-lettered files")
+    for json_directory, files in files_by_dir.items():
+        import_json_to_neo4j(json_directory, tournament_name, files=files, **import_options)
+    return ImportLedger().dead_letters
+
+# ------------------------ Aggregate Verification ------------------------
+
+def verify_player_aggregates(tournament_name=TOURNAMENT_NAME, repair=False):
+    """Recompute every player aggregate from the imported files and diff it against the
+    incrementally maintained ledger totals and the PlayerCareer/PlayerSeason nodes.
+
+    With repair, the recomputed contributions replace the ledger's and every differing player's
+    nodes are rewritten. Returns the list of differences found.
+    """
+    ledger = ImportLedger()
+    fresh = []
+    for entry in ledger.entries.values():
+        path = entry["path"]
+        if not os.path.exists(path):
+            logging.warning(f"Imported file {path} no longer exists; its aggregates cannot be checked")
+            continue
+        batch, season_stats = build_match_batch(load_match(path), path, tournament_name)
+        if batch is not None:
+            fresh.append((path, entry, batch, season_stats))
+    expected_careers, expected_seasons = aggregate_maps(recompute(batch.player_stats for _, _, batch, _ in fresh))
+    ledger_careers, ledger_seasons = aggregate_maps(ledger.players)
+    graph_careers, graph_seasons = read_player_aggregates(get_graph())
+
+    differences = (diff_aggregates(expected_careers, ledger_careers, "ledger career")
+                   + diff_aggregates(expected_seasons, ledger_seasons, "ledger season")
+                   + diff_aggregates(expected_careers, graph_careers, "graph career")
+                   + diff_aggregates(expected_seasons, graph_seasons, "graph season"))
+    logging.info(f"Verified aggregates of {len(expected_careers)} players from {len(fresh)} files: "
+                 f"{len(differences)} differences")
+
+    if repair and differences:
+        for path, entry, batch, season_stats in fresh:
+            if entry.get("player_stats") != batch.player_stats:
+                ledger.record(path, entry["match_id"], entry["revision"], season_stats, batch.player_stats)
+        player_ids = set(expected_careers) | set(graph_careers) | {key[0] for key in graph_seasons}
+        write_player_aggregates(get_graph(), ledger.players, player_ids)
+        ledger.players_synced(player_ids)
+        ledger.save()
+    return differences
+
 # ------------------------ Main Execution ------------------------
 
 if __name__ == "__main__":
-    for json_dir in JSON_DIRS:
-        import_json_to_neo4j(json_dir, TOURNAMENT_NAME)
-    
+    parser = argparse.ArgumentParser(description="Import Cricsheet IPL matches into Neo4j.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--replace", nargs="+", metavar="PATH",
+                      help="Delete and re-import these match files or season directories instead of JSON_DIRS")
+    mode.add_argument("--retry-failed", action="store_true",
+                      help="Only retry the files earlier runs dead-lettered")
+    mode.add_argument("--verify-aggregates", action="store_true",
+                      help="Recompute player career and season aggregates from scratch and diff them")
+    parser.add_argument("--repair", action="store_true",
+                        help="With --verify-aggregates, rewrite the aggregates that differ")
+    args = parser.parse_args()
+
+    if args.verify_aggregates:
+        differences = verify_player_aggregates(TOURNAMENT_NAME, repair=args.repair)
+        for difference in differences:
+            print(difference)
+        print(f"{len(differences)} differences" + (" (repaired)" if differences and args.repair else ""))
+        raise SystemExit(1 if differences and not args.repair else 0)
+
+    # Imports are checkpointed in the ledger, so re-running after a crash resumes where it stopped
+    if args.replace:
+        replace_matches(args.replace, TOURNAMENT_NAME)
+    elif args.retry_failed:
+        retry_dead_letters(TOURNAMENT_NAME)
+    else:
+        for json_dir in JSON_DIRS:
+            import_json_to_neo4j(json_dir, TOURNAMENT_NAME)
+
+    dead_letters = ImportLedger().dead_letters
+    if dead_letters:
+        logging.warning(f"{len(dead_letters)} files are dead-lettered; retry them with --retry-failed")
+        for entry in dead_letters.values():
+            print(f"FAILED {entry['path']}: {entry['error']} ({entry['attempts']} attempts)")
+
     logging.info("Data import completed successfully.")
\ No newline at end of file
@@ -8,6 +8,7 @@ from tqdm import tqdm  # For displaying progress bars
 from collections import defaultdict
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from ingest_logging import log_sampled, setup_logging
 
 # ------------------------ Configuration ------------------------
 
@@ -42,12 +43,7 @@ JSON_DIRS = [
 LEAGUE_NAME = "Indian Premier League"  # Modify as needed
 
 # Logging configuration
-logging.basicConfig(
-    filename='importingg.log',
-    filemode='w',  # Overwrite the log file each time
-    format='%(asctime)s %(levelname)s:%(message)s',
-    level=logging.INFO
-)
+setup_logging('importingg.log')  # Overwrite the log file each time
 
 # ------------------------ Connect to Neo4j ------------------------
 
@@ -210,7 +206,7 @@ def import_json_to_neo4j(json_directory, league_name):
         try:
             with open(file, 'r') as f:
                 data = json.load(f)
-                logging.info(f"Loaded JSON file: {file}")
+                log_sampled("load", "Loaded JSON file: %s", file)
         except json.JSONDecodeError as e:
             logging.error(f"JSON decode error in file {file}: {e}")
             return
@@ -219,7 +215,7 @@ def import_json_to_neo4j(json_directory, league_name):
         meta = data.get('meta', {})
         info = data.get('info', {})
         innings_list = data.get('innings', [])
-        logging.info(f"innings_list structure: {innings_list}")
+        log_sampled("innings", "innings_list structure: %s", innings_list, level=logging.DEBUG)
 
         # Generate a unique match_id (e.g., match_number_date)
         match_number = info.get('event', {}).get('match_number')
@@ -430,7 +426,7 @@ def import_json_to_neo4j(json_directory, league_name):
         is_dl_method = False
 
         for i, innings_data in enumerate(innings_list):
-            logging.info(f"Inning {i+1} data: {innings_data}")
+            log_sampled("innings", "Inning %s data: %s", i + 1, innings_data, level=logging.DEBUG)
             # Check if innings_data is a dict with a single key like '1st innings'
             if isinstance(innings_data, dict):
                 if len(innings_data) == 1 and isinstance(next(iter(innings_data.values())), dict):
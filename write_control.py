@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+
+# ------------------------ Configuration ------------------------
+
+TARGET_LATENCY = (0.05, 0.25)   # seconds per write transaction the controller steers into
+MIN_BATCH_MATCHES = 1
+MAX_BATCH_MATCHES = 16
+WINDOW = 8                      # transactions per adjustment
+
+# ------------------------ Adaptive Controller ------------------------
+
+class AdaptiveController:
+    """Steers matches per transaction and active writers from observed transaction latency.
+
+    Every WINDOW transactions the median latency is compared with the target band: below it,
+    batches grow by one match, or another writer is let in once batches are at their maximum;
+    above it, active writers are cut first and then the batch size is halved. Every change is
+    kept in decisions (and sent to a RunMetrics, if given) so the run report shows what the
+    controller did and why.
+    """
+
+    def __init__(self, max_concurrency, target=TARGET_LATENCY, min_batch=MIN_BATCH_MATCHES,
+                 max_batch=MAX_BATCH_MATCHES, window=WINDOW, metrics=None):
+        self.low, self.high = target
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_concurrency = max_concurrency
+        self.window = window
+        self.metrics = metrics
+        self.batch_size = min_batch
+        self.concurrency = max_concurrency
+        self.decisions = []
+        self._active = 0
+        self._samples = []
+        self._condition = threading.Condition()
+        self._start = time.perf_counter()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def observe(self, seconds, matches):
+        with self._condition:
+            self._samples.append(seconds)
+            if len(self._samples) < self.window:
+                return
+            median = statistics.median(self._samples)
+            self._samples.clear()
+            before = (self.batch_size, self.concurrency)
+            if median > self.high:
+                if self.concurrency > 1:
+                    self.concurrency -= 1
+                else:
+                    self.batch_size = max(self.min_batch, self.batch_size // 2)
+            elif median < self.low:
+                if self.batch_size < self.max_batch:
+                    self.batch_size += 1
+                elif self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._condition.notify_all()
+            if (self.batch_size, self.concurrency) != before:
+                self._decide(median, before)
+
+    def _decide(self, median, before):
+        decision = {
+            "t": round(time.perf_counter() - self._start, 3),
+            "median_latency": round(median, 4),
+            "batch_size": [before[0], self.batch_size],
+            "concurrency": [before[1], self.concurrency],
+        }
+        self.decisions.append(decision)
+        if self.metrics is not None:
+            self.metrics.event("controller", **decision)
+
+    def report(self):
+        return {"target": [self.low, self.high], "final_batch_size": self.batch_size,
+                "final_concurrency": self.concurrency, "decisions": self.decisions}
+
+# ------------------------ Rate Limit ------------------------
+
+class TokenBucket:
+    """Caps a rate (statements or rows per second) with bursts of up to `burst` units.
+
+    take() blocks until the tokens are available; a request larger than the burst is let
+    through once the bucket is full, so huge batches are slowed down rather than stuck.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def take(self, amount):
+        amount = min(float(amount), self.burst)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)